@@ -12,10 +12,12 @@ from server import *
 from device import *
 
 import time
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 
 import settings
-from settings import S_STORAGE, D_STORAGE, STAGING_AREA, S_DATA_STORAGE, HEADER_SCENARIOS, START_MEASUREMENT, END_MEASUREMENT, M_APP_BENCHMARKING_SCENARIO
+from settings import S_STORAGE, D_STORAGE, STAGING_AREA, S_DATA_STORAGE, HEADER_SCENARIOS, START_MEASUREMENT, END_MEASUREMENT, M_APP_BENCHMARKING_SCENARIO, AUTO_MIN_NIST_LEVEL, AUTO_MAX_SIGNATURE_SIZE, AUTO_LATENCY_BUDGET, SYSTEM_BASES, DEFAULT_SYSTEM_BASE
+from modules.actorsystem import SystemBase
+from modules.registry import AlgorithmRegistry
 from modules.messagetypes import *
 from modules.filehandling import FolderHandling as foha
 from modules.filehandling import SaveTimes2File as save
@@ -27,11 +29,29 @@ parser_app = ArgumentParser(
 parser_app.add_argument("--action", dest="action", default="boot", help="", choices=["boot", "update"])
 parser_app.add_argument("--saveb", dest="save_boot", action="store_true", default=False, help="")
 parser_app.add_argument("--saveu", dest="save_update", action="store_true", default=False, help="")
-parser_app.add_argument("--crypto", dest="crypto", default="classic", help="", choices=["none", "pqc", "classic"])
-parser_app.add_argument("--variant", dest="variant", default="secp256r1", help="")
+parser_app.add_argument("--crypto", dest="crypto", default="classic", help="", choices=["none", "pqc", "classic", "hybrid"])
+parser_app.add_argument("--variant", dest="variant", default="secp256r1", help="Hybrid mode: <classic>+<pqc>, e.g. secp256r1+Dilithium2; auto: cheapest measured algorithm (sets --crypto)")
 parser_app.add_argument("--scenario", dest="scenario", type=int, help="", choices=[1, 2, 3, 4, 5, 6, 7, 8])
-parser_app.add_argument("--hash", dest="hash_algo", default="sha256", help="", choices=["none","sha256", "sha384", "sha512"])
+parser_app.add_argument("--hash", dest="hash_algo", default="sha256", help="", choices=["none","sha256", "sha384", "sha512", "sha3_256", "sha3_384", "sha3_512", "shake128", "shake256"])
 parser_app.add_argument("--unit", dest="unit", default="cycles", help="")
+parser_app.add_argument("--min-level", dest="min_level", type=int, default=AUTO_MIN_NIST_LEVEL, help="--variant=auto: minimum claimed NIST level")
+parser_app.add_argument("--max-sig-size", dest="max_sig_size", type=int, default=AUTO_MAX_SIGNATURE_SIZE, help="--variant=auto: maximum signature size in bytes")
+parser_app.add_argument("--latency-budget", dest="latency_budget", type=float, default=AUTO_LATENCY_BUDGET, help="--variant=auto: maximum sign + verify cost per message")
+parser_app.add_argument("--payload", dest="signing_payload", default="canonical", help="Encoding of the signed payload (json: legacy compatibility mode)", choices=["canonical", "json"])
+parser_app.add_argument("--prehash", dest="prehash", action="store_true", default=False, help="Sign and verify only the digest (--hash) of the payload")
+parser_app.add_argument("--sign-executor", dest="sign_executor", default="inline", help="Where the server Signer computes signatures", choices=["inline", "thread", "process"])
+parser_app.add_argument("--verify-batch", dest="verify_batch", action="store_true", default=False, help="Server verifies incoming messages in batches on a thread pool")
+parser_app.add_argument("--wire", dest="wire", default="json", help="Format of the messages sent between server and device", choices=["json", "binary"])
+parser_app.add_argument("--no-verify-cache", dest="verify_cache", action="store_false", default=True, help="Device verifies staged elements on every boot instead of using the verification cache")
+parser_app.add_argument("--chunked-update", dest="chunked_update", action="store_true", default=False, help="Server sends a signed manifest and the device downloads the update in chunks")
+parser_app.add_argument("--delta-update", dest="delta_update", action="store_true", default=False, help="Server sends a binary delta from the update version installed on the device")
+parser_app.add_argument("--compression", dest="compression", default="none", help="Compression of the update images", choices=["none", "zlib", "bz2", "lzma"])
+parser_app.add_argument("--compression-level", dest="compression_level", type=int, default=None, help="--compression: level (default: UPDATE_COMPRESSION_LEVELS in settings.py)")
+parser_app.add_argument("--sign-uncompressed", dest="sign_uncompressed", action="store_true", default=False, help="--compression: sign the uncompressed update, the device decompresses it before the verification")
+parser_app.add_argument("--defticket-batch", dest="defticket_batch", action="store_true", default=False, help="Server signs the deferral tickets of a time window with one signature over their Merkle root")
+parser_app.add_argument("--actor-pool", dest="actor_pool", action="store_true", default=False, help="Create each protocol role once (or ACTOR_POOL_SIZE times) and reuse it instead of one actor per message")
+parser_app.add_argument("--system-base", dest="system_base", default=DEFAULT_SYSTEM_BASE, help="Thespian system base (transport) the actors run on", choices=SYSTEM_BASES)
+parser_app.add_argument("--fused-pipeline", dest="fused_pipeline", action="store_true", default=False, help="Server handles a request (verify, generate, sign, reply) within one actor instead of one actor per step")
 
 ARGS = parser_app.parse_args()
 start_str = ARGS.action
@@ -41,8 +61,27 @@ settings.scenario = ARGS.scenario
 hash_algo = ARGS.hash_algo
 unit = ARGS.unit
 
+if variant == "auto":
+    # Cheapest measured algorithm that meets the NIST level, signature size and latency budget
+    crypto, variant = AlgorithmRegistry.auto(hash_algo, ARGS.min_level, ARGS.max_sig_size, ARGS.latency_budget)
+
 settings.save_measurements = bool(ARGS.save_boot)
 settings.save_update_measurements = bool(ARGS.save_update)
+settings.verify_batch = bool(ARGS.verify_batch)
+settings.signing_payload = ARGS.signing_payload
+settings.prehash = bool(ARGS.prehash)
+settings.sign_executor = ARGS.sign_executor
+settings.defticket_batch = bool(ARGS.defticket_batch)
+settings.verify_cache = bool(ARGS.verify_cache)
+settings.wire = ARGS.wire
+settings.chunked_update = bool(ARGS.chunked_update)
+settings.delta_update = bool(ARGS.delta_update)
+settings.compression = ARGS.compression
+settings.compression_level = ARGS.compression_level
+settings.sign_uncompressed = bool(ARGS.sign_uncompressed)
+settings.actor_pool = bool(ARGS.actor_pool)
+settings.fused_pipeline = bool(ARGS.fused_pipeline)
+settings.system_base = ARGS.system_base
 # app.py --action=boot --saveb
 
 FILEPATH = fh.gen_filepath(unit, settings.scenario, variant, hash_algo, M_APP_BENCHMARKING_SCENARIO)
@@ -51,10 +90,15 @@ class TopLevelActor(Actor):
 
     def __init__(self) -> None:
         self.actor_name: str = "top_level_actor"
+        # ActorSystem to shut down at the end (sent with the start message)
+        self.system_base: str = DEFAULT_SYSTEM_BASE
+        self.admin_port: Optional[int] = None
 
     def receiveMessage(self, message: Union[Dict[str, Any], ActorExitRequest, ChildActorExited], sender: ActorAddress) -> None:
         if isinstance(message, dict):
             print("[TopLevelActor] Instantiated")
+            self.system_base = message["system_base"]
+            self.admin_port = message["admin_port"]
             server_addr: ActorAddress = self.createActor('server.Server', globalName='Server')
             device_addr: ActorAddress = self.createActor('device.Device', globalName='Device')
 
@@ -71,7 +115,7 @@ class TopLevelActor(Actor):
                 addresses=addresses,
                 sequence_list=[sequence_list[0]],
                 state = 0,
-                signature = "",
+                signature = b"",
                 crypto = message["crypto"],
                 variant = message["variant"],
                 scenario = message["scenario"],
@@ -120,7 +164,9 @@ class TopLevelActor(Actor):
             if os.path.exists(alive_file):
                 os.remove(alive_file)
 
-            ActorSystem('multiprocTCPBase', {'Admin Port':1900}).shutdown()
+            if SystemBase.reachable(self.system_base):
+                SystemBase.shutdown(self.system_base, self.admin_port)
+            # Otherwise the ActorSystem is shut down by app.py as soon as the alive file is removed
         
         if isinstance(message, ChildActorExited):
             print(f"[TopLevelActor] Received ChildActorExited from {sender}")
@@ -152,8 +198,10 @@ if __name__ == "__main__":
     
     print("[APP] Starting the ActorSystem without capabilities.")
 
-    # Creating an actor system
-    asys: ActorSystem = ActorSystem('multiprocTCPBase')
+    # Creating an actor system on the selected system base
+    asys, admin_port = SystemBase.start(settings.system_base)
+    start_dict["system_base"] = settings.system_base
+    start_dict["admin_port"] = admin_port
 
     # Create and tell top level actor as starting point for the device and server actors
     top_level_actor_addr: ActorAddress = asys.createActor(TopLevelActor, globalName='TopLevel')
@@ -162,8 +210,12 @@ if __name__ == "__main__":
     # As long as the file exists, the app.py-Skript will not be ended.
     # To be sure that all child processes have been finished.
     while(os.path.exists(alive_file)):
-        time.sleep(2)
+        if settings.system_base == "simpleSystemBase":
+            # The actors of the simple system base only run while the ActorSystem is listening
+            asys.listen(2)
+        else:
+            time.sleep(2)
 
-    ActorSystem('multiprocTCPBase', {'Admin Port':1900}).shutdown()
+    SystemBase.shutdown(settings.system_base, admin_port)
     print("[APP] ActorSystem is shut down.")
     
\ No newline at end of file
@@ -0,0 +1,280 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+"""
+Server engine on asyncio, an alternative to the server actors of server.py for many concurrently connected devices.
+The devices connect via a local TCP or Unix socket and send their messages (requests and measured data) in frames:
+length of the message (4 bytes, big endian) | message (JSON of Utils.to_json or the binary wire format of WireCodec).
+The answer is sent in the format of the request.
+A device with its own key pair may name itself in a first frame (HELLO | name), the server then keeps the state of the
+device in the folder <storage>/<name>: its public key D_PUB_KEY, its compromise flag, its saved bootticket and update
+and its measured data (see fleet.py and sharded_server.py).
+
+A message is verified, the answer is generated and signed like in the server actors (VerifyMessage, GenerateServerObjects,
+SignMessage), but on a thread or process pool, so the event loop only reads and writes the frames.
+The memory stays bounded: at most ASYNC_MAX_CONNECTIONS connections, one frame of at most ASYNC_MAX_REQUEST_SIZE bytes
+per connection and ASYNC_MAX_PENDING messages on the pool at a time.
+
+Chunked, delta and compressed updates as well as the batching of the server actors are not supported by this engine.
+"""
+from argparse import ArgumentParser
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+import asyncio
+import os
+import struct
+
+import settings
+from settings import SERVER, S_STORAGE, S_PRIV_KEY, D_PUB_KEY, S_DATA_STORAGE, MEASURED_DATA, SIGN_WORKERS, ASYNC_MAX_CONNECTIONS, ASYNC_MAX_REQUEST_SIZE, ASYNC_MAX_PENDING
+from modules.crypto import SignMessage, VerifyMessage
+from modules.executor import load_signing_key
+from modules.generate_objects import GenerateServerObjects as gen_obj
+from modules.filehandling import FileHandling as fh
+from modules.common import former_step, data_processing
+from modules.utils import Utils
+from modules.wire import WireCodec
+from modules.messagetypes import *
+
+# Generator of each request type and its step in the sequence_list
+GENERATORS: Dict[str, Tuple[Callable[[Message], Message], str]] = {
+    "update": (gen_obj.gen_update, "gen_update"),
+    "bootticket": (gen_obj.gen_bootticket, "gen_bootticket"),
+    "defticket": (gen_obj.gen_defticket, "gen_defticket")
+}
+
+class Frames():
+    """
+    Frames of the messages on the socket: length (4 bytes, big endian) | message.
+    """
+    HEADER: struct.Struct = struct.Struct(">I")
+    HELLO: bytes = b"WDH"
+
+    @staticmethod
+    async def read(reader: asyncio.StreamReader, max_size: int) -> Optional[bytes]:
+        # None if the connection has been closed between two frames
+        try:
+            header: bytes = await reader.readexactly(Frames.HEADER.size)
+        except asyncio.IncompleteReadError:
+            return None
+        (length,) = Frames.HEADER.unpack(header)
+        if length > max_size:
+            raise ValueError(f"Frame of {length} bytes is larger than {max_size} bytes")
+        return await reader.readexactly(length)
+
+    @staticmethod
+    def write(writer: asyncio.StreamWriter, payload: bytes) -> None:
+        writer.write(Frames.HEADER.pack(len(payload)) + payload)
+
+    @staticmethod
+    def hello(name: str) -> bytes:
+        return Frames.HELLO + name.encode("utf-8")
+
+    @staticmethod
+    def device_name(payload: bytes) -> Optional[str]:
+        # Name of the device in a HELLO frame, None for other frames
+        if not payload.startswith(Frames.HELLO):
+            return None
+        name: str = payload[len(Frames.HELLO):].decode("utf-8")
+        # The name becomes the folder of the device state
+        if not name.isidentifier():
+            raise ValueError(f"Invalid device name {name!r}")
+        return name
+
+    @staticmethod
+    def is_binary(payload: bytes) -> bool:
+        return payload.startswith(WireCodec.MAGIC)
+
+    @staticmethod
+    def encode(message: Message, binary: bool) -> bytes:
+        if binary:
+            return WireCodec.encode(message)
+        return Utils.to_json(message).encode("utf-8")
+
+    @staticmethod
+    def decode(payload: bytes, addresses: Addresses) -> Message:
+        if Frames.is_binary(payload):
+            message = WireCodec.decode(payload, addresses)
+        else:
+            message = Utils.from_json(payload.decode("utf-8"), addresses)
+        if not isinstance(message, Message):
+            raise TypeError("No message received")
+        return message
+
+class AsyncServer():
+    """
+    Serves the devices connected to the socket.
+
+    Parameters:
+    -----------
+    executor: str
+        "thread" or "process": pool the messages are verified, generated and signed on
+    workers: int
+        Number of pool workers
+    max_connections: int
+        Devices connected at a time
+    max_pending: int
+        Messages on the pool at a time
+    storage: Path
+        Secure storage of the server (keys, saved bootticket and update, folders of the named devices)
+    data_storage: Path
+        Storage of the measured data (and the compromise flag of all devices)
+    """
+    def __init__(self, executor: str = "thread", workers: int = SIGN_WORKERS, max_connections: int = ASYNC_MAX_CONNECTIONS, max_pending: int = ASYNC_MAX_PENDING,
+                 storage: Path = S_STORAGE, data_storage: Path = S_DATA_STORAGE) -> None:
+        if executor == "thread":
+            self.pool: Executor = ThreadPoolExecutor(max_workers=workers, initializer=load_signing_key, initargs=(storage, S_PRIV_KEY))
+        elif executor == "process":
+            self.pool: Executor = ProcessPoolExecutor(max_workers=workers, initializer=load_signing_key, initargs=(storage, S_PRIV_KEY))
+        else:
+            raise ValueError(f"Unsupported executor: {executor}")
+        self.storage: Path = storage
+        self.data_storage: Path = data_storage
+        self.max_connections: int = max_connections
+        self.max_pending: int = max_pending
+        self.pending: Optional[asyncio.Semaphore] = None
+        self.connections: int = 0
+        self.served: int = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0, path: Optional[Path] = None) -> asyncio.AbstractServer:
+        # Listens on the Unix socket path if given, otherwise on host and port (0: free port)
+        self.pending = asyncio.Semaphore(self.max_pending)
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle_connection, path=str(path), backlog=self.max_connections)
+        return await asyncio.start_server(self.handle_connection, host, port, backlog=self.max_connections)
+
+    async def wait_idle(self) -> None:
+        # Waits until all devices are disconnected and their last messages have been processed
+        while self.connections > 0:
+            await asyncio.sleep(0.01)
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if self.connections >= self.max_connections:
+            print(f"[{SERVER}] {self.connections} devices connected, connection refused.")
+            writer.close()
+            return
+
+        self.connections += 1
+        # The connection takes the place of the actor addresses
+        addresses: Addresses = Addresses(SERVER, f"device_{id(writer)}")
+        device: Optional[str] = None
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        try:
+            while True:
+                payload: Optional[bytes] = await Frames.read(reader, ASYNC_MAX_REQUEST_SIZE)
+                if payload is None:
+                    break
+                name: Optional[str] = Frames.device_name(payload)
+                if name is not None:
+                    addresses.device_addr = device = name
+                    continue
+                message: Message = Frames.decode(payload, addresses)
+
+                async with self.pending:
+                    answer: Optional[Message] = await loop.run_in_executor(self.pool, AsyncServer.process, message, self.storage, self.data_storage, device)
+                self.served += 1
+
+                if answer is not None:
+                    Frames.write(writer, Frames.encode(answer, Frames.is_binary(payload)))
+                    # Wait for slow devices instead of buffering their answers
+                    await writer.drain()
+
+        except (ValueError, TypeError, KeyError, ConnectionError, asyncio.IncompleteReadError) as ex:
+            print(f"[{SERVER}] Connection to {addresses.device_addr} closed: {ex}")
+        finally:
+            self.connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    def process(message: Message, storage: Path = S_STORAGE, data_storage: Path = S_DATA_STORAGE, device: Optional[str] = None) -> Optional[Message]:
+        """
+        Verifies the message of a device and returns the signed answer (None if there is no answer).
+        Runs on the pool; the steps are added to the sequence_list like in the server actors.
+        device: name of the device (HELLO frame), None for a device without a name.
+        """
+        # State of the device: its folder if it has a name, otherwise the storages of the server
+        state: Path = Path(storage, device) if device is not None else storage
+        data_state: Path = state if device is not None else data_storage
+
+        message, _ = former_step(message, None, SERVER, "server")
+        if (message.variant != "none") and (message.crypto != "none"):
+            valid: bool = VerifyMessage.verify(SERVER, message, state, D_PUB_KEY, message.variant, message.crypto, message.hash_algo)
+        else:
+            print(f"[{SERVER}] Dummy function: No verification needed.")
+            valid = True
+        message, _ = former_step(message, None, SERVER, "verifier")
+
+        compromised: bool = os.path.exists(Path(data_storage, "compromised.device")) or os.path.exists(Path(data_state, "compromised.device"))
+        if (not valid) or compromised:
+            print(f"[{SERVER}] Message has NOT been verified: Device might be compromised.")
+            return None
+
+        if isinstance(message.mdata, MeasuredData):
+            message, _ = former_step(message, None, SERVER, "storage")
+            data_processing(message, data_state, MEASURED_DATA)
+            return None
+
+        if (not isinstance(message.mdata, Request)) or (message.mdata.requesttype not in GENERATORS):
+            print(f"[{SERVER}] Unsupported message {message.mdata_type.__name__}.")
+            return None
+
+        request_type: str = message.mdata.requesttype
+        print(f"[{SERVER}] {request_type.capitalize()} request has been verified: {valid}")
+        generate, generator_name = GENERATORS[request_type]
+        message, _ = former_step(message, None, SERVER, generator_name)
+        answer: Message = generate(message)
+        if request_type != "defticket":
+            # Save bootticket and update for future reference
+            fh.save_object(answer, state)
+
+        answer, _ = former_step(answer, None, SERVER, "signer")
+        if (answer.variant != "none") and (answer.crypto != "none"):
+            answer = SignMessage.sign(SERVER, answer, storage, S_PRIV_KEY, answer.variant, answer.crypto, answer.hash_algo)
+        else:
+            print(f"[{SERVER}] Dummy function: Message will not be signed.")
+        answer, _ = former_step(answer, None, SERVER, "server")
+        return answer
+
+async def serve(server: AsyncServer, host: str, port: int, path: Optional[Path]) -> None:
+    listener: asyncio.AbstractServer = await server.start(host, port, path)
+    where = path if path is not None else listener.sockets[0].getsockname()
+    print(f"[{SERVER}] Listening on {where}.")
+    async with listener:
+        await listener.serve_forever()
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description=""" Server engine on asyncio for many concurrently connected devices """)
+
+    parser.add_argument("--host", dest="host", default="127.0.0.1", help="Host of the TCP socket")
+    parser.add_argument("--port", dest="port", type=int, default=0, help="Port of the TCP socket (0: free port)")
+    parser.add_argument("--unix", dest="unix", default=None, help="Path of a Unix socket (instead of TCP)")
+    parser.add_argument("--executor", dest="executor", default="thread", help="Pool the crypto runs on", choices=["thread", "process"])
+    parser.add_argument("--workers", dest="workers", type=int, default=SIGN_WORKERS, help="Number of pool workers")
+    parser.add_argument("--max-connections", dest="max_connections", type=int, default=ASYNC_MAX_CONNECTIONS, help="Devices connected at a time")
+    parser.add_argument("--payload", dest="signing_payload", default="canonical", help="Encoding of the signed payload (json: legacy compatibility mode)", choices=["canonical", "json"])
+    parser.add_argument("--prehash", dest="prehash", action="store_true", default=False, help="Sign and verify only the digest (--hash) of the payload")
+
+    ARGS = parser.parse_args()
+    settings.signing_payload = ARGS.signing_payload
+    settings.prehash = bool(ARGS.prehash)
+
+    server: AsyncServer = AsyncServer(ARGS.executor, ARGS.workers, ARGS.max_connections)
+    try:
+        asyncio.run(serve(server, ARGS.host, ARGS.port, Path(ARGS.unix) if ARGS.unix is not None else None))
+    except KeyboardInterrupt:
+        print(f"[{SERVER}] Stopped after {server.served} messages.")
+    finally:
+        server.shutdown()
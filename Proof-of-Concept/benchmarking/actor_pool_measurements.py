@@ -0,0 +1,106 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+"""
+This file contains a benchmark of the pooled actor mode (app.py --actor-pool): latency per hop of a chain of protocol steps
+when every step creates a new actor that ends afterwards (as without --actor-pool), with the pooled actors (Utils.pooled_actor)
+and with plain sends to actors that already exist, and the throughput of messages sent through the chain at a time.
+"""
+# Go one level up in the directory to use modules from the parent directory
+import os
+import sys
+currentdir: str = os.path.dirname(os.path.realpath(__file__))
+parentdir: str = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+import csv
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median
+from typing import Any, Dict, List, Optional
+
+from thespian.actors import Actor, ActorAddress, ActorExitRequest, ActorSystem, ChildActorExited
+
+from settings import UNIT, START_MEASUREMENT, END_MEASUREMENT, M_APP_BENCHMARKING_FUNCTIONS
+from modules.utils import Utils
+
+parser = ArgumentParser(
+    description=""" Benchmark of per-message actors compared with pooled actors. """)
+
+parser.add_argument("--number", dest="number", type=int, help="Number of measurements", default=20)
+parser.add_argument("--hops", dest="hops", type=int, help="Protocol steps per message", default=8)
+parser.add_argument("--messages", dest="messages", type=int, help="Messages sent through the chain at a time (throughput)", default=50)
+parser.add_argument("--base", dest="base", default="multiprocTCPBase", help="Thespian system base", choices=["simpleSystemBase", "multiprocQueueBase", "multiprocTCPBase"])
+
+ARGS = parser.parse_args()
+number = ARGS.number
+
+filepath: Path = Path("..", M_APP_BENCHMARKING_FUNCTIONS, f"{UNIT}_actor_pool")
+
+class Step(Actor):
+    """
+    One protocol step: forwards the message to the next step, the last step answers the requester.
+    message: {"mode": "create" | "pooled" | "plain", "hops": remaining steps, "reply_to": requester, "plain": addresses of existing steps}
+    """
+    def receiveMessage(self, message: Any, sender: ActorAddress) -> None:
+        if isinstance(message, ChildActorExited):
+            # Like a protocol step without --actor-pool, the actor ends after the following step has ended
+            self.send(self.myAddress, ActorExitRequest())
+        if not isinstance(message, dict):
+            return
+        if message["reply_to"] is None:
+            # First step: the requester is the ActorSystem
+            message = dict(message, reply_to=sender)
+        if message["hops"] == 0:
+            self.send(message["reply_to"], message["id"])
+        else:
+            next_message: Dict[str, Any] = dict(message, hops=message["hops"] - 1)
+            if message["mode"] == "create":
+                self.send(self.createActor(Step), next_message)
+            elif message["mode"] == "pooled":
+                self.send(Utils.pooled_actor(self, Step), next_message)
+            else:
+                self.send(message["plain"][message["hops"] - 1], next_message)
+
+        if (message["mode"] == "create") and (message["hops"] == 0):
+            self.send(self.myAddress, ActorExitRequest())
+
+def run(asys: ActorSystem, first: ActorAddress, mode: str, count: int, plain: Optional[List[ActorAddress]]) -> float:
+    # Sends count messages through the chain and waits for all answers
+    t1: float = START_MEASUREMENT()
+    for i in range(count):
+        # Without the pool every message starts at a new actor
+        entry: ActorAddress = asys.createActor(Step) if mode == "create" else first
+        asys.tell(entry, {"id": i, "mode": mode, "hops": ARGS.hops, "reply_to": None, "plain": plain})
+    for _ in range(count):
+        if asys.listen(30) is None:
+            raise TimeoutError(f"No answer in mode {mode}")
+    t2: float = END_MEASUREMENT()
+    return t2 - t1
+
+if __name__ == "__main__":
+    asys: ActorSystem = ActorSystem(ARGS.base)
+    rows: List[List[Any]] = []
+    try:
+        plain: List[ActorAddress] = [asys.createActor(Step) for _ in range(ARGS.hops)]
+        first: ActorAddress = asys.createActor(Step)
+
+        for mode in ("create", "pooled", "plain"):
+            latency: List[float] = []
+            for _ in range(number):
+                latency.append(run(asys, first, mode, 1, plain) / (ARGS.hops + 1))
+            throughput_cost: float = run(asys, first, mode, ARGS.messages, plain)
+            rows.append([mode, ARGS.hops, median(latency), ARGS.messages / throughput_cost])
+            print(f"{mode}: {median(latency)} {UNIT} per hop, {ARGS.messages / throughput_cost} messages per {UNIT}")
+    finally:
+        asys.shutdown()
+
+    with open(f"{filepath}.csv", "w", encoding="UTF8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["mode", "hops", f"latency per hop ({UNIT})", f"messages per {UNIT}"])
+        writer.writerows(rows)
@@ -0,0 +1,192 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+"""
+This file contains a benchmark of the asyncio server engine (async_server.py) against the server actors (server.py):
+simulated devices request deferral tickets one after the other, all devices at the same time.
+Saved are the median and the 95th percentile of the latency of a request and the throughput of each engine.
+The asyncio server runs in the event loop of the benchmark, the devices are coroutines connected via a Unix socket.
+For the server actors the benchmark takes the place of the device actor.
+"""
+# Go one level up in the directory to use modules from the parent directory
+import os
+import sys
+currentdir: str = os.path.dirname(os.path.realpath(__file__))
+parentdir: str = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+import asyncio
+import csv
+import tempfile
+from argparse import ArgumentParser
+from datetime import datetime
+from pathlib import Path
+from statistics import median, quantiles
+from typing import Any, Dict, List, Tuple
+
+from thespian.actors import Actor, ActorAddress, ActorSystem
+
+import settings
+from settings import UNIT, START_MEASUREMENT, END_MEASUREMENT, M_APP_BENCHMARKING_FUNCTIONS, DEVICE, D_STORAGE, S_STORAGE, D_PRIV_KEY, S_DATA_STORAGE, SIGN_WORKERS, SYSTEM_BASES, DEFAULT_SYSTEM_BASE
+from modules.actorsystem import SystemBase
+from modules.crypto import KeyGen, SignMessage
+from modules.filehandling import FolderHandling as foha
+from modules.messagetypes import Addresses, Message, Request
+from modules.utils import Utils
+from async_server import AsyncServer, Frames
+
+parser = ArgumentParser(
+    description=""" Benchmark of the asyncio server engine against the server actors. """)
+
+parser.add_argument("--devices", dest="devices", type=int, help="Devices connected to the asyncio server at the same time", default=1000)
+parser.add_argument("--actor-devices", dest="actor_devices", type=int, help="Devices served by the server actors at the same time", default=20)
+parser.add_argument("--requests", dest="requests", type=int, help="Requests of each device", default=5)
+parser.add_argument("--crypto", dest="crypto", help="", default="none", choices=["none", "pqc", "classic", "hybrid"])
+parser.add_argument("--variant", dest="variant", help="", default="none")
+parser.add_argument("--hash", dest="hash_algo", help="", default="sha256")
+parser.add_argument("--wire", dest="wire", default="json", help="Format of the messages", choices=["json", "binary"])
+parser.add_argument("--executor", dest="executor", default="thread", help="Pool of the asyncio server", choices=["thread", "process"])
+parser.add_argument("--workers", dest="workers", type=int, default=SIGN_WORKERS, help="Pool workers of the asyncio server")
+parser.add_argument("--base", dest="base", default=DEFAULT_SYSTEM_BASE, help="Thespian system base of the server actors", choices=SYSTEM_BASES)
+
+ARGS = parser.parse_args()
+settings.wire = ARGS.wire
+
+filepath: Path = Path("..", M_APP_BENCHMARKING_FUNCTIONS, f"{UNIT}_async_server")
+
+def gen_keys() -> None:
+    # Device and server key pairs like key_generation.py
+    if ARGS.crypto == "classic":
+        KeyGen.gen_keypair_classic(name="device", priv_storage=D_STORAGE, pub_storage=S_STORAGE, variant=ARGS.variant)
+        KeyGen.gen_keypair_classic(name="server", priv_storage=S_STORAGE, pub_storage=D_STORAGE, variant=ARGS.variant)
+    elif ARGS.crypto == "pqc":
+        KeyGen.gen_keypair_pqc(sigalg=ARGS.variant, name="device", priv_storage=D_STORAGE, pub_storage=S_STORAGE)
+        KeyGen.gen_keypair_pqc(sigalg=ARGS.variant, name="server", priv_storage=S_STORAGE, pub_storage=D_STORAGE)
+    elif ARGS.crypto == "hybrid":
+        KeyGen.gen_keypair_hybrid(variant=ARGS.variant, name="device", priv_storage=D_STORAGE, pub_storage=S_STORAGE)
+        KeyGen.gen_keypair_hybrid(variant=ARGS.variant, name="server", priv_storage=S_STORAGE, pub_storage=D_STORAGE)
+
+def gen_requests(devices: int, addresses: Addresses) -> List[List[Message]]:
+    # Signed deferral ticket requests of each device (signed before the measurement), the nonce names device and request
+    requests: List[List[Message]] = []
+    for device in range(devices):
+        messages: List[Message] = []
+        for i in range(ARGS.requests):
+            message: Message = Message(addresses, ["device"], 0, b"", ARGS.crypto, ARGS.variant, None, ARGS.hash_algo,
+                                       Request("defticket", int(datetime.now().timestamp()), f"{device}_{i}"))
+            if ARGS.crypto != "none":
+                message = SignMessage.sign(DEVICE, message, D_STORAGE, D_PRIV_KEY, ARGS.variant, ARGS.crypto, ARGS.hash_algo)
+            messages.append(message)
+        requests.append(messages)
+    return requests
+
+def results(latency: List[float], duration: float) -> Tuple[float, float, float]:
+    # Median and 95th percentile of the latency, requests per UNIT
+    return median(latency), quantiles(latency, n=20)[-1], len(latency) / duration
+
+async def async_device(path: Path, messages: List[Message], latency: List[float]) -> None:
+    reader, writer = await asyncio.open_unix_connection(str(path))
+    try:
+        for message in messages:
+            t1: float = START_MEASUREMENT()
+            Frames.write(writer, Frames.encode(message, ARGS.wire == "binary"))
+            await writer.drain()
+            if await Frames.read(reader, 1 << 30) is None:
+                raise ConnectionError("Connection closed by the server")
+            t2: float = END_MEASUREMENT()
+            latency.append(t2 - t1)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+async def run_async(requests: List[List[Message]]) -> Tuple[List[float], float]:
+    server: AsyncServer = AsyncServer(ARGS.executor, ARGS.workers, max_connections=len(requests))
+    path: Path = Path(tempfile.mkdtemp(), "async_server.sock")
+    listener: asyncio.AbstractServer = await server.start(path=path)
+    latency: List[float] = []
+    try:
+        t1: float = START_MEASUREMENT()
+        await asyncio.gather(*(async_device(path, messages, latency) for messages in requests))
+        t2: float = END_MEASUREMENT()
+    finally:
+        listener.close()
+        await listener.wait_closed()
+        server.shutdown()
+        os.remove(path)
+        os.rmdir(path.parent)
+    return latency, t2 - t1
+
+class Collector(Actor):
+    """
+    Takes the place of the device actor: forwards the answers of the server actors to the benchmark.
+    """
+    def __init__(self) -> None:
+        self.requester: Any = None
+
+    def receiveMessage(self, message: Any, sender: ActorAddress) -> None:
+        if message == "register":
+            self.requester = sender
+        elif isinstance(message, tuple) and (self.requester is not None):
+            self.send(self.requester, message)
+
+def run_actors(requests: List[List[Message]]) -> Tuple[List[float], float]:
+    asys, admin_port = SystemBase.start(ARGS.base)
+    latency: List[float] = []
+    try:
+        addresses: Addresses = Addresses(asys.createActor("server.Server", globalName="Server"), asys.createActor(Collector))
+        asys.tell(addresses.device_addr, "register")
+        started: Dict[str, float] = {}
+        position: List[int] = [0] * len(requests)
+
+        def send(device: int) -> None:
+            message: Message = requests[device][position[device]]
+            message.addresses = addresses
+            position[device] += 1
+            started[message.mdata.nonce] = START_MEASUREMENT()
+            asys.tell(addresses.server_addr, (Utils.pack_message(message), addresses))
+
+        t1: float = START_MEASUREMENT()
+        for device in range(len(requests)):
+            send(device)
+        while len(latency) < len(requests) * ARGS.requests:
+            answer: Any = asys.listen(60)
+            if answer is None:
+                raise TimeoutError("No answer of the server actors")
+            if not isinstance(answer, tuple):
+                continue
+            nonce: str = Utils.open_tuple(DEVICE, answer).mdata.nonce
+            latency.append(END_MEASUREMENT() - started.pop(nonce))
+            device: int = int(nonce.split("_")[0])
+            if position[device] < ARGS.requests:
+                send(device)
+        t2: float = END_MEASUREMENT()
+    finally:
+        SystemBase.shutdown(ARGS.base, admin_port)
+    return latency, t2 - t1
+
+if __name__ == "__main__":
+    foha.createFolder(D_STORAGE)
+    foha.createFolder(S_STORAGE)
+    foha.createFolder(S_DATA_STORAGE)
+    gen_keys()
+    rows: List[List[Any]] = []
+
+    for engine, devices in (("asyncio", ARGS.devices), ("actors", ARGS.actor_devices)):
+        requests: List[List[Message]] = gen_requests(devices, Addresses(None, None))
+        if engine == "asyncio":
+            latency, duration = asyncio.run(run_async(requests))
+        else:
+            latency, duration = run_actors(requests)
+        latency_median, latency_p95, throughput = results(latency, duration)
+        rows.append([engine, devices, ARGS.requests, latency_median, latency_p95, throughput])
+        print(f"{engine}: {devices} devices, latency median {latency_median} {UNIT}, p95 {latency_p95} {UNIT}, {throughput} requests per {UNIT}")
+
+    with open(f"{filepath}.csv", "w", encoding="UTF8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["engine", "devices", "requests per device", f"latency median ({UNIT})", f"latency p95 ({UNIT})", f"requests per {UNIT}"])
+        writer.writerows(rows)
@@ -0,0 +1,133 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+"""
+This file contains a benchmark of the chunked update transfer (app.py --chunked-update) over a simulated lossy link:
+throughput for different window sizes (chunks per round trip and cycles for checking and writing the chunks)
+and resuming an interrupted download compared with starting over.
+"""
+# Go one level up in the directory to use modules from the parent directory
+import os
+import sys
+currentdir: str = os.path.dirname(os.path.realpath(__file__))
+parentdir: str = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+import csv
+import random
+import shutil
+import tempfile
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median
+from typing import Any, List, Optional, Tuple
+
+from settings import UNIT, START_MEASUREMENT, END_MEASUREMENT, M_APP_BENCHMARKING_FUNCTIONS, UPDATE_CHUNK_SIZE
+from modules.messagetypes import Update, UpdateManifest
+from modules.updateimage import UpdateImage
+from modules.chunked import ChunkedUpdate, ChunkDownload
+
+parser = ArgumentParser(
+    description=""" Benchmark of the chunked update transfer (throughput and resume). """)
+
+parser.add_argument("--number", dest="number", type=int, help="Number of measurements", default=10)
+parser.add_argument("--size", dest="size", type=int, help="Size of the update image in bytes", default=8 * 1024 * 1024)
+parser.add_argument("--chunk-size", dest="chunk_size", type=int, help="Chunk size in bytes", default=UPDATE_CHUNK_SIZE)
+parser.add_argument("--loss", dest="loss", type=float, help="Probability that a chunk is lost on the link", default=0.05)
+parser.add_argument("--windows", dest="windows", help="Comma separated window sizes", default="1,2,4,8,16,32")
+parser.add_argument("--interrupt", dest="interrupt", type=float, help="Fraction of the image after which the download is interrupted", default=0.5)
+
+ARGS = parser.parse_args()
+number = ARGS.number
+windows: List[int] = [int(window) for window in ARGS.windows.split(",")]
+
+filepath: Path = Path("..", M_APP_BENCHMARKING_FUNCTIONS, f"{UNIT}_chunked_update")
+
+def transfer(download: ChunkDownload, image: UpdateImage, window: int, loss: float, rng: random.Random, stop_after: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Downloads the image over the simulated link and returns the number of round trips and of transferred chunks.
+    Each round trip the device requests up to window chunks; lost chunks time out and are requested again.
+    """
+    round_trips: int = 0
+    transferred: int = 0
+    while not download.complete:
+        round_trips += 1
+        for index in download.requests(window):
+            transferred += 1
+            if rng.random() < loss:
+                continue
+            download.receive(index, ChunkedUpdate.read_chunk(image, index, download.manifest.chunk_size))
+        # Requests that have not been answered within this round trip
+        download.timed_out(0.0)
+        if (stop_after is not None) and (download.verified >= stop_after):
+            break
+    return round_trips, transferred
+
+def new_download(manifest: UpdateManifest, path: Path) -> ChunkDownload:
+    # No limit for retries, the simulated link loses chunks on purpose
+    return ChunkDownload(manifest, path, manifest.name, retries=sys.maxsize)
+
+if __name__ == "__main__":
+    rng: random.Random = random.Random(0)
+    server_dir: Path = Path(tempfile.mkdtemp())
+    device_dir: Path = Path(tempfile.mkdtemp())
+    rows: List[List[Any]] = []
+
+    try:
+        image: UpdateImage = UpdateImage.write(os.urandom(ARGS.size), UpdateImage.blob_path(server_dir, "update"))
+        t1: float = START_MEASUREMENT()
+        manifest: UpdateManifest = ChunkedUpdate.manifest(Update("LZ_core_update", image, 1, 0), ARGS.chunk_size)
+        t2: float = END_MEASUREMENT()
+        print(f"Manifest of {len(manifest.chunk_hashes)} chunks created in {t2 - t1} {UNIT}.")
+
+        # Throughput for the window sizes
+        for window in windows:
+            results: List[Tuple[int, int, float]] = []
+            for _ in range(number):
+                download: ChunkDownload = new_download(manifest, device_dir)
+                t1 = START_MEASUREMENT()
+                round_trips, transferred = transfer(download, image, window, ARGS.loss, rng)
+                t2 = END_MEASUREMENT()
+                download.finish().remove()
+                results.append((round_trips, transferred, t2 - t1))
+
+            round_trips = median(result[0] for result in results)
+            cycles: float = median(result[2] for result in results)
+            rows.append(["throughput", window, ARGS.loss, round_trips, median(result[1] for result in results),
+                         len(manifest.chunk_hashes) / round_trips, cycles, manifest.length / cycles])
+            print(f"Window {window}: {round_trips} round trips, {len(manifest.chunk_hashes) / round_trips:.2f} chunks per round trip, {cycles} {UNIT}")
+
+        # Resume after an interruption compared with starting over
+        window: int = max(windows)
+        stop_after: int = int(len(manifest.chunk_hashes) * ARGS.interrupt)
+        results = []
+        for _ in range(number):
+            transfer(new_download(manifest, device_dir), image, window, ARGS.loss, rng, stop_after)
+            # Reset: a new download of the same manifest continues from the saved progress
+            download = new_download(manifest, device_dir)
+            resumed: int = download.resumed
+            t1 = START_MEASUREMENT()
+            round_trips, transferred = transfer(download, image, window, ARGS.loss, rng)
+            t2 = END_MEASUREMENT()
+            download.finish().remove()
+            results.append((round_trips, transferred, t2 - t1, resumed))
+
+        resumed_chunks: float = median(result[3] for result in results)
+        rows.append(["resume", window, ARGS.loss, median(result[0] for result in results), median(result[1] for result in results),
+                     resumed_chunks, median(result[2] for result in results), None])
+        print(f"Resume: {resumed_chunks} of {len(manifest.chunk_hashes)} chunks kept, {median(result[1] for result in results)} chunks transferred after the reset")
+
+    finally:
+        shutil.rmtree(server_dir, ignore_errors=True)
+        shutil.rmtree(device_dir, ignore_errors=True)
+
+    # throughput: chunks per round trip in the 6th column; resume: chunks kept from before the interruption
+    with open(f"{filepath}.csv", "w", encoding="UTF8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["mode", "window", "loss", "round_trips", "transferred_chunks", "chunks_per_round_trip | resumed_chunks", f"time ({UNIT})", f"Bytes per {UNIT}"])
+        writer.writerows(rows)
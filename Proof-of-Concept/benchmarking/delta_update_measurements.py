@@ -0,0 +1,95 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+"""
+This file contains a benchmark of the binary delta updates (app.py --delta-update):
+size of the delta compared with the full image and cycles for creating (server) and applying (device) the delta
+for images with a different share of changed bytes.
+"""
+# Go one level up in the directory to use modules from the parent directory
+import os
+import sys
+currentdir: str = os.path.dirname(os.path.realpath(__file__))
+parentdir: str = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+import csv
+import random
+import shutil
+import tempfile
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median
+from typing import Any, List
+
+from settings import UNIT, START_MEASUREMENT, END_MEASUREMENT, M_APP_BENCHMARKING_FUNCTIONS, DELTA_BLOCK_SIZE
+from modules.delta import BlockDelta
+
+parser = ArgumentParser(
+    description=""" Benchmark of the binary delta updates (delta size, diff and apply). """)
+
+parser.add_argument("--number", dest="number", type=int, help="Number of measurements", default=10)
+parser.add_argument("--size", dest="size", type=int, help="Size of the update image in bytes", default=4 * 1024 * 1024)
+parser.add_argument("--block-size", dest="block_size", type=int, help="Block size of the delta in bytes", default=DELTA_BLOCK_SIZE)
+parser.add_argument("--changes", dest="changes", help="Comma separated shares of changed bytes", default="0.001,0.01,0.05,0.2")
+
+ARGS = parser.parse_args()
+number = ARGS.number
+changes: List[float] = [float(change) for change in ARGS.changes.split(",")]
+
+filepath: Path = Path("..", M_APP_BENCHMARKING_FUNCTIONS, f"{UNIT}_delta_update")
+
+def new_version(base: bytes, change: float, rng: random.Random) -> bytes:
+    # Changes, inserts and deletes runs of 64 bytes at random positions, like a rebuilt firmware image
+    target: bytearray = bytearray(base)
+    for _ in range(max(1, int(len(base) * change / 64))):
+        pos: int = rng.randrange(len(target))
+        operation: int = rng.randrange(3)
+        if operation == 0:
+            target[pos:pos + 64] = os.urandom(64)
+        elif operation == 1:
+            target[pos:pos] = os.urandom(64)
+        else:
+            del target[pos:pos + 64]
+    return bytes(target)
+
+if __name__ == "__main__":
+    rng: random.Random = random.Random(0)
+    device_dir: Path = Path(tempfile.mkdtemp())
+    rows: List[List[Any]] = []
+
+    try:
+        base: bytes = os.urandom(ARGS.size)
+        installed: Path = Path(device_dir, "installed.img")
+        for change in changes:
+            target: bytes = new_version(base, change, rng)
+            results: List[List[float]] = []
+            for _ in range(number):
+                t1: float = START_MEASUREMENT()
+                delta: bytes = BlockDelta.diff(base, target, ARGS.block_size)
+                t2: float = END_MEASUREMENT()
+                with open(installed, "wb") as file:
+                    file.write(base)
+                t3: float = START_MEASUREMENT()
+                BlockDelta.apply(delta, installed, installed)
+                t4: float = END_MEASUREMENT()
+                results.append([len(delta), t2 - t1, t4 - t3])
+
+            delta_size: float = median(result[0] for result in results)
+            rows.append([change, ARGS.block_size, len(target), delta_size, delta_size / len(target),
+                         median(result[1] for result in results), median(result[2] for result in results)])
+            print(f"Change {change}: delta of {delta_size} bytes for {len(target)} bytes ({delta_size / len(target):.2%}), "
+                  f"diff {rows[-1][5]} {UNIT}, apply {rows[-1][6]} {UNIT}")
+
+    finally:
+        shutil.rmtree(device_dir, ignore_errors=True)
+
+    with open(f"{filepath}.csv", "w", encoding="UTF8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["change", "block_size", "image_size", "delta_size", "ratio", f"diff ({UNIT})", f"apply ({UNIT})"])
+        writer.writerows(rows)
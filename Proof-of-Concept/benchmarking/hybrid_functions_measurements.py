@@ -0,0 +1,80 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+"""
+This file contains a test scenario for hybrid signatures (classic + pqc over the same message): generating both key pairs, signing and verifying the message,
+where the hybrid operations and each component are measured, to compare the cost of hybrid signatures with either signature alone.
+"""
+# Go one level up in the directory to use modules from the parent directory
+import os
+import sys
+currentdir: str = os.path.dirname(os.path.realpath(__file__))
+parentdir: str = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+from pathlib import Path
+from argparse import ArgumentParser
+from settings import S_STORAGE, D_STORAGE, HEADER_FUNCTIONS_HYBRID, M_APP_BENCHMARKING_FUNCTIONS, UNIT
+
+# Imports of own classes and modules
+from modules.filehandling import DataHandling as dh
+from modules.crypto import KeyGen, Hybrid, Prehash
+
+parser = ArgumentParser(
+    description=""" Test script for hybrid (classic + pqc) signatures. """)
+
+parser.add_argument("--number", dest="number", type=int, help="", default=1)
+parser.add_argument("--hash", dest="hash_algo", help="", default="sha256", choices=["sha256", "sha384", "sha512", "sha3_256", "sha3_384", "sha3_512", "shake128", "shake256"])
+parser.add_argument("--variant", dest="variant", help="<classic>+<pqc>", default="secp256r1+Dilithium2")
+parser.add_argument("--msg-len", dest="msg_len", type=int, help="Message length in bytes", default=64)
+
+ARGS = parser.parse_args()
+# How often the measurement will be taken
+number = ARGS.number
+hash_algo = ARGS.hash_algo
+variant = ARGS.variant
+msg_len = ARGS.msg_len
+
+# Variables
+filename: str = f"{UNIT}_hybrid_{variant}_{hash_algo}"
+filepath: Path = Path("..", M_APP_BENCHMARKING_FUNCTIONS, filename)
+
+#######################################################################
+# Hybrid Signature
+#######################################################################
+
+if __name__ == "__main__":
+
+    if variant is not None:
+        print(ARGS)
+        b_msg: bytes = os.urandom(msg_len)
+        # mbedtls hashes the message itself
+        mbedtls_hash: str = Prehash.mbedtls_hashtype(hash_algo)
+
+        name = "test"
+        dh.set_header(filepath, HEADER_FUNCTIONS_HYBRID)
+        print(f"***** Measuring the runtime of the hybrid variant {variant} *****")
+
+        for i in range (1,number+1):
+            print(f"Measurement number: {i} Variant: {variant}")
+            # Generate the classic and the pqc key pair
+            pub_keys, priv_keys, data_gen, unit = KeyGen.gen_keypair_hybrid(variant, name, D_STORAGE, S_STORAGE)
+            print(f"time_taken keygen: {data_gen} {unit}.")
+
+            # Sign the message with both algorithms (concurrently)
+            signature, data_sign, unit = Hybrid.sign(b_msg, D_STORAGE, f"{name}_priv_key", variant, mbedtls_hash)
+            print(f"time_taken sign: {data_sign} {unit}.")
+
+            # Verify both signatures (concurrently)
+            is_valid, data_verify, unit = Hybrid.verify(b_msg, signature, S_STORAGE, f"{name}_pub_key", variant, mbedtls_hash)
+            print(f"time_taken verify: {data_verify} {unit}.")
+
+            # Save the runtime benchmarking to csv file for future reference
+            dh.save_to_csv_functions_hybrid(Path("..", M_APP_BENCHMARKING_FUNCTIONS), i, filename, data_gen, data_sign, data_verify, str(is_valid))
+
+            print("Valid signature?", is_valid)
@@ -0,0 +1,79 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+"""
+This file contains a micro-benchmark of the lazy decoding of the binary wire format: cycles of one routing hop
+(decode the received message, route it with former_step and mdata_type and pickle it to the next actor)
+with the complete decoding and with LazyMessage, for a deferral ticket and updates of different sizes.
+"""
+# Go one level up in the directory to use modules from the parent directory
+import os
+import sys
+currentdir: str = os.path.dirname(os.path.realpath(__file__))
+parentdir: str = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+import csv
+import pickle
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median
+from typing import Any, Callable, List
+
+from settings import UNIT, START_MEASUREMENT, END_MEASUREMENT, M_APP_BENCHMARKING_FUNCTIONS
+from modules.messagetypes import Addresses, DefTicket, Message, Update
+from modules.common import former_step
+from modules.wire import WireCodec
+
+parser = ArgumentParser(
+    description=""" Micro-benchmark of the lazy decoding of the binary wire format. """)
+
+parser.add_argument("--number", dest="number", type=int, help="Number of measurements", default=100)
+parser.add_argument("--sizes", dest="sizes", help="Comma separated sizes of the update images in bytes", default="1024,65536,1048576")
+
+ARGS = parser.parse_args()
+number = ARGS.number
+sizes: List[int] = [int(size) for size in ARGS.sizes.split(",")]
+
+filepath: Path = Path("..", M_APP_BENCHMARKING_FUNCTIONS, f"{UNIT}_lazy_message")
+
+def measure(operation: Callable[[], Any]) -> float:
+    results: List[float] = []
+    for _ in range(number):
+        t1: float = START_MEASUREMENT()
+        operation()
+        t2: float = END_MEASUREMENT()
+        results.append(t2 - t1)
+    return median(results)
+
+def hop(b_message: bytes, addresses: Addresses, decode: Callable[[bytes, Addresses], Message]) -> bytes:
+    # Received by the device actor, routed and forwarded to the next actor
+    message: Message = decode(b_message, addresses)
+    updated_message, _ = former_step(message, "server", "device", "device")
+    issubclass(updated_message.mdata_type, Update)
+    return pickle.dumps(updated_message)
+
+if __name__ == "__main__":
+    addresses: Addresses = Addresses("server", "device")
+    signature: bytes = os.urandom(666)
+    rows: List[List[Any]] = []
+
+    payloads: List[Any] = [("defticket", DefTicket("nonce", 30, 1700000000))]
+    payloads += [(f"update {size} Bytes", Update("LZ_core_update", os.urandom(size), 2, 1700000000)) for size in sizes]
+
+    for name, mdata in payloads:
+        b_message: bytes = WireCodec.encode(Message(addresses, ["server"], 0, signature, "pqc", "Falcon-512", 8, "sha256", mdata))
+        eager: float = measure(lambda: hop(b_message, addresses, WireCodec.decode))
+        lazy: float = measure(lambda: hop(b_message, addresses, WireCodec.decode_lazy))
+        rows.append([name, len(b_message), eager, lazy])
+        print(f"{name}: complete decoding {eager}, lazy decoding {lazy} {UNIT} per hop")
+
+    with open(f"{filepath}.csv", "w", encoding="UTF8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["mdata", "wire size (Bytes)", f"complete decoding ({UNIT})", f"lazy decoding ({UNIT})"])
+        writer.writerows(rows)
@@ -23,18 +23,20 @@ import oqs # liboqs library
 from pathlib import Path
 from argparse import ArgumentParser
 from typing import List
-from settings import S_STORAGE, D_STORAGE, HEADER_FUNCTIONS, M_APP_BENCHMARKING_FUNCTIONS, UNIT
+from settings import S_STORAGE, D_STORAGE, HEADER_FUNCTIONS, HEADER_FUNCTIONS_PREHASH, M_APP_BENCHMARKING_FUNCTIONS, UNIT
 
 # Imports of own classes and modules
 from modules.filehandling import DataHandling as dh
-from modules.crypto import KeyGen, KeyUsage, SignMessage, VerifyMessage
+from modules.crypto import KeyGen, KeyUsage, SignMessage, VerifyMessage, Prehash
 
 parser = ArgumentParser(
     description=""" Liboqs test script for liboqs library. """)
 
 parser.add_argument("--number", dest="number", type=int, help="", default=1)
-parser.add_argument("--hash", dest="hash_algo", help="", default="sha256", choices=["sha256", "sha384", "sha512"]) # msg_len 64, 96 or 128 for Hashalgo 256, 384 or 512 
+parser.add_argument("--hash", dest="hash_algo", help="", default="sha256", choices=["sha256", "sha384", "sha512", "sha3_256", "sha3_384", "sha3_512", "shake128", "shake256"]) # msg_len 64, 96 or 128 for Hashalgo 256, 384 or 512 
 parser.add_argument("--variant", dest="variant", help="", default="Falcon-512")
+parser.add_argument("--prehash", dest="prehash", action="store_true", default=False, help="Sign only the digest of the message")
+parser.add_argument("--msg-len", dest="msg_len", type=int, help="Message length in bytes (default depends on --hash)", default=None)
 
 ARGS = parser.parse_args()
 # How often the measurement will be taken
@@ -42,10 +44,13 @@ number = ARGS.number
 hash_algo = ARGS.hash_algo
 # Variant of the pqc algorithm to use for key generation
 variant = ARGS.variant
+prehash = ARGS.prehash
 
-if hash_algo == "sha512":
+if ARGS.msg_len is not None:
+    msg_len = ARGS.msg_len
+elif hash_algo in ["sha512", "sha3_512", "shake256"]:
     msg_len = 128
-elif hash_algo == "sha384":
+elif hash_algo in ["sha384", "sha3_384"]:
     msg_len = 96
 else:
     msg_len = 64
@@ -60,6 +65,8 @@ sphincsp_shake256_algos: List[str] = ["SPHINCS+-SHAKE256-128f-robust", "SPHINCS+
 
 # Variables
 filename: str = f"{UNIT}_liboqs_{variant}_{hash_algo}"
+if prehash:
+    filename = f"{filename}_prehash_{msg_len}"
 filepath: Path = Path("..", M_APP_BENCHMARKING_FUNCTIONS, filename)
 
 #######################################################################
@@ -79,7 +86,7 @@ if __name__ == "__main__":
         b_msg: bytes = os.urandom(msg_len)
 
         name = "test"
-        dh.set_header(filepath, HEADER_FUNCTIONS)
+        dh.set_header(filepath, HEADER_FUNCTIONS_PREHASH if prehash else HEADER_FUNCTIONS)
         print(f"***** Measuring the runtime of algorithm {sigalg} *****")
 
         for i in range (1,number+1):
@@ -91,18 +98,25 @@ if __name__ == "__main__":
             # Read private key from file (device)
             priv_key_new: bytes = KeyUsage.open_and_save_key_bytes(D_STORAGE, f"{name}_priv_key", "der")
 
+            # Hash the message first in prehash mode and sign only the digest
+            data_prehash = None
+            b_to_sign: bytes = b_msg
+            if prehash:
+                b_to_sign, data_prehash, unit = Prehash.digest(b_msg, hash_algo)
+                print(f"time_taken prehash: {data_prehash} {unit}.")
+
             # Sign the message
-            signature, data_sign, unit = SignMessage.liboqs_sign(sigalg, priv_key_new, b_msg)
+            signature, data_sign, unit = SignMessage.liboqs_sign(sigalg, priv_key_new, b_to_sign)
             print(f"time_taken sign: {data_sign} {unit}.")
 
             # Read pub_key from file (server)
             pub_key_new: bytes = KeyUsage.open_and_save_key_bytes(S_STORAGE, f"{name}_pub_key", "der")
 
             # Verify the signature
-            is_valid, data_verify, unit = VerifyMessage.liboqs_verify(sigalg, pub_key_new, b_msg, signature)
+            is_valid, data_verify, unit = VerifyMessage.liboqs_verify(sigalg, pub_key_new, b_to_sign, signature)
             print(f"time_taken verify: {data_verify} {unit}.")
 
             # Save the runtime benchmarking to csv file for future reference
-            dh.save_to_csv_functions(Path("..", M_APP_BENCHMARKING_FUNCTIONS), i, filename, data_gen, data_sign, data_verify, str(is_valid))
+            dh.save_to_csv_functions(Path("..", M_APP_BENCHMARKING_FUNCTIONS), i, filename, data_gen, data_sign, data_verify, str(is_valid), data_prehash)
 
             print("Valid signature?", is_valid)
@@ -14,25 +14,30 @@ sys.path.append(parentdir)
 
 from argparse import ArgumentParser
 from pathlib import Path
-from modules.crypto import KeyGen, KeyUsage
+from modules.crypto import KeyGen, KeyUsage, Prehash
 from modules.filehandling import DataHandling as dh
-from settings import UNIT, S_STORAGE, D_STORAGE, HEADER_FUNCTIONS, START_MEASUREMENT, END_MEASUREMENT, M_APP_BENCHMARKING_FUNCTIONS
+from settings import UNIT, S_STORAGE, D_STORAGE, HEADER_FUNCTIONS, HEADER_FUNCTIONS_PREHASH, START_MEASUREMENT, END_MEASUREMENT, M_APP_BENCHMARKING_FUNCTIONS
 
 parser_bedtls = ArgumentParser(
     description=""" Mbedtls test script for function benchmarking. """)
 
 parser_bedtls.add_argument("--number", dest="number", type=int, help="", default=1)
-parser_bedtls.add_argument("--hash", dest="hash_algo", help="", default="sha256", choices=["sha256", "sha384", "sha512"]) # msg_len 64, 96 or 128 for Hashalgo 256, 384 or 512 
+parser_bedtls.add_argument("--hash", dest="hash_algo", help="", default="sha256", choices=["sha256", "sha384", "sha512", "sha3_256", "sha3_384", "sha3_512", "shake128", "shake256"]) # msg_len 64, 96 or 128 for Hashalgo 256, 384 or 512 
 parser_bedtls.add_argument("--variant", dest="variant", help="", default="secp256r1") 
+parser_bedtls.add_argument("--prehash", dest="prehash", action="store_true", default=False, help="Sign only the digest of the message")
+parser_bedtls.add_argument("--msg-len", dest="msg_len", type=int, help="Message length in bytes (default depends on --hash)", default=None)
 
 ARGS = parser_bedtls.parse_args()
 number = ARGS.number
 hash_algo = ARGS.hash_algo
 variant = ARGS.variant
+prehash = ARGS.prehash
 
-if hash_algo == "sha512":
+if ARGS.msg_len is not None:
+    msg_len = ARGS.msg_len
+elif hash_algo in ["sha512", "sha3_512", "shake256"]:
     msg_len = 128
-elif hash_algo == "sha384":
+elif hash_algo in ["sha384", "sha3_384"]:
     msg_len = 96
 else:
     msg_len = 64
@@ -41,19 +46,31 @@ else:
 from mbedtls.pk import ECC, RSA
 
 filename: str = f"{UNIT}_{variant}_{hash_algo}"
+if prehash:
+    filename = f"{filename}_prehash_{msg_len}"
 filepath: Path = Path("..", M_APP_BENCHMARKING_FUNCTIONS, filename)
 
 if __name__ == "__main__":
 
     if variant is not None:
         message: bytes = os.urandom(msg_len)
+        b_payload: bytes = message
         name = "test"
+
+        # mbedtls hashes the message (or the digest in prehash mode) itself
+        mbedtls_hash: str = Prehash.mbedtls_hashtype(hash_algo)
         
-        dh.set_header(filepath, HEADER_FUNCTIONS)
+        dh.set_header(filepath, HEADER_FUNCTIONS_PREHASH if prehash else HEADER_FUNCTIONS)
         print(f"***** Measuring the runtime of a classic algorithm *****")
 
         for i in range (1,number+1):
             print(f"Measurement number: {i} Variant: {variant}")
+            data_prehash = None
+            if prehash:
+                # Hash the message first and sign only the digest
+                message, data_prehash, unit = Prehash.digest(b_payload, hash_algo)
+                print(f"prehash took {data_prehash} {UNIT}.")
+
             if "rsa" not in variant:
                 # Generate and save a key_pair
                 pub_key, priv_key, data_gen, unit = KeyGen.gen_keypair_classic(name=name, priv_storage=D_STORAGE, pub_storage=S_STORAGE, variant=variant)
@@ -63,7 +80,7 @@ if __name__ == "__main__":
 
                 # Sign the message (bytes)
                 t1 = START_MEASUREMENT()
-                signature: bytes = priv_key_ECC.sign(message, hash_algo) 
+                signature: bytes = priv_key_ECC.sign(message, mbedtls_hash) 
                 t2 = END_MEASUREMENT()
                 
                 data_sign: float = t2 - t1
@@ -74,7 +91,7 @@ if __name__ == "__main__":
 
                 # Verify the signature
                 t1 = START_MEASUREMENT()
-                valid = d_pub_key_ECC.verify(message, signature, hash_algo) 
+                valid = d_pub_key_ECC.verify(message, signature, mbedtls_hash) 
                 t2 = END_MEASUREMENT()
 
                 data_verify: float = t2 - t1
@@ -90,7 +107,7 @@ if __name__ == "__main__":
 
                 # Sign the message (bytes)
                 t1 = START_MEASUREMENT()
-                signature: bytes = priv_key_RSA.sign(message, hash_algo) 
+                signature: bytes = priv_key_RSA.sign(message, mbedtls_hash) 
                 t2 = END_MEASUREMENT()
 
                 sig_str: str = signature.hex()  # Converting bytes to string
@@ -105,11 +122,11 @@ if __name__ == "__main__":
 
                 # Verify the signature
                 t1 = START_MEASUREMENT()
-                valid = d_pub_key_RSA.verify(message, b_sig, hash_algo) 
+                valid = d_pub_key_RSA.verify(message, b_sig, mbedtls_hash) 
                 t2 = END_MEASUREMENT()
 
                 data_verify: float = t2 - t1
                 print(f"verify took {data_verify} {UNIT}.")
                 print(f"Valid signature? {valid}")
     
-            dh.save_to_csv_functions(Path("..", M_APP_BENCHMARKING_FUNCTIONS), i, filename, data_gen, data_sign, data_verify, str(valid))
+            dh.save_to_csv_functions(Path("..", M_APP_BENCHMARKING_FUNCTIONS), i, filename, data_gen, data_sign, data_verify, str(valid), data_prehash)
@@ -0,0 +1,152 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+"""
+This file contains a micro-benchmark of the messagetypes: memory per Message (with a DefTicket), packing/unpacking with the
+generated codec tables and pickling (as done on every actor hop), compared with plain classes (__dict__) and the former isinstance/if-elif chains.
+"""
+# Go one level up in the directory to use modules from the parent directory
+import os
+import sys
+currentdir: str = os.path.dirname(os.path.realpath(__file__))
+parentdir: str = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+import csv
+import pickle
+import tracemalloc
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median
+from typing import Any, Callable, Dict, List
+
+from settings import UNIT, START_MEASUREMENT, END_MEASUREMENT, M_APP_BENCHMARKING_FUNCTIONS
+from modules.messagetypes import Addresses, DefTicket, Message
+from modules.utils import Utils
+
+parser = ArgumentParser(
+    description=""" Micro-benchmark of slotted messagetypes and generated codecs. """)
+
+parser.add_argument("--number", dest="number", type=int, help="Number of measurements", default=100)
+parser.add_argument("--batch", dest="batch", type=int, help="Operations per measurement", default=1000)
+
+ARGS = parser.parse_args()
+number = ARGS.number
+batch = ARGS.batch
+
+filepath: Path = Path("..", M_APP_BENCHMARKING_FUNCTIONS, f"{UNIT}_messagetypes")
+
+#######################################################################
+# Former messagetypes (plain classes) and packing (if-elif chain)
+#######################################################################
+
+class LegacyDefTicket(object):
+    name: str = "defticket"
+    def __init__(self, nonce: str, deferral_time: int, timestamp: int) -> None:
+        self.nonce = nonce
+        self.deferral_time = deferral_time
+        self.timestamp = timestamp
+
+class LegacyMessage(object):
+    name: str = "message"
+    def __init__(self, addresses: Addresses, sequence_list: List[str], state: int, signature: bytes, crypto: str, variant: str, scenario: int, hash_algo: str, mdata: Any, proof: Any = None) -> None:
+        self.addresses = addresses
+        self.sequence_list = sequence_list
+        self.state = state
+        self.signature = signature
+        self.crypto = crypto
+        self.variant = variant
+        self.scenario = scenario
+        self.hash_algo = hash_algo
+        self.mdata = mdata
+        self.proof = proof
+
+def legacy_pack(msg_obj: Any) -> Dict[str, Any]:
+    msg: Dict[str, Any] = {"messagetype": msg_obj.name, "data": {}}
+    if isinstance(msg_obj, LegacyMessage):
+        msg["addresses"] = {"server_addr": str(msg_obj.addresses.server_addr), "device_addr": str(msg_obj.addresses.device_addr)}
+        msg["sequence_list"] = msg_obj.sequence_list
+        msg["state"] = msg_obj.state
+        msg["signature"] = msg_obj.signature
+        msg["crypto"] = msg_obj.crypto
+        msg["variant"] = msg_obj.variant
+        msg["scenario"] = msg_obj.scenario
+        msg["hash_algo"] = msg_obj.hash_algo
+        msg["data"]["mdata"] = msg_obj.mdata
+        msg["proof"] = msg_obj.proof
+    elif isinstance(msg_obj, LegacyDefTicket):
+        msg["data"]["nonce"] = msg_obj.nonce
+        msg["data"]["deferral_time"] = msg_obj.deferral_time
+        msg["data"]["timestamp"] = msg_obj.timestamp
+    return msg
+
+def legacy_unpack(msg: Dict[str, Any], addresses: Addresses) -> Any:
+    msg_type: str = msg["messagetype"]
+    if msg_type == "message":
+        return LegacyMessage(addresses, msg["sequence_list"], msg["state"], msg["signature"], msg["crypto"], msg["variant"], msg["scenario"], msg["hash_algo"], msg["data"]["mdata"], msg.get("proof"))
+    elif msg_type == "defticket":
+        return LegacyDefTicket(msg["data"]["nonce"], msg["data"]["deferral_time"], msg["data"]["timestamp"])
+
+#######################################################################
+# Measurements
+#######################################################################
+
+def measure(operation: Callable[[], Any]) -> float:
+    # Median cycles of one operation
+    results: List[float] = []
+    for _ in range(number):
+        t1: float = START_MEASUREMENT()
+        for _ in range(batch):
+            operation()
+        t2: float = END_MEASUREMENT()
+        results.append((t2 - t1) / batch)
+    return median(results)
+
+def memory_per_message(create: Callable[[], Any]) -> float:
+    # Bytes allocated per message (including its DefTicket)
+    tracemalloc.start()
+    before: int = tracemalloc.get_traced_memory()[0]
+    messages: List[Any] = [create() for _ in range(batch)]
+    after: int = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del messages
+    return (after - before) / batch
+
+if __name__ == "__main__":
+    addresses: Addresses = Addresses("server", "device")
+    signature: bytes = os.urandom(666)
+
+    def new_message() -> Message:
+        return Message(addresses, ["device", "verifier"], 1, signature, "pqc", "Falcon-512", 4, "sha256", DefTicket("nonce", 30, 1700000000))
+
+    def new_legacy_message() -> LegacyMessage:
+        return LegacyMessage(addresses, ["device", "verifier"], 1, signature, "pqc", "Falcon-512", 4, "sha256", LegacyDefTicket("nonce", 30, 1700000000))
+
+    message: Message = new_message()
+    legacy_message: LegacyMessage = new_legacy_message()
+    packed: Dict[str, Any] = Utils.pack_json(message)
+    legacy_packed: Dict[str, Any] = legacy_pack(legacy_message)
+    pickled: bytes = pickle.dumps(message)
+    legacy_pickled: bytes = pickle.dumps(legacy_message)
+
+    rows: List[List[Any]] = [
+        ["memory per message (Bytes)", memory_per_message(new_legacy_message), memory_per_message(new_message)],
+        [f"pack_json message + defticket ({UNIT})", measure(lambda: (legacy_pack(legacy_message), legacy_pack(legacy_message.mdata))), measure(lambda: (Utils.pack_json(message), Utils.pack_json(message.mdata)))],
+        [f"unpack_json message ({UNIT})", measure(lambda: legacy_unpack(legacy_packed, addresses)), measure(lambda: Utils.unpack_json(packed, addresses))],
+        [f"pickle message ({UNIT})", measure(lambda: pickle.dumps(legacy_message)), measure(lambda: pickle.dumps(message))],
+        [f"unpickle message ({UNIT})", measure(lambda: pickle.loads(legacy_pickled)), measure(lambda: pickle.loads(pickled))],
+        ["pickled size (Bytes)", len(legacy_pickled), len(pickled)]
+    ]
+
+    with open(f"{filepath}.csv", "w", encoding="UTF8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["operation", "plain", "slotted"])
+        writer.writerows(rows)
+
+    for operation, plain, slotted in rows:
+        print(f"{operation}: plain {plain:.1f}, slotted {slotted:.1f}")
@@ -0,0 +1,145 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+"""
+This file contains a benchmark of the sharded server (sharded_server.py): issued deferral tickets per second with
+1, 2, 4, ... shard processes, all devices requesting at the same time, and the devices moved to another shard
+when one more shard is added to the running server (with consistent hashing about 1/(N+1) of the devices).
+The devices share one key pair (signed before the measurement), each device folder gets a copy of the public key.
+"""
+# Go one level up in the directory to use modules from the parent directory
+import os
+import sys
+currentdir: str = os.path.dirname(os.path.realpath(__file__))
+parentdir: str = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+import asyncio
+import csv
+import shutil
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import settings
+from settings import UNIT, M_APP_BENCHMARKING_FUNCTIONS, DEVICE, D_PRIV_KEY, SHARD_WORKERS
+from modules.crypto import KeyGen, SignMessage
+from modules.messagetypes import Addresses, Message, Request
+from async_server import Frames
+from sharded_server import ShardedServer
+
+parser = ArgumentParser(
+    description=""" Benchmark of the server sharded by device identity. """)
+
+parser.add_argument("--shards", dest="shards", help="Comma separated numbers of shard processes", default="1,2,4")
+parser.add_argument("--devices", dest="devices", type=int, help="Devices connected at the same time", default=64)
+parser.add_argument("--requests", dest="requests", type=int, help="Deferral ticket requests of each device", default=20)
+parser.add_argument("--crypto", dest="crypto", help="", default="classic", choices=["none", "pqc", "classic", "hybrid"])
+parser.add_argument("--variant", dest="variant", help="", default="secp256r1")
+parser.add_argument("--hash", dest="hash_algo", help="", default="sha256")
+parser.add_argument("--wire", dest="wire", default="json", help="Format of the messages", choices=["json", "binary"])
+parser.add_argument("--executor", dest="executor", default="thread", help="Pool of each shard", choices=["thread", "process"])
+parser.add_argument("--workers", dest="workers", type=int, default=SHARD_WORKERS, help="Pool workers of each shard")
+
+ARGS = parser.parse_args()
+settings.wire = ARGS.wire
+shard_counts: List[int] = [int(shards) for shards in ARGS.shards.split(",")]
+
+filepath: Path = Path("..", M_APP_BENCHMARKING_FUNCTIONS, f"{UNIT}_sharded_server")
+
+def gen_keypair(name: str, priv_storage: Path, pub_storage: Path) -> None:
+    if ARGS.crypto == "classic":
+        KeyGen.gen_keypair_classic(name=name, priv_storage=priv_storage, pub_storage=pub_storage, variant=ARGS.variant)
+    elif ARGS.crypto == "pqc":
+        KeyGen.gen_keypair_pqc(sigalg=ARGS.variant, name=name, priv_storage=priv_storage, pub_storage=pub_storage)
+    elif ARGS.crypto == "hybrid":
+        KeyGen.gen_keypair_hybrid(variant=ARGS.variant, name=name, priv_storage=priv_storage, pub_storage=pub_storage)
+
+def gen_frames(device_storage: Path) -> List[List[bytes]]:
+    # Encoded signed deferral ticket requests of each device, the nonce names device and request
+    frames: List[List[bytes]] = []
+    for device in range(ARGS.devices):
+        payloads: List[bytes] = []
+        for i in range(ARGS.requests):
+            message: Message = Message(Addresses(None, None), ["device"], 0, b"", ARGS.crypto, ARGS.variant, None, ARGS.hash_algo,
+                                       Request("defticket", int(datetime.now().timestamp()), f"{device}_{i}"))
+            if ARGS.crypto != "none":
+                message = SignMessage.sign(DEVICE, message, device_storage, D_PRIV_KEY, ARGS.variant, ARGS.crypto, ARGS.hash_algo)
+            payloads.append(Frames.encode(message, ARGS.wire == "binary"))
+        frames.append(payloads)
+    return frames
+
+async def device(path: Path, name: str, payloads: List[bytes]) -> int:
+    # Sends the requests one after the other and returns the number of tickets received
+    reader, writer = await asyncio.open_unix_connection(str(path))
+    tickets: int = 0
+    try:
+        Frames.write(writer, Frames.hello(name))
+        for payload in payloads:
+            Frames.write(writer, payload)
+            await writer.drain()
+            if await Frames.read(reader, 1 << 30) is None:
+                raise ConnectionError("Connection closed by the server")
+            tickets += 1
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return tickets
+
+async def run(shards: int, frames: List[List[bytes]], device_storage: Path, server_storage: Path) -> Tuple[float, int]:
+    # Tickets per second with the given number of shards, then the devices moved when one shard is added
+    storage: Path = Path(tempfile.mkdtemp())
+    path: Path = Path(storage, "router.sock")
+    server: ShardedServer = ShardedServer(shards, ARGS.executor, ARGS.workers, storage=Path(storage, "shards"), key_storage=server_storage, max_connections=ARGS.devices)
+    try:
+        listener: asyncio.AbstractServer = await server.start(path=path)
+        names: List[str] = [f"device_{i}" for i in range(ARGS.devices)]
+        # The public key of the devices (device_pub_key, or device_classic_pub_key and device_pqc_pub_key) in every device folder
+        for name in names:
+            for key_file in device_storage.glob("device_*pub_key*"):
+                shutil.copy(key_file, server.device_storage(name))
+
+        t1: float = time.monotonic()
+        tickets: List[int] = await asyncio.gather(*(device(path, name, payloads) for name, payloads in zip(names, frames)))
+        t2: float = time.monotonic()
+
+        moved: Dict[str, str] = await server.add_shard()
+        listener.close()
+        await listener.wait_closed()
+    finally:
+        server.shutdown()
+        shutil.rmtree(storage, ignore_errors=True)
+    return sum(tickets) / (t2 - t1), len(moved)
+
+if __name__ == "__main__":
+    keys: Path = Path(tempfile.mkdtemp())
+    device_storage: Path = Path(keys, "device")
+    server_storage: Path = Path(keys, "server")
+    os.makedirs(device_storage)
+    os.makedirs(server_storage)
+    gen_keypair("device", device_storage, device_storage)
+    gen_keypair("server", server_storage, device_storage)
+    frames: List[List[bytes]] = gen_frames(device_storage)
+
+    rows: List[List[Any]] = []
+    try:
+        for shards in shard_counts:
+            throughput, moved = asyncio.run(run(shards, frames, device_storage, server_storage))
+            speedup: float = throughput / rows[0][3] if rows else 1.0
+            rows.append([shards, ARGS.devices, ARGS.requests, throughput, speedup, moved, moved / ARGS.devices])
+            print(f"{shards} shards: {throughput:.1f} tickets per second (speedup {speedup:.2f}), {moved} of {ARGS.devices} devices moved to shard {shards + 1}")
+    finally:
+        shutil.rmtree(keys, ignore_errors=True)
+
+    with open(f"{filepath}.csv", "w", encoding="UTF8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["shards", "devices", "requests per device", "tickets per second", "speedup", "devices moved by one more shard", "moved fraction"])
+        writer.writerows(rows)
@@ -14,14 +14,19 @@ from thespian.actors import Actor, ActorAddress, ActorExitRequest, ChildActorExi
 
 ## Own classes ##
 import settings
-from settings import DEVICE, D_STORAGE, D_PRIV_KEY, S_PUB_KEY, STAGING_AREA, WAKEUP_DEF_REQUEST, WAKEUP_SENSOR, UNIT, END_MEASUREMENT, M_APP_BENCHMARKING_SCENARIO, START_MEASUREMENT
+from settings import DEVICE, D_STORAGE, D_PRIV_KEY, S_PUB_KEY, STAGING_AREA, UPDATE_BLOB_SUFFIX, UPDATE_PART_SUFFIX, UPDATE_PROGRESS_SUFFIX, UPDATE_CHUNK_WINDOW, UPDATE_CHUNK_TIMEOUT, WAKEUP_DEF_REQUEST, WAKEUP_SENSOR, UNIT, END_MEASUREMENT, M_APP_BENCHMARKING_SCENARIO, START_MEASUREMENT
 from modules.messagetypes import *
 from modules.common import *
 from modules.utils import Utils
 from modules.filehandling import FileHandling as fh
 from modules.filehandling import SaveTimes2File as save
 from modules.generate_objects import GenerateDeviceObjects as gen_obj
-from modules.crypto import SignMessage, VerifyMessage
+from modules.crypto import SignMessage, VerifyMessage, ContextCache
+from modules.updateimage import UpdateImage
+from modules.chunked import ChunkedUpdate, ChunkDownload
+from modules.delta import BlockDelta, InstalledImages
+from modules.compression import UpdateCompression
+from modules.remove import RemoveFiles
 
 ## Helper classes ##
 import os
@@ -51,19 +56,41 @@ class Device(Actor):
             elif former == "boot":
                 Utils.create_and_send(self, DEVICE, Boot, updated_message)
 
-            elif former == "server" and isinstance(updated_message.mdata, DefTicket):
+            elif former == "server" and issubclass(updated_message.mdata_type, DefTicket):
                 Utils.create_and_send(self, DEVICE, Verifier, updated_message)
 
+            elif former == "server" and issubclass(updated_message.mdata_type, UpdateChunk):
+                # All chunks of a download go to the same ChunkDownloader
+                Utils.create_and_send(self, DEVICE, ChunkDownloader, updated_message, True)
+
             elif former == "server":
                 Utils.create_and_send(self, DEVICE, StagingArea, updated_message)
 
             elif former == "signer":
                 Utils.create_and_send_tuple(self, DEVICE, message, updated_message, sender)
 
+            elif former == "chunk_downloader":
+                # Chunk requests are not signed, the ChunkDownloader keeps running
+                Utils.create_and_send_tuple(self, DEVICE, message, updated_message, sender, False)
+
             else:
                 print("[DEVICE] Device Error")
                 self.send(self.myAddress, ActorExitRequest())
 
+    def decompress_update(self, message: Message, name: str, save_measurement: bool) -> Update:
+        # Decompresses the image of the Update chunk by chunk into the blob <name>.blob of the staging area
+        update: Update = message.mdata
+        algo: str = UpdateCompression.header(update.update)[0]
+        start_counter: float = START_MEASUREMENT()
+        image: UpdateImage = UpdateCompression.decompress_to(update.update, UpdateImage.blob_path(STAGING_AREA, name))
+        end_counter: float = END_MEASUREMENT()
+        print(f"[DEVICE] Decompressed the {algo} update: {image.length} bytes.")
+
+        if save_measurement:
+            filepath = fh.gen_filepath(UNIT, message.scenario, message.variant, message.hash_algo, M_APP_BENCHMARKING_SCENARIO)
+            save.save_counter(filepath, end_counter - start_counter, f"decompress_{algo}")
+        return Update(update.update_type, image, update.version_nr, update.timestamp)
+
 
 class Boot(Device):
     def __init__(self) -> None:
@@ -87,13 +114,35 @@ class StagingArea(Device):
 
             if former == "device":
                 if isinstance(updated_message.mdata, Update):
-                    print("[DEVICE] Save update in staging area.")
-                    fh.save_object(updated_message, STAGING_AREA)
+                    try:
+                        if UpdateCompression.signed_uncompressed(updated_message.mdata.update):
+                            # The signature covers the uncompressed update: decompress it into the staging area before the verification
+                            updated_message.mdata = self.decompress_update(updated_message, updated_message.mdata.name, settings.save_update_measurements and (updated_message.scenario == 8))
+                        print("[DEVICE] Save update in staging area.")
+                        fh.save_object(updated_message, STAGING_AREA)
+                    except ValueError as e:
+                        print(f"[DEVICE] Could not decompress the update: {e}")
 
                 if isinstance(updated_message.mdata, BootTicket):
                     print("[DEVICE] Save boot ticket in staging area.")
                     fh.save_object(updated_message, STAGING_AREA)
 
+                if isinstance(updated_message.mdata, UpdateManifest):
+                    # Verify the manifest before downloading the chunks it describes (the result is cached for the boot)
+                    if (updated_message.variant == "none") and (updated_message.crypto == "none"):
+                        manifest_valid = True
+                    else:
+                        manifest_valid = VerifyMessage.verify(DEVICE, updated_message, D_STORAGE, S_PUB_KEY, updated_message.variant, updated_message.crypto, updated_message.hash_algo, True)
+
+                    if manifest_valid:
+                        print("[DEVICE] Save update manifest in staging area and download the update.")
+                        # An image downloaded for a former manifest is replaced
+                        ChunkedUpdate.staged_image(updated_message.mdata, STAGING_AREA, updated_message.mdata.name).remove()
+                        fh.save_object(updated_message, STAGING_AREA)
+                        Utils.create_and_send(self, DEVICE, ChunkDownloader, updated_message, True)
+                        return
+                    print("[DEVICE] Invalid update manifest.")
+
                 Utils.create_and_send(self, DEVICE, Shutdown, updated_message)
 
             elif former == "boot":
@@ -106,9 +155,9 @@ class StagingArea(Device):
 
                 # Check for elements (files) in staging area
                 dir: list[str] = os.listdir(STAGING_AREA)
-                # Exclude filenames starting with . e.g. .gitkeep or .gitignore
+                # Exclude filenames starting with . e.g. .gitkeep or .gitignore and the blobs (and partial downloads) of the staged updates
                 for filename in dir:
-                    if not filename.startswith("."):
+                    if not filename.startswith(".") and not filename.endswith((UPDATE_BLOB_SUFFIX, UPDATE_PART_SUFFIX, UPDATE_PROGRESS_SUFFIX)):
                         filtered_dir.append(filename)
 
                 if len(filtered_dir) == 0:
@@ -125,7 +174,7 @@ class StagingArea(Device):
                         if not isinstance(objects[i], Message):
                             print(f"[DEVICE] ERROR! Other type than Message in staging area! type: {type(objects[i])}")
                         
-                        if isinstance(objects[i].mdata, Update):
+                        if isinstance(objects[i].mdata, (Update, UpdateManifest)):
                             update_available: bool = True
                             update = objects[i]
 
@@ -139,7 +188,11 @@ class StagingArea(Device):
                         # Use signature and mdata from the update
                         updated_message.signature = update.signature
                         updated_message.mdata = update.mdata
-                        Utils.create_and_send(self, DEVICE, Verifier, updated_message)
+                        if isinstance(update.mdata, UpdateManifest) and not ChunkedUpdate.is_staged(STAGING_AREA, update.mdata.name):
+                            print("[DEVICE] Download of the update has been interrupted: resume the download.")
+                            Utils.create_and_send(self, DEVICE, ChunkDownloader, updated_message, True)
+                        else:
+                            Utils.create_and_send(self, DEVICE, Verifier, updated_message)
 
                     elif not update_available:
                         # Case 2: BootTicket available in staging area
@@ -183,11 +236,15 @@ class Signer(Device):
 
             else:
                 print("[DEVICE] Signer Error")
-                self.send(self.myAddress, ActorExitRequest())
+                end_step(self)
         
         if isinstance(message, ChildActorExited):
             send_ActorExitRequest(self, DEVICE, self.actor_name, self.myAddress)
 
+        if isinstance(message, ActorExitRequest):
+            # Free the cached liboqs contexts of this actor
+            ContextCache.free_all()
+
 class Sensor(Device):
     def __init__(self) -> None:
         self.actor_name: str = "sensor"
@@ -223,22 +280,45 @@ class CorePatcher(Device):
             if former == "verifier" and isinstance(updated_message.mdata, Update):
                 # Assume the update will be installed here.
                 print("[DEVICE] Apply and install update. Then reset the device... ")
-                
+                image = updated_message.mdata.update
+                if isinstance(image, UpdateImage):
+                    # The image is read chunk by chunk from the mapped blob in the staging area
+                    print(f"[DEVICE] Update image: {image.length} bytes, sha256 {image.digest()}")
+
+                installed: bool = True
+                decompressed: Optional[Update] = None
+                try:
+                    if UpdateCompression.is_compressed(image):
+                        # The verified compressed image is decompressed chunk by chunk next to it
+                        decompressed = self.decompress_update(updated_message, "decompressed", settings.save_measurements and (updated_message.scenario == 7))
+                    install_image = decompressed.update if decompressed is not None else image
+                    # A delta is applied to the installed image and checked against the signed target hash
+                    delta: bool = BlockDelta.is_delta(install_image)
+                    length: int = InstalledImages.install(updated_message.mdata.update_type, install_image)
+                    print(f"[DEVICE] Installed {'patched' if delta else 'full'} {updated_message.mdata.update_type} image: {length} bytes.")
+                except (OSError, ValueError) as e:
+                    installed = False
+                    print(f"[DEVICE] Could not apply the update: {e}")
+                finally:
+                    if decompressed is not None:
+                        decompressed.update.remove()
+
                 # Save the version number of the received update to the secure device storage for future reference
                 try: 
-                    fh.save_to_txtfile(str(updated_message.mdata.version_nr), "version", D_STORAGE)
+                    if installed:
+                        fh.save_to_txtfile(str(updated_message.mdata.version_nr), "version", D_STORAGE)
                 except:
                     print("Could not save the update version nr to storage.")
 
-                # Delete the applied update from staging area
-                os.remove(Path(STAGING_AREA, "update"))
+                # Delete the applied update (or the manifest of a chunked update) from staging area
+                RemoveFiles.remove_object(STAGING_AREA, Path(image.path).stem if isinstance(image, UpdateImage) else "update")
                 print("[DEVICE] Removed the applied update from the staging area.")
 
                 Utils.create_and_send(self, DEVICE, Shutdown, updated_message)
 
             else:
                 print("[DEVICE] CorePatcher Error")
-                self.send(self.myAddress, ActorExitRequest())
+                end_step(self)
         
         if isinstance(message, ChildActorExited):
             send_ActorExitRequest(self, DEVICE, self.actor_name, self.myAddress)
@@ -271,8 +351,7 @@ class BusinessLogic(Device):
                 save.save_counter(filepath, Utils.start_counter, "s_bl_wakeup")
                 print(f"[DEVICE] start deferralticket counter at: {Utils.start_counter}")
 
-            awdt_getnonce_addr: ActorAddress = self.createActor(AWDT_GetNonce)
-            self.send(awdt_getnonce_addr, message.payload)
+            Utils.create_and_send(self, DEVICE, AWDT_GetNonce, message.payload)
             self.wakeupAfter(WAKEUP_DEF_REQUEST, message.payload)
 
 class UpdateDownloader(Device):
@@ -295,6 +374,81 @@ class UpdateDownloader(Device):
             
             msg_obj: Message = gen_obj.gen_request(updated_message, request_type) 
             Utils.create_and_send(self, DEVICE, Signer, msg_obj)
+
+class ChunkDownloader(Device):
+    """
+    Downloads the image of a chunked update (--chunked-update) into the staging area.
+    Keeps up to UPDATE_CHUNK_WINDOW chunk requests in flight; every received chunk is checked against the verified manifest.
+    """
+    def __init__(self) -> None:
+        self.actor_name: str = "chunk_downloader"
+        self.download: Optional[ChunkDownload] = None
+        self.manifest_message: Optional[Message] = None
+
+    def receiveMessage(self, message: Union[Message, WakeupMessage], sender: ActorAddress) -> None:
+        if isinstance(message, Message):
+            updated_message, former = former_step(message, sender, self.myAddress, self.actor_name)
+
+            if former == "staging_area" and isinstance(updated_message.mdata, UpdateManifest):
+                self.manifest_message = updated_message
+                self.download = ChunkDownload(updated_message.mdata, STAGING_AREA, updated_message.mdata.name)
+                print(f"[DEVICE] Download {self.download.count} chunks of the update, {self.download.verified} already verified.")
+                if self.download.complete:
+                    self.finish()
+                else:
+                    self.request_chunks()
+                    self.wakeupAfter(UPDATE_CHUNK_TIMEOUT)
+
+            elif former == "device" and isinstance(updated_message.mdata, UpdateChunk) and (self.download is not None):
+                chunk: UpdateChunk = updated_message.mdata
+                if chunk.version_nr != self.download.manifest.version_nr:
+                    print(f"[DEVICE] Chunk of another update version ({chunk.version_nr}) ignored.")
+                    return
+                try:
+                    if not self.download.receive(chunk.index, chunk.data):
+                        print(f"[DEVICE] Chunk {chunk.index} is invalid or a duplicate.")
+                except ValueError as ex:
+                    self.interrupt(ex)
+                    return
+
+                if self.download.complete:
+                    self.finish()
+                else:
+                    self.request_chunks()
+
+            else:
+                print("[DEVICE] ChunkDownloader Error")
+
+        if isinstance(message, WakeupMessage) and (self.download is not None):
+            # Request the chunks again that have not been answered in time
+            try:
+                expired: List[int] = self.download.timed_out(UPDATE_CHUNK_TIMEOUT)
+            except ValueError as ex:
+                self.interrupt(ex)
+                return
+            if len(expired) > 0:
+                print(f"[DEVICE] Request {len(expired)} chunks again.")
+            self.request_chunks()
+            self.wakeupAfter(UPDATE_CHUNK_TIMEOUT)
+
+    def request_chunks(self) -> None:
+        template: Message = self.manifest_message
+        for index in self.download.requests(UPDATE_CHUNK_WINDOW):
+            request: Message = Message(template.addresses, [self.actor_name], 0, b"", template.crypto, template.variant, template.scenario, template.hash_algo,
+                                       UpdateChunkRequest(self.download.manifest.version_nr, index))
+            self.send(template.addresses.device_addr, request)
+
+    def finish(self) -> None:
+        image: UpdateImage = self.download.finish()
+        self.download = None
+        print(f"[DEVICE] Update image of {image.length} bytes downloaded to the staging area.")
+        Utils.create_and_send(self, DEVICE, Shutdown, self.manifest_message)
+
+    def interrupt(self, ex: Exception) -> None:
+        # The verified chunks stay in the staging area, the download is resumed on the next boot
+        self.download = None
+        print(f"[DEVICE] Download of the update interrupted: {ex}")
+        Utils.create_and_send(self, DEVICE, Shutdown, self.manifest_message)
             
 class Timer(Device):
     def __init__(self) -> None:
@@ -359,12 +513,7 @@ class Timer(Device):
         if isinstance(message, WakeupMessage):
             expired: bool = Timer.check_countdown(Timer.time_to_reset)
             if expired:
-                try:
-                    shutdown_addr: ActorAddress = self.createActor(Shutdown)
-                    self.send(shutdown_addr, message.payload)
-
-                except:
-                    print("Could not create actor 'Shutdown'")
+                Utils.create_and_send(self, DEVICE, Shutdown, message.payload)
             else:
                 self.wakeupAfter(2, message.payload)
 
@@ -412,7 +561,7 @@ class AWDT_GetNonce(Device):
 
             else:
                 print("[DEVICE] AWDT_GetNonce Error")
-                self.send(self.myAddress, ActorExitRequest())
+                end_step(self)
 
         if isinstance(message, ChildActorExited):
             send_ActorExitRequest(self, DEVICE, self.actor_name, self.myAddress)
@@ -429,7 +578,7 @@ class AWDT_PutTicket(Device):
 
             else:
                 print("[DEVICE] AWDT_PutTicket Error")
-                self.send(self.myAddress, ActorExitRequest())
+                end_step(self)
 
         if isinstance(message, ChildActorExited):
             send_ActorExitRequest(self, DEVICE, self.actor_name, self.myAddress)
@@ -444,12 +593,22 @@ class Verifier(Device):
             try:
                 if (updated_message.variant != "none") and (updated_message.crypto != "none"):
                     # Verify signature of the received message with pub key of the server
-                    msg_valid = VerifyMessage.verify(DEVICE, updated_message, D_STORAGE, S_PUB_KEY, updated_message.variant, updated_message.crypto, updated_message.hash_algo)
+                    # Staged elements that have been verified before are taken from the verification cache
+                    msg_valid = VerifyMessage.verify(DEVICE, updated_message, D_STORAGE, S_PUB_KEY, updated_message.variant, updated_message.crypto, updated_message.hash_algo, former == "staging_area")
                 else:
                     msg_valid = True
                     print("[DEVICE] Dummy function: No verification needed.")
                     
-                if former == "staging_area" and isinstance(updated_message.mdata, Update):
+                if former == "staging_area" and isinstance(updated_message.mdata, (Update, UpdateManifest)):
+                    staged_name: str = updated_message.mdata.name
+                    if isinstance(updated_message.mdata, UpdateManifest):
+                        # Signature of the manifest is verified, now check the downloaded image against its chunk hashes
+                        image: UpdateImage = ChunkedUpdate.staged_image(updated_message.mdata, STAGING_AREA, staged_name)
+                        image_valid: bool = ChunkedUpdate.verify_image(updated_message.mdata, image)
+                        print(f"[DEVICE] Update image matches the manifest: {image_valid}")
+                        msg_valid = msg_valid and image_valid
+                        updated_message.mdata = ChunkedUpdate.to_update(updated_message.mdata, image)
+
                     # Verify new version number with the stored former version number
                     stored_version_nr: str = fh.read_from_file("version.txt", D_STORAGE) 
 
@@ -469,7 +628,7 @@ class Verifier(Device):
                         
                     elif (msg_valid == False) or (version_valid == False):
                         # Remove the invalid update from staging area
-                        os.remove(Path(STAGING_AREA, "update"))
+                        RemoveFiles.remove_object(STAGING_AREA, staged_name)
                         print("[DEVICE] Removed the invalid update from the staging area.")
                         # Empty Update for generating request during the next step
                         updated_message.mdata = Update("", "", 0, 0) 
@@ -521,7 +680,11 @@ class Verifier(Device):
 
             except:
                 print("[DEVICE] Verifier Error")
-                self.send(self.myAddress, ActorExitRequest())
+                end_step(self)
 
         if isinstance(message, ChildActorExited):
-            send_ActorExitRequest(self, DEVICE, self.actor_name, self.myAddress)
\ No newline at end of file
+            send_ActorExitRequest(self, DEVICE, self.actor_name, self.myAddress)
+
+        if isinstance(message, ActorExitRequest):
+            # Free the cached liboqs contexts of this actor
+            ContextCache.free_all()
\ No newline at end of file
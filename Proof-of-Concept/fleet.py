@@ -0,0 +1,277 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+"""
+Fleet simulator: N devices against one server (the asyncio server engine of async_server.py).
+
+Each device has its own key pair, nonce and staging area in FLEET_STORAGE/device_<i>, the server keeps its public key
+in the folder of the device (HELLO frame). A device boots first (bootticket request), then requests deferral tickets
+and sends sensor data until the end of the simulation; with --boot-interval it also reboots regularly.
+With --shards the server is sharded by device identity (sharded_server.py).
+Arrival patterns of the events (--pattern):
+- periodic: every interval, with a random phase per device
+- poisson: exponentially distributed gaps with the interval as mean
+- burst: all devices at the same time
+
+For each fleet size (--devices=10,100,1000) the 50th, 95th and 99th percentile of the latency per device and of all devices
+and the server throughput are saved in M_APP_BENCHMARKING_FLEET. The latency of a request ends with the answer of the server,
+sensor data get no answer, so their latency ends when the message has been handed to the socket.
+"""
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from statistics import quantiles
+from typing import Any, Dict, List, Optional
+import asyncio
+import csv
+import random
+import shutil
+import tempfile
+import time
+
+import settings
+from settings import UNIT, START_MEASUREMENT, END_MEASUREMENT, DEVICE, S_PUB_KEY, D_PRIV_KEY, SIGN_WORKERS, WAKEUP_DEF_REQUEST, WAKEUP_SENSOR, FLEET_STORAGE, FLEET_DURATION, FLEET_BOOT_WINDOW, M_APP_BENCHMARKING_FLEET
+from modules.crypto import KeyGen, SignMessage, VerifyMessage
+from modules.common import equal
+from modules.filehandling import FileHandling as fh
+from modules.filehandling import FolderHandling as foha
+from modules.generate_objects import GenerateDeviceObjects as gen_obj
+from modules.messagetypes import *
+from async_server import AsyncServer, Frames
+from sharded_server import ShardedServer
+
+parser = ArgumentParser(
+    description=""" Fleet simulator: many devices with their own keys against one server """)
+
+parser.add_argument("--devices", dest="devices", default="10,100,1000", help="Comma separated fleet sizes, simulated one after the other")
+parser.add_argument("--duration", dest="duration", type=float, default=FLEET_DURATION, help="Seconds each fleet size is simulated")
+parser.add_argument("--pattern", dest="pattern", default="periodic", help="Arrival pattern of the events", choices=["periodic", "poisson", "burst"])
+parser.add_argument("--boot-interval", dest="boot_interval", type=float, default=0, help="Seconds between two boots of a device (0: boot only at the start)")
+parser.add_argument("--defticket-interval", dest="defticket_interval", type=float, default=WAKEUP_DEF_REQUEST, help="Seconds between two deferral ticket requests (0: none)")
+parser.add_argument("--sensor-interval", dest="sensor_interval", type=float, default=WAKEUP_SENSOR, help="Seconds between two sensor data messages (0: none)")
+parser.add_argument("--crypto", dest="crypto", default="classic", help="", choices=["none", "pqc", "classic", "hybrid"])
+parser.add_argument("--variant", dest="variant", default="secp256r1", help="Hybrid mode: <classic>+<pqc>, e.g. secp256r1+Dilithium2")
+parser.add_argument("--hash", dest="hash_algo", default="sha256", help="")
+parser.add_argument("--wire", dest="wire", default="json", help="Format of the messages", choices=["json", "binary"])
+parser.add_argument("--executor", dest="executor", default="thread", help="Pool the server crypto runs on", choices=["thread", "process"])
+parser.add_argument("--workers", dest="workers", type=int, default=SIGN_WORKERS, help="Pool workers of the server (of each shard with --shards)")
+parser.add_argument("--shards", dest="shards", type=int, default=0, help="Shard processes of the server (0: one asyncio server)")
+parser.add_argument("--device-workers", dest="device_workers", type=int, default=SIGN_WORKERS, help="Threads the devices sign and verify on")
+parser.add_argument("--seed", dest="seed", type=int, default=0, help="Seed of the arrival times")
+
+ARGS = parser.parse_args()
+settings.wire = ARGS.wire
+
+EVENTS: List[str] = ["bootticket", "defticket", "sensor"]
+SERVER_STORAGE: Path = Path(FLEET_STORAGE, "server")
+SHARD_STORAGE: Path = Path(FLEET_STORAGE, "shards")
+
+# The devices sign and verify on their own threads, so the event loop keeps serving the connections
+device_pool: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=ARGS.device_workers)
+
+def gen_keypair(name: str, priv_storage: Path, pub_storage: Path) -> None:
+    # Like key_generation.py
+    if ARGS.crypto == "classic":
+        KeyGen.gen_keypair_classic(name=name, priv_storage=priv_storage, pub_storage=pub_storage, variant=ARGS.variant)
+    elif ARGS.crypto == "pqc":
+        KeyGen.gen_keypair_pqc(sigalg=ARGS.variant, name=name, priv_storage=priv_storage, pub_storage=pub_storage)
+    elif ARGS.crypto == "hybrid":
+        KeyGen.gen_keypair_hybrid(variant=ARGS.variant, name=name, priv_storage=priv_storage, pub_storage=pub_storage)
+
+def next_delay(interval: float, rng: random.Random, first: bool) -> float:
+    # Seconds until the next event of the arrival pattern
+    if ARGS.pattern == "poisson":
+        return rng.expovariate(1 / interval)
+    if ARGS.pattern == "burst":
+        return 0.0 if first else interval
+    return rng.uniform(0, interval) if first else interval
+
+def percentiles(values: List[float]) -> List[Optional[float]]:
+    # 50th, 95th and 99th percentile
+    if len(values) == 0:
+        return [None, None, None]
+    if len(values) == 1:
+        return [values[0]] * 3
+    cuts: List[float] = quantiles(values, n=100, method="inclusive")
+    return [cuts[49], cuts[94], cuts[98]]
+
+class FleetDevice():
+    """
+    A simulated device with its own key pair, nonce and staging area, connected to the server.
+    """
+    def __init__(self, index: int) -> None:
+        self.name: str = f"device_{index}"
+        self.storage: Path = Path(FLEET_STORAGE, self.name)
+        self.staging: Path = Path(self.storage, "staging_area")
+        self.addresses: Addresses = Addresses(None, self.name)
+        self.latency: Dict[str, List[float]] = {event: [] for event in EVENTS}
+        self.errors: int = 0
+        self.lock: Optional[asyncio.Lock] = None
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    def provision(self) -> None:
+        foha.createFolder(self.storage)
+        foha.createFolder(self.staging)
+        # The public key goes to the folder of the device on the server, the public key of the server is shared by all devices
+        foha.createFolder(Path(SERVER_STORAGE, self.name))
+        gen_keypair("device", self.storage, Path(SERVER_STORAGE, self.name))
+
+    def reset(self) -> None:
+        self.latency = {event: [] for event in EVENTS}
+        self.errors = 0
+
+    def message(self, event: str) -> Message:
+        # New signed message of the event (runs on the device pool)
+        message: Message = Message(self.addresses, ["device"], 0, b"", ARGS.crypto, ARGS.variant, None, ARGS.hash_algo, None)
+        if event == "sensor":
+            message = gen_obj.gen_measured_data(message)
+        else:
+            message = gen_obj.gen_request(message, event, self.storage)
+        if ARGS.crypto != "none":
+            message = SignMessage.sign(DEVICE, message, self.storage, D_PRIV_KEY, ARGS.variant, ARGS.crypto, ARGS.hash_algo)
+        return message
+
+    def accept(self, answer: Message) -> bool:
+        # Verifies the answer of the server with the stored nonce and stages it (runs on the device pool)
+        if ARGS.crypto != "none":
+            if not VerifyMessage.verify(DEVICE, answer, FLEET_STORAGE, S_PUB_KEY, answer.variant, answer.crypto, answer.hash_algo):
+                return False
+        if not equal(fh.read_from_file("nonce.txt", self.storage), answer.mdata.nonce):
+            return False
+        return fh.save_object(answer, self.staging)
+
+    async def exchange(self, event: str) -> None:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        # One event at a time per device: the nonce of a request stays valid until its answer has been checked
+        async with self.lock:
+            message: Message = await loop.run_in_executor(device_pool, self.message, event)
+            t1: float = START_MEASUREMENT()
+            Frames.write(self.writer, Frames.encode(message, ARGS.wire == "binary"))
+            await self.writer.drain()
+            if event == "sensor":
+                self.latency[event].append(END_MEASUREMENT() - t1)
+                return
+            payload: Optional[bytes] = await Frames.read(self.reader, 1 << 30)
+            t2: float = END_MEASUREMENT()
+            if payload is None:
+                raise ConnectionError("Connection closed by the server")
+            self.latency[event].append(t2 - t1)
+
+            answer: Message = Frames.decode(payload, self.addresses)
+            if not await loop.run_in_executor(device_pool, self.accept, answer):
+                print(f"[{DEVICE}] {self.name}: {event} has not been accepted.")
+                self.errors += 1
+
+    async def schedule(self, event: str, interval: float, end: float, rng: random.Random, once: bool = False) -> None:
+        if interval <= 0:
+            return
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        first: bool = True
+        while True:
+            delay: float = next_delay(interval, rng, first)
+            first = False
+            if loop.time() + delay >= end:
+                return
+            await asyncio.sleep(delay)
+            await self.exchange(event)
+            if once:
+                return
+
+    async def run(self, path: Path, end: float, rng: random.Random) -> None:
+        self.lock = asyncio.Lock()
+        try:
+            self.reader, self.writer = await asyncio.open_unix_connection(str(path))
+            Frames.write(self.writer, Frames.hello(self.name))
+            # Boot first, then the business logic (and the reboots)
+            await self.schedule("bootticket", FLEET_BOOT_WINDOW, end, rng, once=True)
+            await asyncio.gather(
+                self.schedule("defticket", ARGS.defticket_interval, end, rng),
+                self.schedule("sensor", ARGS.sensor_interval, end, rng),
+                self.schedule("bootticket", ARGS.boot_interval, end, rng))
+        except (ConnectionError, ValueError, TypeError) as ex:
+            print(f"[{DEVICE}] {self.name}: Connection lost. {ex}")
+            self.errors += 1
+        finally:
+            if self.writer is not None:
+                self.writer.close()
+                try:
+                    await self.writer.wait_closed()
+                except ConnectionError:
+                    pass
+
+async def simulate(devices: List[FleetDevice]) -> float:
+    # Runs the fleet against a new server and returns the server throughput (messages per second)
+    path: Path = Path(tempfile.mkdtemp(), "fleet.sock")
+    if ARGS.shards > 0:
+        server: Any = ShardedServer(ARGS.shards, ARGS.executor, ARGS.workers, storage=SHARD_STORAGE, key_storage=SERVER_STORAGE, max_connections=len(devices))
+        listener: asyncio.AbstractServer = await server.start(path=path)
+        # The device folders go to their shards
+        for device in devices:
+            shutil.copytree(Path(SERVER_STORAGE, device.name), server.device_storage(device.name), dirs_exist_ok=True)
+    else:
+        server = AsyncServer(ARGS.executor, ARGS.workers, max_connections=len(devices), storage=SERVER_STORAGE, data_storage=SERVER_STORAGE)
+        listener = await server.start(path=path)
+    rng: random.Random = random.Random(ARGS.seed)
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    start: float = time.monotonic()
+    try:
+        end: float = loop.time() + ARGS.duration
+        await asyncio.gather(*(device.run(path, end, random.Random(rng.random())) for device in devices))
+        # Sensor data get no answer, the server may still be processing the last ones
+        await server.wait_idle()
+        duration: float = time.monotonic() - start
+    finally:
+        listener.close()
+        await listener.wait_closed()
+        server.shutdown()
+        shutil.rmtree(path.parent, ignore_errors=True)
+        shutil.rmtree(SHARD_STORAGE, ignore_errors=True)
+    # Messages answered (sensor data: handed to the socket) in all devices
+    return sum(len(device.latency[event]) for device in devices for event in EVENTS) / duration
+
+if __name__ == "__main__":
+    sizes: List[int] = [int(size) for size in ARGS.devices.split(",")]
+
+    # Fresh keys and states for every simulation
+    shutil.rmtree(FLEET_STORAGE, ignore_errors=True)
+    foha.createFolder(FLEET_STORAGE)
+    foha.createFolder(SERVER_STORAGE)
+    foha.createFolder(M_APP_BENCHMARKING_FLEET)
+    gen_keypair("server", SERVER_STORAGE, FLEET_STORAGE)
+
+    fleet: List[FleetDevice] = [FleetDevice(i) for i in range(max(sizes))]
+    for device in fleet:
+        device.provision()
+
+    per_device: List[List[Any]] = []
+    aggregate: List[List[Any]] = []
+    for size in sizes:
+        devices: List[FleetDevice] = fleet[:size]
+        for device in devices:
+            device.reset()
+        throughput: float = asyncio.run(simulate(devices))
+
+        for event in EVENTS:
+            latency: List[float] = [value for device in devices for value in device.latency[event]]
+            for device in devices:
+                per_device.append([size, device.name, event, len(device.latency[event])] + percentiles(device.latency[event]) + [device.errors])
+            aggregate.append([size, event, len(latency)] + percentiles(latency) + [throughput, sum(device.errors for device in devices)])
+            print(f"[FLEET] {size} devices, {event}: {len(latency)} messages, latency p50/p95/p99 {percentiles(latency)} {UNIT}")
+        print(f"[FLEET] {size} devices: server throughput {throughput:.1f} messages per second")
+
+    filepath: Path = Path(M_APP_BENCHMARKING_FLEET, f"{UNIT}_fleet_{ARGS.crypto}_{ARGS.variant}_{ARGS.pattern}" + (f"_shards{ARGS.shards}" if ARGS.shards > 0 else ""))
+    with open(f"{filepath}.csv", "w", encoding="UTF8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["devices", "event", "messages", f"p50 ({UNIT})", f"p95 ({UNIT})", f"p99 ({UNIT})", "server messages per second", "errors"])
+        writer.writerows(aggregate)
+    with open(f"{filepath}_devices.csv", "w", encoding="UTF8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["devices", "device", "event", "messages", f"p50 ({UNIT})", f"p95 ({UNIT})", f"p99 ({UNIT})", "errors"])
+        writer.writerows(per_device)
+    device_pool.shutdown()
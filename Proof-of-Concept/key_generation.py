@@ -9,21 +9,33 @@
 from argparse import ArgumentParser
 
 from modules.crypto import KeyGen
+from modules.keypool import KeyPool
 from modules.filehandling import FileHandling as fh
 from modules.filehandling import FolderHandling as foha
-from settings import D_STORAGE, S_STORAGE, STAGING_AREA, S_DATA_STORAGE
+from modules.registry import AlgorithmRegistry
+from settings import D_STORAGE, S_STORAGE, STAGING_AREA, S_DATA_STORAGE, AUTO_MIN_NIST_LEVEL, AUTO_MAX_SIGNATURE_SIZE, AUTO_LATENCY_BUDGET
 
 parser = ArgumentParser(
     description=""" Key generation (classic and pqc algorithms). """)
 
-parser.add_argument("--crypto", dest="crypto", help="", default="classic", choices=["none", "pqc", "classic"])
-parser.add_argument("--variant", dest="variant", help="", default="secp256r1")
+parser.add_argument("--crypto", dest="crypto", help="", default="classic", choices=["none", "pqc", "classic", "hybrid"])
+parser.add_argument("--variant", dest="variant", help="auto: cheapest measured algorithm (sets --crypto)", default="secp256r1")
+parser.add_argument("--hash", dest="hash_algo", help="--variant=auto: hash algorithm of the measurements", default="sha256")
+parser.add_argument("--min-level", dest="min_level", type=int, default=AUTO_MIN_NIST_LEVEL, help="--variant=auto: minimum claimed NIST level")
+parser.add_argument("--max-sig-size", dest="max_sig_size", type=int, default=AUTO_MAX_SIGNATURE_SIZE, help="--variant=auto: maximum signature size in bytes")
+parser.add_argument("--latency-budget", dest="latency_budget", type=float, default=AUTO_LATENCY_BUDGET, help="--variant=auto: maximum sign + verify cost per message")
+parser.add_argument("--pool", dest="pool", action="store_true", default=False, help="Take the key pairs from the key pool (key_pool.py), generate them only if the pool is empty")
 
 ARGS = parser.parse_args()
 
 # Variant of the algorithm to use for key generation
 variant = ARGS.variant
 crypto = ARGS.crypto
+pool = ARGS.pool
+
+if variant == "auto":
+    # Same selection as app.py --variant=auto
+    crypto, variant = AlgorithmRegistry.auto(ARGS.hash_algo, ARGS.min_level, ARGS.max_sig_size, ARGS.latency_budget)
 
 ###################################################################################################
 
@@ -35,7 +47,12 @@ if __name__ == "__main__":
     foha.createFolder(S_DATA_STORAGE)
 
     if variant != "none":
-        if crypto == "classic":
+        if pool and crypto != "none":
+            # Device and server key pairs from the key pool
+            KeyPool.provision(name="device", crypto=crypto, variant=variant, priv_storage=D_STORAGE, pub_storage=S_STORAGE)
+            KeyPool.provision(name="server", crypto=crypto, variant=variant, priv_storage=S_STORAGE, pub_storage=D_STORAGE)
+
+        elif crypto == "classic":
             # Generate device key pair
             pub_key, priv_key, data, unit = KeyGen.gen_keypair_classic(name="device", priv_storage=D_STORAGE, pub_storage=S_STORAGE, variant=variant)
             
@@ -48,6 +65,12 @@ if __name__ == "__main__":
             # Generate server key pair
             pub_key, priv_key, data, unit = KeyGen.gen_keypair_pqc(sigalg=variant, name="server", priv_storage=S_STORAGE, pub_storage=D_STORAGE)
 
+        elif crypto == "hybrid":
+            # Generate device key pairs (classic and pqc), variant e.g. secp256r1+Dilithium2
+            pub_key, priv_key, data, unit = KeyGen.gen_keypair_hybrid(variant=variant, name="device", priv_storage=D_STORAGE, pub_storage=S_STORAGE)
+            # Generate server key pairs (classic and pqc)
+            pub_key, priv_key, data, unit = KeyGen.gen_keypair_hybrid(variant=variant, name="server", priv_storage=S_STORAGE, pub_storage=D_STORAGE)
+
         # Save update versionnr = 0 to a txtfile
         try: 
             fh.save_to_txtfile("0", "version", D_STORAGE)
@@ -0,0 +1,35 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+from argparse import ArgumentParser
+
+from modules.keypool import KeyPool
+from settings import KEY_POOL_TARGET, KEY_POOL_WORKERS
+
+parser = ArgumentParser(
+    description=""" Fills the key pool with pre-generated key pairs (classic, pqc and hybrid algorithms). """)
+
+parser.add_argument("--crypto", dest="crypto", help="", default="classic", choices=["pqc", "classic", "hybrid"])
+parser.add_argument("--variant", dest="variant", help="", default="secp256r1")
+parser.add_argument("--target", dest="target", type=int, help="Number of key pairs each pool is filled up to", default=KEY_POOL_TARGET)
+parser.add_argument("--workers", dest="workers", type=int, help="Number of worker processes", default=KEY_POOL_WORKERS)
+parser.add_argument("--status", dest="status", action="store_true", default=False, help="Only print the size of the pool")
+
+ARGS = parser.parse_args()
+
+###################################################################################################
+
+if __name__ == "__main__":
+    if not ARGS.status:
+        generated: int = KeyPool.fill(ARGS.crypto, ARGS.variant, ARGS.target, ARGS.workers)
+        print(f"Generated {generated} key pairs.")
+
+    for _, crypto, variant in KeyPool.components(ARGS.crypto, ARGS.variant):
+        print(f"Key pool {crypto} {variant}: {KeyPool.size(crypto, variant)} key pairs")
+
+###################################################################################################
@@ -24,7 +24,7 @@ from modules.remove import RemoveFiles
 from modules.filehandling import FolderHandling as foha
 from modules.filehandling import DataHandling as dh
 from modules.filehandling import FileHandling as fh
-from settings import M_APP_BENCHMARKING_SCENARIO, HEADER_SCENARIOS, D_STORAGE, S_DATA_STORAGE, S_STORAGE, STAGING_AREA
+from settings import M_APP_BENCHMARKING_SCENARIO, HEADER_SCENARIOS, D_STORAGE, S_DATA_STORAGE, S_STORAGE, STAGING_AREA, SYSTEM_BASES, DEFAULT_SYSTEM_BASE
 
 if WINDOWS:
     python = "~/anaconda3/python.exe"
@@ -45,6 +45,11 @@ parser.add_argument("--variant", dest="variant", help="", default="Falcon-512")
 parser.add_argument("--hash", dest="hash_algo", help="", default="sha256")
 parser.add_argument("--unit", dest="unit", help="", default="cycles")
 parser.add_argument("--crypto", dest="crypto", help="", default="pqc", choices=["none", "pqc", "classic"])
+parser.add_argument("--compression", dest="compression", help="Compression of the update images (scenarios 7 and 8)", default="none", choices=["none", "zlib", "bz2", "lzma"])
+parser.add_argument("--compression-level", dest="compression_level", type=int, help="", default=None)
+parser.add_argument("--sign-uncompressed", dest="sign_uncompressed", action="store_true", help="Sign the uncompressed update", default=False)
+parser.add_argument("--system-base", dest="system_base", help="Thespian system base of app.py", default=DEFAULT_SYSTEM_BASE, choices=SYSTEM_BASES)
+parser.add_argument("--fused-pipeline", dest="fused_pipeline", action="store_true", help="Server handles a request within one actor", default=False)
 
 ARGS = parser.parse_args()
 print(f"ARGS: {ARGS}")
@@ -52,6 +57,9 @@ scenario = ARGS.scenario
 number = ARGS.number
 
 settings.unit = str(ARGS.unit)
+settings.compression = ARGS.compression
+settings.fused_pipeline = bool(ARGS.fused_pipeline)
+settings.system_base = ARGS.system_base
 
 variant = ARGS.variant
 hash_algo = ARGS.hash_algo
@@ -69,6 +77,23 @@ if __name__ == "__main__":
     foha.createFolder(S_DATA_STORAGE)
 
     ALGO = f"--scenario={scenario} --variant={variant} --hash={hash_algo} --unit={settings.unit} --crypto={crypto}"
+    # Starting points with compressed updates are kept apart for each configuration
+    compression: str = ARGS.compression
+    if ARGS.compression != "none":
+        # Compressed size, compress and decompress cycles are saved next to the counters
+        ALGO += f" --compression={ARGS.compression}"
+        if ARGS.compression_level is not None:
+            ALGO += f" --compression-level={ARGS.compression_level}"
+            compression += f"_{ARGS.compression_level}"
+        if ARGS.sign_uncompressed:
+            ALGO += " --sign-uncompressed"
+            compression += "_uncompressed_signed"
+    if ARGS.fused_pipeline:
+        # The protocol is the same, only the measurement file is another one
+        ALGO += " --fused-pipeline"
+    if ARGS.system_base != DEFAULT_SYSTEM_BASE:
+        # The measurement file records the system base (none for the default base)
+        ALGO += f" --system-base={ARGS.system_base}"
     
     EXECUTE_SAVE_BOOT = f"{python} app.py --action=boot --saveb {ALGO}"
     EXECUTE_SAVE_UPDATE = f"{python} app.py --action=update --saveu {ALGO}"
@@ -80,7 +105,7 @@ if __name__ == "__main__":
     dh.set_header(filepath, HEADER_SCENARIOS)
 
     # Create a new folder for settings based on variant, crypto and hash_algo
-    path: Path = settings.setting_starts(ALGO, variant, crypto, hash_algo)
+    path: Path = settings.setting_starts(ALGO, variant, crypto, hash_algo, compression)
     foha.createFolder(path)
 
     # Szenario 1: No bootticket available in Staging Area
@@ -226,11 +251,11 @@ if __name__ == "__main__":
                 file.write("\n")
                         
             # Remove the correct update to start the scenario with the correct start state
-            RemoveFiles.remove_file(STAGING_AREA, "update")
-            RemoveFiles.remove_file(S_STORAGE, "update")
+            RemoveFiles.remove_object(STAGING_AREA, "update")
+            RemoveFiles.remove_object(S_STORAGE, "update")
 
             # Copy the wrong update into the staging area again
-            shutil.copy(Path(path, "1_update"), Path(STAGING_AREA, "update"))
+            fh.copy_object(path, "1_update", STAGING_AREA, "update")
 
             print("***** Start state for scenario 6 has been established. *****")
 
@@ -250,12 +275,12 @@ if __name__ == "__main__":
                 file.write("\n")
                         
             # Remove the correct update to start the scenario with the correct start state
-            RemoveFiles.remove_file(STAGING_AREA, "update")
-            RemoveFiles.remove_file(S_STORAGE, "update")
+            RemoveFiles.remove_object(STAGING_AREA, "update")
+            RemoveFiles.remove_object(S_STORAGE, "update")
 
             # Copy the right update into the staging area again
             shutil.copy(Path(path, "0_version.txt"), Path(D_STORAGE, "version.txt"))
-            shutil.copy(Path(path, "0_update"), Path(STAGING_AREA, "update"))
+            fh.copy_object(path, "0_update", STAGING_AREA, "update")
 
             print("***** Start state for scenario 7 has been established. *****") 
 
@@ -273,7 +298,7 @@ if __name__ == "__main__":
                 file.write("\n")
                         
             # Remove the correct update to start the scenario with the correct start state
-            RemoveFiles.remove_file(STAGING_AREA, "update")
-            RemoveFiles.remove_file(S_STORAGE, "update")
+            RemoveFiles.remove_object(STAGING_AREA, "update")
+            RemoveFiles.remove_object(S_STORAGE, "update")
 
             print("***** Start state for scenario 8 has been established. *****") 
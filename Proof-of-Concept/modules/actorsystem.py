@@ -0,0 +1,49 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+from typing import Any, Dict, Optional, Tuple
+import socket
+
+from thespian.actors import ActorSystem
+
+from settings import ADMIN_PORT_BASES
+
+class SystemBase():
+    """
+    Start and shutdown of the ActorSystem on the selected Thespian system base (app.py --system-base).
+    The bases with an admin port (ADMIN_PORT_BASES) get a free port of the operating system, so several
+    runs do not collide on a fixed port. The port is needed to reach the same ActorSystem again for the shutdown.
+    """
+    @staticmethod
+    def free_port(system_base: str) -> int:
+        kind: int = socket.SOCK_DGRAM if system_base == "multiprocUDPBase" else socket.SOCK_STREAM
+        with socket.socket(socket.AF_INET, kind) as sock:
+            sock.bind(("", 0))
+            return sock.getsockname()[1]
+
+    @staticmethod
+    def capabilities(system_base: str, admin_port: Optional[int]) -> Dict[str, Any]:
+        if (system_base in ADMIN_PORT_BASES) and (admin_port is not None):
+            return {"Admin Port": admin_port}
+        return {}
+
+    @staticmethod
+    def start(system_base: str) -> Tuple[ActorSystem, Optional[int]]:
+        admin_port: Optional[int] = SystemBase.free_port(system_base) if system_base in ADMIN_PORT_BASES else None
+        asys: ActorSystem = ActorSystem(system_base, SystemBase.capabilities(system_base, admin_port))
+        print(f"[APP] Started the ActorSystem on {system_base}" + (f" with admin port {admin_port}." if admin_port is not None else "."))
+        return asys, admin_port
+
+    @staticmethod
+    def reachable(system_base: str) -> bool:
+        # Only the bases with an admin port can be shut down from an actor in another process
+        return system_base in ADMIN_PORT_BASES
+
+    @staticmethod
+    def shutdown(system_base: str, admin_port: Optional[int]) -> None:
+        ActorSystem(system_base, SystemBase.capabilities(system_base, admin_port)).shutdown()
@@ -0,0 +1,218 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+from hashlib import sha256
+from json import dump, load
+from pathlib import Path
+from typing import Dict, Iterator, List, Set, Union
+import os
+import time
+
+from settings import UPDATE_CHUNK_SIZE, UPDATE_CHUNK_RETRIES, UPDATE_PART_SUFFIX, UPDATE_PROGRESS_SUFFIX
+from modules.messagetypes import Update, UpdateManifest
+from modules.updateimage import UpdateImage
+from modules.encoding import CanonicalEncoder
+
+class ChunkedUpdate():
+    """
+    Chunked update transfer: the server signs an UpdateManifest with the SHA-256 digest of every chunk of the image
+    instead of the Update itself. The device fetches the chunks one by one and checks each against the manifest,
+    so only the (small) manifest has to be verified with the signature algorithm.
+    """
+    @staticmethod
+    def image_chunks(body: Union[str, bytes, UpdateImage], chunk_size: int) -> Iterator[Union[bytes, memoryview]]:
+        if isinstance(body, UpdateImage):
+            yield from body.chunks(chunk_size)
+            return
+        view: memoryview = memoryview(body.encode("utf-8") if isinstance(body, str) else body)
+        for offset in range(0, len(view), chunk_size):
+            yield view[offset:offset + chunk_size]
+
+    @staticmethod
+    def manifest(update: Update, chunk_size: int = UPDATE_CHUNK_SIZE) -> UpdateManifest:
+        body: Union[str, bytes, UpdateImage] = update.update
+        if isinstance(body, UpdateImage):
+            length, text = body.length, body.text
+        else:
+            text: bool = isinstance(body, str)
+            length: int = len(body.encode("utf-8")) if text else len(body)
+        chunk_hashes: List[bytes] = [sha256(chunk).digest() for chunk in ChunkedUpdate.image_chunks(body, chunk_size)]
+        return UpdateManifest(update.update_type, update.version_nr, update.timestamp, length, text, chunk_size, chunk_hashes)
+
+    @staticmethod
+    def manifest_id(manifest: UpdateManifest) -> str:
+        # Identifies the manifest a partial download belongs to
+        return sha256(CanonicalEncoder.encode(manifest)).hexdigest()
+
+    @staticmethod
+    def read_chunk(body: Union[str, bytes, UpdateImage], index: int, chunk_size: int = UPDATE_CHUNK_SIZE) -> bytes:
+        # Server: content of one chunk of the saved update
+        if isinstance(body, UpdateImage):
+            with open(body.path, "rb") as file:
+                file.seek(index * chunk_size)
+                return file.read(chunk_size)
+        b_body: bytes = body.encode("utf-8") if isinstance(body, str) else bytes(body)
+        return b_body[index * chunk_size:(index + 1) * chunk_size]
+
+    @staticmethod
+    def chunk_length(manifest: UpdateManifest, index: int) -> int:
+        return min(manifest.chunk_size, manifest.length - index * manifest.chunk_size)
+
+    @staticmethod
+    def check_chunk(manifest: UpdateManifest, index: int, data: bytes) -> bool:
+        if (index < 0) or (index >= len(manifest.chunk_hashes)):
+            return False
+        return (len(data) == ChunkedUpdate.chunk_length(manifest, index)) and (sha256(data).digest() == manifest.chunk_hashes[index])
+
+    @staticmethod
+    def verify_image(manifest: UpdateManifest, image: UpdateImage) -> bool:
+        # Checks every chunk of the staged image against the (verified) manifest, chunk by chunk from the mapped blob
+        try:
+            if image.length != manifest.length:
+                return False
+            count: int = 0
+            for index, chunk in enumerate(image.chunks(manifest.chunk_size)):
+                if (index >= len(manifest.chunk_hashes)) or (sha256(chunk).digest() != manifest.chunk_hashes[index]):
+                    return False
+                count += 1
+            return count == len(manifest.chunk_hashes)
+        except (OSError, ValueError):
+            return False
+
+    @staticmethod
+    def staged_image(manifest: UpdateManifest, path: Path, filename: str) -> UpdateImage:
+        return UpdateImage(str(UpdateImage.blob_path(path, filename)), manifest.length, manifest.text)
+
+    @staticmethod
+    def is_staged(path: Path, filename: str) -> bool:
+        # True if the download of the manifest saved as filename is complete
+        return os.path.exists(UpdateImage.blob_path(path, filename))
+
+    @staticmethod
+    def to_update(manifest: UpdateManifest, image: UpdateImage) -> Update:
+        return Update(manifest.update_type, image, manifest.version_nr, manifest.timestamp)
+
+
+class ChunkDownload():
+    """
+    State of the download of a chunked update into the staging area.
+
+    Chunks are written at their offset into <filename>.part, <filename>.progress records the manifest and the number
+    of verified chunks at the start of the image. An interrupted download resumes from there.
+    Up to window chunks are requested at a time; a chunk that does not match the manifest or times out is requested again.
+    When all chunks are verified the part file becomes the blob of the staged update (<filename>.blob).
+    """
+    def __init__(self, manifest: UpdateManifest, path: Path, filename: str, retries: int = UPDATE_CHUNK_RETRIES) -> None:
+        self.manifest = manifest
+        self.count: int = len(manifest.chunk_hashes)
+        self.retries = retries
+        self.part: Path = Path(path, f"{filename}{UPDATE_PART_SUFFIX}")
+        self.progress: Path = Path(path, f"{filename}{UPDATE_PROGRESS_SUFFIX}")
+        self.blob: Path = UpdateImage.blob_path(path, filename)
+        self.manifest_id: str = ChunkedUpdate.manifest_id(manifest)
+
+        # Number of verified chunks at the start of the image
+        self.verified: int = self.load_progress()
+        self.resumed: int = self.verified
+        # Verified chunks after the first missing one
+        self.received: Set[int] = set()
+        # Next chunk that has not been requested yet, chunks to request again and requested chunks (with request time)
+        self.next_index: int = self.verified
+        self.retry: List[int] = []
+        self.in_flight: Dict[int, float] = {}
+        self.failures: Dict[int, int] = {}
+
+        if self.verified == 0:
+            with open(self.part, "wb") as file:
+                file.truncate(manifest.length)
+
+    def load_progress(self) -> int:
+        try:
+            with open(self.progress, "r") as file:
+                progress = load(file)
+            if (progress["manifest"] == self.manifest_id) and (os.path.getsize(self.part) == self.manifest.length):
+                return min(int(progress["verified"]), self.count)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return 0
+
+    def save_progress(self) -> None:
+        tmp_file: Path = Path(f"{self.progress}.{os.getpid()}")
+        with open(tmp_file, "w") as file:
+            dump({"manifest": self.manifest_id, "verified": self.verified}, file)
+        # Replace atomically, so a reset while writing cannot leave a broken progress file
+        os.replace(tmp_file, self.progress)
+
+    @property
+    def complete(self) -> bool:
+        return self.verified == self.count
+
+    def requests(self, window: int) -> List[int]:
+        # Chunks to request now, so that at most window chunks are in flight
+        indices: List[int] = []
+        while len(self.in_flight) < window:
+            if len(self.retry) > 0:
+                index: int = self.retry.pop(0)
+            elif self.next_index < self.count:
+                index: int = self.next_index
+                self.next_index += 1
+                if index in self.received:
+                    continue
+            else:
+                break
+            self.in_flight[index] = time.monotonic()
+            indices.append(index)
+        return indices
+
+    def failed(self, index: int) -> None:
+        self.in_flight.pop(index, None)
+        self.failures[index] = self.failures.get(index, 0) + 1
+        if self.failures[index] > self.retries:
+            raise ValueError(f"Chunk {index} failed {self.failures[index]} times")
+        self.retry.append(index)
+
+    def timed_out(self, timeout: float) -> List[int]:
+        # Chunks without an answer for timeout seconds are requested again
+        now: float = time.monotonic()
+        expired: List[int] = [index for index, requested in self.in_flight.items() if now - requested >= timeout]
+        for index in expired:
+            self.failed(index)
+        return expired
+
+    def receive(self, index: int, data: bytes) -> bool:
+        """
+        Checks a received chunk against the manifest and writes it into the part file.
+        Returns False for invalid chunks (which are requested again) and for duplicates.
+        """
+        if (index < self.verified) or (index in self.received) or (index not in self.in_flight):
+            return False
+        if not ChunkedUpdate.check_chunk(self.manifest, index, data):
+            self.failed(index)
+            return False
+
+        with open(self.part, "r+b") as file:
+            file.seek(index * self.manifest.chunk_size)
+            file.write(data)
+        self.in_flight.pop(index)
+        self.received.add(index)
+
+        if index == self.verified:
+            while self.verified in self.received:
+                self.received.remove(self.verified)
+                self.verified += 1
+            self.save_progress()
+        return True
+
+    def finish(self) -> UpdateImage:
+        # The complete image becomes the blob of the staged manifest
+        os.replace(self.part, self.blob)
+        try:
+            os.remove(self.progress)
+        except OSError:
+            pass
+        return UpdateImage(str(self.blob), self.manifest.length, self.manifest.text)
@@ -0,0 +1,75 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from modules.messagetypes import *
+
+# Messagetypes with a codec, the tables below are generated from their fields
+CODEC_TYPES: List[type] = [Request, Update, UpdateManifest, UpdateChunkRequest, UpdateChunk, Addresses, DefTicket, BootTicket, MeasuredData, MerkleProof, Message]
+
+# By default a field is placed in msg["data"][field], the fields of a Message in msg[field].
+# Exceptions (kept for compatibility with the existing JSON format): (section, JSON key), section None is the top level
+JSON_KEYS: Dict[Tuple[type, str], Tuple[Optional[str], str]] = {
+    (Update, "update_type"): (None, "updatetype"),
+    (Update, "version_nr"): (None, "versionnr"),
+    (Message, "mdata"): ("data", "mdata")
+}
+
+def json_layout(msg_type: type) -> List[Tuple[str, Optional[str], str]]:
+    # (field, section, JSON key) of each field in the order of the constructor arguments
+    default_section: Optional[str] = None if msg_type is Message else "data"
+    return [(field, *JSON_KEYS.get((msg_type, field), (default_section, field))) for field in msg_type.fields]
+
+# Fields that are not copied as they are
+PACK_EXPRESSIONS: Dict[Tuple[type, str], str] = {
+    # The ActorAddresses are only sent as strings, the receiver uses its own Addresses object
+    (Message, "addresses"): '{"server_addr": str(obj.addresses.server_addr), "device_addr": str(obj.addresses.device_addr)}'
+}
+UNPACK_EXPRESSIONS: Dict[Tuple[type, str], str] = {
+    (Message, "addresses"): 'addresses',
+    (Message, "proof"): 'msg.get("proof")'
+}
+
+def json_path(section: Optional[str], key: str) -> str:
+    if section is None:
+        return f'msg["{key}"]'
+    return f'msg["{section}"]["{key}"]'
+
+def generate_packer(msg_type: type) -> Callable[[Any], Dict[str, Any]]:
+    """
+    Generates the function that packs an object of msg_type to its JSON dict,
+    e.g. for DefTicket: {"messagetype": "defticket", "data": {"nonce": obj.nonce, ...}}
+    """
+    top_level: List[str] = [f'"messagetype": {msg_type.name!r}']
+    data: List[str] = []
+    for field, section, key in json_layout(msg_type):
+        value: str = PACK_EXPRESSIONS.get((msg_type, field), f"obj.{field}")
+        (data if section == "data" else top_level).append(f'"{key}": {value}')
+
+    # Same key order as before: messagetype, data, other top level keys
+    entries: List[str] = [top_level[0], '"data": {' + ", ".join(data) + "}"] + top_level[1:]
+    source: str = f"def pack_{msg_type.name}(obj):\n    return {{{', '.join(entries)}}}\n"
+    namespace: Dict[str, Any] = {}
+    exec(source, namespace)
+    return namespace[f"pack_{msg_type.name}"]
+
+def generate_unpacker(msg_type: type) -> Callable[[Dict[str, Any], Addresses], Any]:
+    """
+    Generates the function that unpacks the JSON dict of msg_type to an object,
+    e.g. for DefTicket: DefTicket(msg["data"]["nonce"], msg["data"]["deferral_time"], msg["data"]["timestamp"])
+    """
+    args: List[str] = [UNPACK_EXPRESSIONS.get((msg_type, field), json_path(section, key)) for field, section, key in json_layout(msg_type)]
+    source: str = f"def unpack_{msg_type.name}(msg, addresses):\n    return msg_type({', '.join(args)})\n"
+    namespace: Dict[str, Any] = {"msg_type": msg_type}
+    exec(source, namespace)
+    return namespace[f"unpack_{msg_type.name}"]
+
+# Codec tables: messagetype class -> packer and messagetype name -> unpacker
+PACKERS: Dict[type, Callable[[Any], Dict[str, Any]]] = {msg_type: generate_packer(msg_type) for msg_type in CODEC_TYPES}
+UNPACKERS: Dict[str, Callable[[Dict[str, Any], Addresses], Any]] = {msg_type.name: generate_unpacker(msg_type) for msg_type in CODEC_TYPES}
@@ -11,6 +11,7 @@ from typing import Any, List, Tuple, Union
 
 from thespian.actors import ActorExitRequest, ActorAddress, Actor
 
+import settings
 from modules.messagetypes import *
 
 def equal(stored: Union[bytes, str, int], received: Union[bytes, str, int]) -> bool:
@@ -39,7 +40,14 @@ def former_step(message: Message, sender: ActorAddress, own_addr: ActorAddress,
 
 def send_ActorExitRequest(sender: Actor, host: str, actor_name: str, actor_address: ActorAddress) -> None:
     #print(f"[{host}] Received ChildActorExited: Shutting down actor {actor_name} with actoraddr: {actor_address}...")
-    sender.send(actor_address, ActorExitRequest())
+    # Pooled actors (--actor-pool) are reused for the next message and only end with the ActorSystem
+    if not settings.actor_pool:
+        sender.send(actor_address, ActorExitRequest())
+
+def end_step(actor: Actor) -> None:
+    # Ends the actor of a protocol step, unless it is pooled
+    if not settings.actor_pool:
+        actor.send(actor.myAddress, ActorExitRequest())
 
 def data_processing(message: Message, path: Path, filename: str) -> None:
     if isinstance(message.mdata, MeasuredData):
@@ -0,0 +1,183 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+import bz2
+import lzma
+import os
+import zlib
+
+from settings import UPDATE_IMAGE_CHUNK_SIZE, UPDATE_COMPRESSION_LEVELS
+from modules.encoding import CanonicalEncoder
+from modules.wire import WireCodec
+from modules.updateimage import UpdateImage
+
+# Compression algorithms of the update images and their id in the compressed image
+COMPRESSION_ALGORITHMS: Dict[str, int] = {
+    "zlib": 1,
+    "bz2": 2,
+    "lzma": 3
+}
+COMPRESSION_ALGORITHMS_BY_ID: Dict[int, str] = {algo_id: algo for algo, algo_id in COMPRESSION_ALGORITHMS.items()}
+
+# Flags of the compressed image
+FLAG_TEXT: int = 1                # The uncompressed body was a str
+FLAG_SIGNED_UNCOMPRESSED: int = 2 # The signature covers the uncompressed Update
+
+class UpdateCompression():
+    """
+    Compressed update images.
+
+    Layout: MAGIC | algorithm id | flags | length of the uncompressed image (varint) | compressed stream.
+    If the compressed form is signed (default), the device verifies the compressed image and decompresses it while installing.
+    If the uncompressed form is signed (FLAG_SIGNED_UNCOMPRESSED), the device decompresses the image into the staging area
+    before it is verified. In both cases the image is decompressed chunk by chunk, the output is limited to the given length.
+    """
+    MAGIC: bytes = b"WDZ1"
+
+    @staticmethod
+    def compressor(algo: str, level: int) -> Any:
+        if algo == "zlib":
+            return zlib.compressobj(level)
+        elif algo == "bz2":
+            return bz2.BZ2Compressor(level)
+        elif algo == "lzma":
+            return lzma.LZMACompressor(preset=level)
+        raise ValueError(f"Unknown compression algorithm {algo}")
+
+    @staticmethod
+    def decompressor(algo: str) -> Any:
+        if algo == "zlib":
+            return zlib.decompressobj()
+        elif algo == "bz2":
+            return bz2.BZ2Decompressor()
+        elif algo == "lzma":
+            return lzma.LZMADecompressor()
+        raise ValueError(f"Unknown compression algorithm {algo}")
+
+    @staticmethod
+    def body_chunks(body: Union[str, bytes, UpdateImage], offset: int = 0) -> Iterator[Union[bytes, memoryview]]:
+        # The update body from offset on, chunk by chunk
+        if isinstance(body, UpdateImage):
+            for chunk in body.chunks():
+                if offset >= len(chunk):
+                    offset -= len(chunk)
+                    continue
+                # A view of the chunk must not outlive it, the start is copied
+                yield bytes(chunk[offset:]) if offset > 0 else chunk
+                offset = 0
+            return
+        view: memoryview = memoryview(body.encode("utf-8") if isinstance(body, str) else body)
+        for start in range(offset, len(view), UPDATE_IMAGE_CHUNK_SIZE):
+            yield view[start:start + UPDATE_IMAGE_CHUNK_SIZE]
+
+    @staticmethod
+    def compress(body: Union[str, bytes, UpdateImage], algo: str, level: Optional[int] = None, signed_uncompressed: bool = False) -> bytes:
+        if level is None:
+            level = UPDATE_COMPRESSION_LEVELS[algo]
+        if isinstance(body, UpdateImage):
+            length, text = body.length, body.text
+        else:
+            text: bool = isinstance(body, str)
+            length: int = len(body.encode("utf-8")) if text else len(body)
+
+        out: bytearray = bytearray(UpdateCompression.MAGIC)
+        out.append(COMPRESSION_ALGORITHMS[algo])
+        out.append((FLAG_TEXT if text else 0) | (FLAG_SIGNED_UNCOMPRESSED if signed_uncompressed else 0))
+        CanonicalEncoder.encode_varint(length, out)
+
+        compressor = UpdateCompression.compressor(algo, level)
+        for chunk in UpdateCompression.body_chunks(body):
+            out += compressor.compress(chunk)
+        out += compressor.flush()
+        return bytes(out)
+
+    @staticmethod
+    def is_compressed(body: Union[str, bytes, UpdateImage, None]) -> bool:
+        if isinstance(body, UpdateImage):
+            if body.text or (body.length < len(UpdateCompression.MAGIC)):
+                return False
+            with open(body.path, "rb") as file:
+                return file.read(len(UpdateCompression.MAGIC)) == UpdateCompression.MAGIC
+        return isinstance(body, (bytes, bytearray)) and body.startswith(UpdateCompression.MAGIC)
+
+    @staticmethod
+    def header(body: Union[bytes, UpdateImage]) -> Tuple[str, int, int, int]:
+        # Algorithm, flags, length of the uncompressed image and the position of the compressed stream
+        if isinstance(body, UpdateImage):
+            with open(body.path, "rb") as file:
+                # MAGIC, algorithm, flags and at most 10 bytes of the varint
+                data: memoryview = memoryview(file.read(len(UpdateCompression.MAGIC) + 12))
+        else:
+            data: memoryview = memoryview(body)
+        if bytes(data[:len(UpdateCompression.MAGIC)]) != UpdateCompression.MAGIC:
+            raise ValueError("No compressed update")
+        pos: int = len(UpdateCompression.MAGIC)
+        if data[pos] not in COMPRESSION_ALGORITHMS_BY_ID:
+            raise ValueError(f"Unknown compression algorithm id {data[pos]}")
+        length, end = WireCodec.decode_varint(data, pos + 2)
+        return COMPRESSION_ALGORITHMS_BY_ID[data[pos]], data[pos + 1], length, end
+
+    @staticmethod
+    def signed_uncompressed(body: Union[str, bytes, UpdateImage, None]) -> bool:
+        return UpdateCompression.is_compressed(body) and bool(UpdateCompression.header(body)[1] & FLAG_SIGNED_UNCOMPRESSED)
+
+    @staticmethod
+    def decompress_chunks(body: Union[bytes, UpdateImage], chunk_size: int = UPDATE_IMAGE_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Yields the uncompressed image in chunks of at most chunk_size bytes.
+        Raises ValueError if the stream is broken or does not have the length of the header.
+        """
+        algo, _, length, pos = UpdateCompression.header(body)
+        decompressor = UpdateCompression.decompressor(algo)
+        produced: int = 0
+        try:
+            for chunk in UpdateCompression.body_chunks(body, pos):
+                data: bytes = bytes(chunk)
+                while True:
+                    # The output of one step is limited, so that a small stream cannot fill the memory
+                    out: bytes = decompressor.decompress(data, chunk_size)
+                    produced += len(out)
+                    if produced > length:
+                        raise ValueError("Compressed update is longer than its header")
+                    if len(out) > 0:
+                        yield out
+                    if algo == "zlib":
+                        data = decompressor.unconsumed_tail
+                        if len(data) == 0:
+                            break
+                    else:
+                        data = b""
+                        if decompressor.eof or decompressor.needs_input:
+                            break
+            if algo == "zlib":
+                out = decompressor.flush()
+                produced += len(out)
+                if len(out) > 0:
+                    yield out
+        except (zlib.error, OSError, lzma.LZMAError, EOFError) as e:
+            raise ValueError(f"Compressed update is broken: {e}")
+
+        if (produced != length) or (not decompressor.eof):
+            raise ValueError("Compressed update is incomplete")
+
+    @staticmethod
+    def decompress_to(body: Union[bytes, UpdateImage], blob: Path) -> UpdateImage:
+        # Decompresses the image chunk by chunk into the blob file (atomically)
+        _, flags, length, _ = UpdateCompression.header(body)
+        tmp_file: Path = Path(f"{blob}.{os.getpid()}")
+        try:
+            with open(tmp_file, "wb") as file:
+                for chunk in UpdateCompression.decompress_chunks(body):
+                    file.write(chunk)
+        except Exception:
+            os.remove(tmp_file)
+            raise
+        os.replace(tmp_file, blob)
+        return UpdateImage(str(blob), length, bool(flags & FLAG_TEXT))
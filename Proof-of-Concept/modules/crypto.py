@@ -6,14 +6,24 @@
 # Author:        Tanja Gutsche               
 # ****************************************************************************
 
-from typing import Any, Dict, Tuple, Union
-from json import dumps
+from typing import Any, ClassVar, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from hashlib import sha256
+import hashlib
+from json import dumps, dump, load
+import os
 import pprint
+import struct
 
+import settings
 from settings import *
 from modules.messagetypes import *
 from modules.keys import KeyUsage
 from modules.utils import Utils
+from modules.encoding import CanonicalEncoder
+from modules.merkle import MerkleTree, RootSignatureCache
 from modules.filehandling import FileHandling as fh
 
 ## Classic crypto imports
@@ -37,6 +47,257 @@ MBEDTLS_CURVES_DICT: Dict[str, Any] = {
     "brainpoolP512r1": pk.Curve.BRAINPOOLP512R1
 }
 
+# Hash algorithms for the prehash mode: hashlib name and digest length (only needed for SHAKE)
+PREHASH_ALGOS: Dict[str, Tuple[str, int]] = {
+    "sha256": ("sha256", 0),
+    "sha384": ("sha384", 0),
+    "sha512": ("sha512", 0),
+    "sha3_256": ("sha3_256", 0),
+    "sha3_384": ("sha3_384", 0),
+    "sha3_512": ("sha3_512", 0),
+    "shake128": ("shake_128", 32),
+    "shake256": ("shake_256", 64)
+}
+
+# Hash algorithms mbedtls can use for classic signatures
+MBEDTLS_HASHES: List[str] = ["sha1", "sha224", "sha256", "sha384", "sha512"]
+
+class StreamingDigest():
+    """
+    Incrementally hashes a payload (e.g. an Update while it is received) for the prehash mode.
+    Only the result of finalize() - the domain separated digest - is signed or verified.
+    """
+    PREFIX: bytes = b"WDP1"
+
+    def __init__(self, hash_algo: str) -> None:
+        # "none" or unknown hash algorithms fall back to SHA-256
+        self.hash_algo: str = hash_algo if hash_algo in PREHASH_ALGOS else "sha256"
+        name, self.length = PREHASH_ALGOS[self.hash_algo]
+        self.hasher = hashlib.new(name)
+
+    def update(self, chunk: Union[bytes, bytearray, memoryview]) -> None:
+        self.hasher.update(chunk)
+
+    def finalize(self) -> bytes:
+        if self.length:
+            digest: bytes = self.hasher.digest(self.length)
+        else:
+            digest: bytes = self.hasher.digest()
+        return self.PREFIX + self.hash_algo.encode("utf-8") + b"\x00" + digest
+
+class Prehash():
+    @staticmethod
+    def digest(b_message: Union[bytes, memoryview], hash_algo: str, chunk_size: int = PREHASH_CHUNK_SIZE) -> Tuple[bytes, float, str]:
+        # Hashes the payload chunk by chunk and returns the bytes to sign and the measurement data
+        view: memoryview = memoryview(b_message)
+        return Prehash.digest_chunks((view[offset:offset + chunk_size] for offset in range(0, len(view), chunk_size)), hash_algo)
+
+    @staticmethod
+    def digest_chunks(chunks: Iterable[Union[bytes, memoryview]], hash_algo: str) -> Tuple[bytes, float, str]:
+        # Same as digest() for a payload that is given in chunks (e.g. a staged update image)
+        t1: float = START_MEASUREMENT()
+        digest: StreamingDigest = StreamingDigest(hash_algo)
+        for chunk in chunks:
+            digest.update(chunk)
+        b_digest: bytes = digest.finalize()
+        t2: float = END_MEASUREMENT()
+
+        data: float = t2 - t1
+
+        return b_digest, data, UNIT
+
+    @staticmethod
+    def mbedtls_hashtype(hashtype: str) -> str:
+        # SHA-3 and SHAKE are only used for the prehash, mbedtls signs the digest with SHA-256
+        if hashtype in PREHASH_ALGOS and hashtype not in MBEDTLS_HASHES:
+            return "sha256"
+        return hashtype
+
+class ContextCache():
+    """
+    Bounded LRU cache of liboqs signature contexts, keyed by (algorithm, key fingerprint).
+
+    Signer contexts hold the secret key, verifier contexts are keyed by the public key they are used with.
+    Evicted contexts are freed immediately, the remaining ones when free_all() is called on shutdown.
+    """
+    max_size: ClassVar[int] = OQS_CONTEXT_CACHE_SIZE
+    _contexts: ClassVar["OrderedDict[Tuple[str, str, str], oqs.Signature]"] = OrderedDict()
+    _lock: ClassVar[Lock] = Lock()
+
+    @staticmethod
+    def fingerprint(key: bytes) -> str:
+        return sha256(key).hexdigest()
+
+    @staticmethod
+    def _get(role: str, sigalg: str, key: bytes, secret_key: Union[bytes, None]) -> oqs.Signature:
+        cache_key: Tuple[str, str, str] = (role, sigalg, ContextCache.fingerprint(key))
+        with ContextCache._lock:
+            context = ContextCache._contexts.get(cache_key)
+            if context is not None:
+                ContextCache._contexts.move_to_end(cache_key)
+                return context
+
+            context = oqs.Signature(sigalg, secret_key)
+            if ContextCache.max_size > 0:
+                ContextCache._contexts[cache_key] = context
+                while len(ContextCache._contexts) > ContextCache.max_size:
+                    _, evicted = ContextCache._contexts.popitem(last=False)
+                    evicted.free()
+            return context
+
+    @staticmethod
+    def get_signer(sigalg: str, priv_key: bytes) -> oqs.Signature:
+        return ContextCache._get("signer", sigalg, priv_key, priv_key)
+
+    @staticmethod
+    def get_verifier(sigalg: str, pub_key: bytes) -> oqs.Signature:
+        return ContextCache._get("verifier", sigalg, pub_key, None)
+
+    @staticmethod
+    def evict(sigalg: str, key: bytes) -> None:
+        # Evict signer and verifier contexts of the given key, e.g. after a key rotation
+        fingerprint: str = ContextCache.fingerprint(key)
+        with ContextCache._lock:
+            for role in ("signer", "verifier"):
+                context = ContextCache._contexts.pop((role, sigalg, fingerprint), None)
+                if context is not None:
+                    context.free()
+
+    @staticmethod
+    def free_all() -> None:
+        with ContextCache._lock:
+            while ContextCache._contexts:
+                _, context = ContextCache._contexts.popitem()
+                context.free()
+
+
+class VerificationCache():
+    """
+    Bounded cache of successful verifications, persisted as VERIFY_CACHE_FILE in the given secure storage.
+    Keyed by (public key hash, payload digest, signature digest), so an unchanged staged element does not
+    have to be verified again on the next boot. Failed verifications are never cached.
+    """
+    @staticmethod
+    def key(payload: Iterable[Union[bytes, memoryview]], b_signature: bytes, b_pub_key: bytes, variant: str, crypto: str, hashtype: str) -> List[str]:
+        # The algorithm is part of the payload digest, so a result is only reused for the same algorithm.
+        # The payload is given in chunks (SignMessage.payload_chunks), a staged update image is not loaded into memory.
+        payload_digest = sha256(f"{crypto}|{variant}|{hashtype}|".encode("utf-8"))
+        for chunk in payload:
+            payload_digest.update(chunk)
+        return [sha256(b_pub_key).hexdigest(), payload_digest.hexdigest(), sha256(b_signature).hexdigest()]
+
+    @staticmethod
+    def load(storage: Path) -> List[List[str]]:
+        try:
+            with open(Path(storage, VERIFY_CACHE_FILE), "r") as file:
+                entries = load(file)
+            return [entry for entry in entries if isinstance(entry, list) and len(entry) == 3]
+        except (OSError, ValueError):
+            return []
+
+    @staticmethod
+    def contains(storage: Path, cache_key: List[str]) -> bool:
+        return cache_key in VerificationCache.load(storage)
+
+    @staticmethod
+    def add(storage: Path, cache_key: List[str]) -> None:
+        # Most recently verified entries are at the end
+        entries: List[List[str]] = [entry for entry in VerificationCache.load(storage) if entry != cache_key]
+        entries.append(cache_key)
+        entries = entries[-VERIFY_CACHE_SIZE:]
+
+        tmp_file: Path = Path(storage, f".{VERIFY_CACHE_FILE}.{os.getpid()}")
+        try:
+            with open(tmp_file, "w") as file:
+                dump(entries, file)
+            # Replace atomically, so a reset while writing cannot leave a broken cache
+            os.replace(tmp_file, Path(storage, VERIFY_CACHE_FILE))
+        except OSError as ex:
+            print(f"Verification cache could not be saved: {ex}")
+
+    @staticmethod
+    def pub_key_bytes(storage: Path, pub_key_from: str, crypto: str) -> bytes:
+        # Raw bytes of the public key file(s) used for the verification
+        if crypto == "hybrid":
+            return KeyUsage.open_and_save_key_bytes(storage, Hybrid.key_name(pub_key_from, "classic"), "der") + \
+                KeyUsage.open_and_save_key_bytes(storage, Hybrid.key_name(pub_key_from, "pqc"), "der")
+        return KeyUsage.open_and_save_key_bytes(storage, pub_key_from, "der")
+
+
+class Hybrid():
+    """
+    Hybrid mode: every payload is signed with a classic (mbedtls) and a pqc (liboqs) algorithm.
+    Both signatures are computed (and verified) concurrently and carried together in message.signature.
+
+    Signature layout: length of the classic signature (4 bytes, big endian) | classic signature | pqc signature
+    Keys: each component has its own key pair, e.g. server_classic_priv_key and server_pqc_priv_key.
+    The measurement data is a dict with the cycles of both components and of the whole hybrid operation.
+    """
+    _pool: ClassVar[Union[ThreadPoolExecutor, None]] = None
+
+    @staticmethod
+    def pool() -> ThreadPoolExecutor:
+        if Hybrid._pool is None:
+            Hybrid._pool = ThreadPoolExecutor(max_workers=2)
+        return Hybrid._pool
+
+    @staticmethod
+    def split_variant(variant: str) -> Tuple[str, str]:
+        if HYBRID_SEPARATOR in variant:
+            classic, pqc = variant.split(HYBRID_SEPARATOR, 1)
+            return classic, pqc
+        return HYBRID_CLASSIC_DEFAULT, variant
+
+    @staticmethod
+    def key_name(key_name: str, component: str) -> str:
+        # server_priv_key -> server_classic_priv_key (the naming of KeyGen with name="server_classic")
+        owner, key_type = key_name.split("_", 1)
+        return f"{owner}_{component}_{key_type}"
+
+    @staticmethod
+    def encode(b_classic: bytes, b_pqc: bytes) -> bytes:
+        return struct.pack(">I", len(b_classic)) + b_classic + b_pqc
+
+    @staticmethod
+    def decode(b_signature: bytes) -> Tuple[bytes, bytes]:
+        if len(b_signature) < 4:
+            raise ValueError("Hybrid signature is too short")
+        (classic_len,) = struct.unpack(">I", b_signature[:4])
+        if 4 + classic_len > len(b_signature):
+            raise ValueError("Hybrid signature is truncated")
+        return b_signature[4:4 + classic_len], b_signature[4 + classic_len:]
+
+    @staticmethod
+    def sign(b_message: bytes, storage: Path, priv_key_from: str, variant: str, hashtype: str) -> Tuple[bytes, Dict[str, float], str]:
+        classic_variant, pqc_variant = Hybrid.split_variant(variant)
+
+        t1: float = START_MEASUREMENT()
+        classic_job = Hybrid.pool().submit(SignMessage.sign_payload, b_message, storage, Hybrid.key_name(priv_key_from, "classic"), classic_variant, "classic", hashtype)
+        b_pqc, data_pqc, _ = SignMessage.sign_payload(b_message, storage, Hybrid.key_name(priv_key_from, "pqc"), pqc_variant, "pqc", hashtype)
+        b_classic, data_classic, _ = classic_job.result()
+        t2: float = END_MEASUREMENT()
+
+        data: Dict[str, float] = {"classic": data_classic, "pqc": data_pqc, "hybrid": t2 - t1}
+
+        return Hybrid.encode(b_classic, b_pqc), data, UNIT
+
+    @staticmethod
+    def verify(b_message: bytes, b_signature: bytes, storage: Path, pub_key_from: str, variant: str, hashtype: str) -> Tuple[bool, Dict[str, float], str]:
+        classic_variant, pqc_variant = Hybrid.split_variant(variant)
+        b_classic, b_pqc = Hybrid.decode(b_signature)
+
+        t1: float = START_MEASUREMENT()
+        classic_job = Hybrid.pool().submit(VerifyMessage.verify_payload, b_message, b_classic, storage, Hybrid.key_name(pub_key_from, "classic"), classic_variant, "classic", hashtype)
+        valid_pqc, data_pqc, _ = VerifyMessage.verify_payload(b_message, b_pqc, storage, Hybrid.key_name(pub_key_from, "pqc"), pqc_variant, "pqc", hashtype)
+        valid_classic, data_classic, _ = classic_job.result()
+        t2: float = END_MEASUREMENT()
+
+        data: Dict[str, float] = {"classic": data_classic, "pqc": data_pqc, "hybrid": t2 - t1}
+
+        # Both signatures have to be valid
+        return bool(valid_classic) and bool(valid_pqc), data, UNIT
+
+
 class SignMessage():
     # Signs the message.mdata and returns signature and the measurement data
     @staticmethod
@@ -48,46 +309,93 @@ class SignMessage():
 
         return b_signature, data, UNIT
     
+    @staticmethod
+    def build_payload(mdata: Union[DefTicket, MeasuredData, Update, BootTicket, Request, None]) -> bytes:
+        """
+        Returns the bytes that are signed and verified for the mdata of a message.
+        "canonical": compact, deterministic binary encoding (CanonicalEncoder)
+        "json": legacy encoding with json.dumps(indent=2) for compatibility with existing signatures
+        """
+        if settings.signing_payload == "json":
+            m_dict: Dict[str, Any] = Utils.pack_json(mdata)
+            return dumps(m_dict, indent=2).encode('utf-8')
+
+        return CanonicalEncoder.encode(mdata)
+
+    @staticmethod
+    def payload_chunks(mdata: Union[DefTicket, MeasuredData, Update, BootTicket, Request, None]) -> Iterator[Union[bytes, memoryview]]:
+        # build_payload() in chunks: the image of a staged update is streamed from its blob file
+        if settings.signing_payload == "json":
+            yield SignMessage.build_payload(mdata)
+        else:
+            yield from CanonicalEncoder.encode_chunks(mdata)
+
     @staticmethod
     def sign(host: str, message: Message, storage: Path, priv_key_from: str, variant: str, crypto: str, hashtype: str):
         # Create message to sign 
-        m_dict: Dict[str, Any] = Utils.pack_json(message.mdata)
-        b_message: bytes = dumps(m_dict, indent=2).encode('utf-8')
+        b_message: bytes = SignMessage.prepare_payload(host, message, hashtype)
+
+        if crypto == "classic" or crypto == "pqc" or crypto == "hybrid":
+            b_signature, data, unit = SignMessage.sign_payload(b_message, storage, priv_key_from, variant, crypto, hashtype)
 
+        else:
+            print(f"[{host}] Dummy: No signing needed.")
+            b_signature, data, unit = b"", None, "unknown"
+
+        return SignMessage.attach_signature(host, message, b_signature, data, unit)
+
+    @staticmethod
+    def prepare_payload(host: str, message: Message, hashtype: str) -> bytes:
+        # Returns the bytes to sign for the message (the digest of the payload in prehash mode)
+        if settings.prehash:
+            # Sign only the digest of the payload (streamed, so the image of a staged update stays on disk)
+            b_message, data_hash, unit_hash = Prehash.digest_chunks(SignMessage.payload_chunks(message.mdata), hashtype)
+            print(f"[{host}] Prehashed the payload with {hashtype} in {data_hash} {unit_hash}.")
+            return b_message
+        return SignMessage.build_payload(message.mdata)
+
+    @staticmethod
+    def sign_payload(b_message: bytes, storage: Path, priv_key_from: str, variant: str, crypto: str, hashtype: str) -> Tuple[bytes, Any, str]:
+        """
+        Signs the prepared payload with the private key priv_key_from from the storage and returns the signature and the measurement data.
+        Does not access the message itself, so it can also run in a worker thread or process (SigningExecutor).
+        """
         data = None
         unit = "unknown"
         b_signature = b""
+        hashtype = Prehash.mbedtls_hashtype(hashtype)
 
-        if crypto == "classic" or crypto == "pqc":
-
-            if (crypto == "classic") and ("rsa" not in variant):
-                # Load own private key from own secure storage into variable
-                priv_key_ECC: ECC = KeyUsage.open_and_save_key_ECC(storage, priv_key_from, "der")  
+        if (crypto == "classic") and ("rsa" not in variant):
+            # Load own private key from own secure storage into variable
+            priv_key_ECC: ECC = KeyUsage.open_and_save_key_ECC(storage, priv_key_from, "der")  
 
-                # Sign the message with the own private key
-                b_signature, data, unit = SignMessage.classic_sign(priv_key_ECC, b_message, hashtype)
+            # Sign the message with the own private key
+            b_signature, data, unit = SignMessage.classic_sign(priv_key_ECC, b_message, hashtype)
 
-            elif (crypto == "classic") and ("rsa" in variant):
-                # Load own private key from own secure storage into variable
-                priv_key_RSA: RSA = KeyUsage.open_and_save_key_RSA(storage, priv_key_from, "der")  
+        elif (crypto == "classic") and ("rsa" in variant):
+            # Load own private key from own secure storage into variable
+            priv_key_RSA: RSA = KeyUsage.open_and_save_key_RSA(storage, priv_key_from, "der")  
 
-                # Sign the message with the own private key
-                b_signature, data, unit = SignMessage.classic_sign(priv_key_RSA, b_message, hashtype)
+            # Sign the message with the own private key
+            b_signature, data, unit = SignMessage.classic_sign(priv_key_RSA, b_message, hashtype)
 
-            elif crypto == "pqc":
-                # Read private key from file (device)
-                priv_key_new: bytes = KeyUsage.open_and_save_key_bytes(storage, priv_key_from, "der")
+        elif crypto == "pqc":
+            # Read private key from file (device)
+            priv_key_new: bytes = KeyUsage.open_and_save_key_bytes(storage, priv_key_from, "der")
 
-                # Sign the message
-                b_signature, data, unit = SignMessage.liboqs_sign(variant, priv_key_new, b_message)
+            # Sign the message
+            b_signature, data, unit = SignMessage.liboqs_sign(variant, priv_key_new, b_message)
 
-        else:
-            print(f"[{host}] Dummy: No signing needed.")
+        elif crypto == "hybrid":
+            # Classic and pqc signature over the same payload
+            b_signature, data, unit = Hybrid.sign(b_message, storage, priv_key_from, variant, hashtype)
 
-        # Convert signature from bytes to string
-        signature: str = b_signature.hex()
+        return b_signature, data, unit
 
-        if signature != "":
+    @staticmethod
+    def attach_signature(host: str, message: Message, b_signature: bytes, data: Any, unit: str) -> Message:
+        # The signature stays raw bytes, it is only hex encoded at JSON boundaries (Utils.to_json)
+        if b_signature != b"":
             if message.mdata is None:
                 file_type: str = message.name
             else: 
@@ -95,21 +403,24 @@ class SignMessage():
 
             print(f"[{host}] Signed the {file_type} in {data} {unit}.")
 
-        message.signature = signature
+        message.signature = b_signature
 
         return message
 
     @staticmethod
     def liboqs_sign(sigalg: str, priv_key: bytes, b_msg: bytes) -> Tuple[bytes, float, str]:
-        with oqs.Signature(sigalg) as signer:
-            signer = oqs.Signature(sigalg, priv_key)
+        # Reuse the signer context of this key instead of setting up a new one for every signature
+        signer: oqs.Signature = ContextCache.get_signer(sigalg, priv_key)
 
-            t1: float = START_MEASUREMENT()
-            # signer signs the message
-            b_signature: bytes = signer.sign(b_msg)
-            t2: float = END_MEASUREMENT()
+        t1: float = START_MEASUREMENT()
+        # signer signs the message
+        b_signature: bytes = signer.sign(b_msg)
+        t2: float = END_MEASUREMENT()
 
-            data: float = t2 - t1
+        data: float = t2 - t1
+
+        if ContextCache.max_size <= 0:
+            signer.free()
 
         return b_signature, data, UNIT
 
@@ -128,42 +439,66 @@ class VerifyMessage():
         return valid, data, UNIT
 
     @staticmethod
-    def verify(host: str, message: Message, storage: Path, pub_key_from: str, variant: str, crypto: str, hashtype: str):
+    def verify(host: str, message: Message, storage: Path, pub_key_from: str, variant: str, crypto: str, hashtype: str, cached: bool = False):
+        """
+        Verifies the message and returns True or False.
+        With cached=True (staged elements) a successful verification of the same payload, signature and public key is
+        taken from the VerificationCache in the storage; freshness checks (nonce, version) are up to the caller.
+        """
+        cache_key: Optional[List[str]] = None
+        if cached and settings.verify_cache and (crypto in ("classic", "pqc", "hybrid")) and (message.signature is not None):
+            try:
+                cache_key = VerificationCache.key(SignMessage.payload_chunks(message.mdata), Utils.signature_to_bytes(message.signature),
+                                                  VerificationCache.pub_key_bytes(storage, pub_key_from, crypto), variant, crypto, hashtype)
+                if VerificationCache.contains(storage, cache_key):
+                    print(f"[{host}] Verification of the {message.mdata.name} taken from the verification cache.")
+                    return True
+            except Exception as ex:
+                print(f"[{host}] Verification cache not used: {ex}")
+                cache_key = None
+
+        valid, data, unit = VerifyMessage.verify_with_measurement(host, message, storage, pub_key_from, variant, crypto, hashtype)
+
+        if valid and (cache_key is not None):
+            VerificationCache.add(storage, cache_key)
+        return valid
+
+    @staticmethod
+    def verify_many(host: str, messages: List[Message], storage: Path, pub_key_from: str, workers: int = VERIFY_WORKERS) -> List[Tuple[bool, Any, str]]:
+        """
+        Verifies several messages at once and returns the result and the measurement data per message (in the order of messages).
+        The verifications run on a thread pool, liboqs and mbedtls release the GIL while verifying.
+        Each message is verified with its own variant, crypto and hash_algo.
+        """
+        def verify_one(message: Message) -> Tuple[bool, Any, str]:
+            return VerifyMessage.verify_with_measurement(host, message, storage, pub_key_from, message.variant, message.crypto, message.hash_algo)
+
+        if (workers <= 1) or (len(messages) <= 1):
+            return [verify_one(message) for message in messages]
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(messages))) as pool:
+            return list(pool.map(verify_one, messages))
+
+    @staticmethod
+    def verify_with_measurement(host: str, message: Message, storage: Path, pub_key_from: str, variant: str, crypto: str, hashtype: str) -> Tuple[bool, Any, str]:
         valid: bool = False 
         data = None
         unit: str = "unknown"
         file_type: str = "unknown"
         if message.signature is not None:
-            # Converting string to bytes
-            b_signature: bytes = bytes(bytearray.fromhex(message.signature))
+            # Signatures are raw bytes, hex strings only come from messages staged by older versions
+            b_signature: bytes = Utils.signature_to_bytes(message.signature)
             try:
-                # Create message to verify
-                m_dict: Dict[str, Any] = Utils.pack_json(message.mdata)
-                b_message: bytes = dumps(m_dict, indent=2).encode('utf-8')
-
-                if (crypto == "classic") or (crypto == "pqc"):
-
-                    if (crypto == "classic") and (variant == "secp256r1"):
-                        # Load own public key from own secure storage into variable
-                        pub_key_ECC: ECC = KeyUsage.open_and_save_key_ECC(storage, pub_key_from, "der") 
-
-                        # Sign the message with the own private key
-                        valid, data, unit = VerifyMessage.classic_verify(b_message, pub_key_ECC, b_signature, hashtype)
-                    
-                    elif (crypto == "classic") and (variant == "rsa2048" or variant == "rsa4096"):
-
-                        # Load own private key from own secure storage into variable
-                        pub_key_RSA: RSA = KeyUsage.open_and_save_key_RSA(storage, pub_key_from, "der")  
+                if (crypto == "classic") or (crypto == "pqc") or (crypto == "hybrid"):
+                    # Messages staged by older versions have no proof attribute
+                    if getattr(message, "proof", None) is not None:
+                        # mdata has been signed as part of a batch
+                        valid, data, unit = VerifyMessage.verify_batched(host, message, b_signature, storage, pub_key_from, variant, crypto, hashtype)
 
-                        # Sign the message with the own private key
-                        valid, data, unit = VerifyMessage.classic_verify(b_message, pub_key_RSA, b_signature, hashtype)
-                    
-                    elif crypto == "pqc":
-                        # Read pub_key from file
-                        pub_key_new: bytes = KeyUsage.open_and_save_key_bytes(storage, pub_key_from, "der")
-
-                        # Verify the signature
-                        valid, data, unit = VerifyMessage.liboqs_verify(variant, pub_key_new, b_message, b_signature)
+                    else:
+                        # Create message to verify
+                        b_message: bytes = SignMessage.prepare_payload(host, message, hashtype)
+                        valid, data, unit = VerifyMessage.verify_payload(b_message, b_signature, storage, pub_key_from, variant, crypto, hashtype)
 
                 else:
                     print(f"[{host}] Dummy: No verification needed.")
@@ -176,7 +511,7 @@ class VerifyMessage():
             print(f"[{host}] Do not verify the message. (sig = None) because CRYPTO = None")
             valid = True
 
-        if message.signature != "":
+        if (message.signature != b"") and (message.signature != ""):
             if message.mdata is None:
                 file_type: str = message.name
             else: 
@@ -184,18 +519,81 @@ class VerifyMessage():
 
             print(f"[{host}] Verification of {file_type} proven valid: {valid} in {data} {unit}.")
 
-        return valid
+        return valid, data, unit
+
+    @staticmethod
+    def verify_payload(b_message: bytes, b_signature: bytes, storage: Path, pub_key_from: str, variant: str, crypto: str, hashtype: str) -> Tuple[bool, Any, str]:
+        # Verifies the signature of the prepared payload with the public key pub_key_from from the storage
+        valid: bool = False
+        data = None
+        unit: str = "unknown"
+        hashtype = Prehash.mbedtls_hashtype(hashtype)
+
+        if (crypto == "classic") and (variant == "secp256r1"):
+            # Load own public key from own secure storage into variable
+            pub_key_ECC: ECC = KeyUsage.open_and_save_key_ECC(storage, pub_key_from, "der") 
+
+            # Sign the message with the own private key
+            valid, data, unit = VerifyMessage.classic_verify(b_message, pub_key_ECC, b_signature, hashtype)
+        
+        elif (crypto == "classic") and (variant == "rsa2048" or variant == "rsa4096"):
+
+            # Load own private key from own secure storage into variable
+            pub_key_RSA: RSA = KeyUsage.open_and_save_key_RSA(storage, pub_key_from, "der")  
+
+            # Sign the message with the own private key
+            valid, data, unit = VerifyMessage.classic_verify(b_message, pub_key_RSA, b_signature, hashtype)
+        
+        elif crypto == "pqc":
+            # Read pub_key from file
+            pub_key_new: bytes = KeyUsage.open_and_save_key_bytes(storage, pub_key_from, "der")
+
+            # Verify the signature
+            valid, data, unit = VerifyMessage.liboqs_verify(variant, pub_key_new, b_message, b_signature)
+
+        elif crypto == "hybrid":
+            # Classic and pqc signature have to be valid
+            valid, data, unit = Hybrid.verify(b_message, b_signature, storage, pub_key_from, variant, hashtype)
+
+        return valid, data, unit
+
+    @staticmethod
+    def verify_batched(host: str, message: Message, b_signature: bytes, storage: Path, pub_key_from: str, variant: str, crypto: str, hashtype: str) -> Tuple[bool, Any, str]:
+        """
+        Verifies a message that has been signed as part of a batch: the Merkle proof has to lead from the payload to the root
+        and the signature has to be valid for the root. Verified root signatures are cached, so further tickets of the
+        same batch only cost the proof check.
+        """
+        proof: MerkleProof = message.proof
+        if not MerkleTree.verify_proof(SignMessage.build_payload(message.mdata), proof):
+            print(f"[{host}] Merkle proof of the {message.mdata.name} is not valid.")
+            return False, None, "unknown"
+
+        key_file: str = Hybrid.key_name(pub_key_from, "pqc") if crypto == "hybrid" else pub_key_from
+        pub_key_id: str = ContextCache.fingerprint(KeyUsage.open_and_save_key_bytes(storage, key_file, "der"))
+        if RootSignatureCache.contains(proof.root, b_signature, pub_key_id):
+            print(f"[{host}] Signature of the batch root has already been verified.")
+            return True, 0, UNIT
+
+        valid, data, unit = VerifyMessage.verify_payload(MerkleTree.signed_root(proof.root), b_signature, storage, pub_key_from, variant, crypto, hashtype)
+        if valid:
+            RootSignatureCache.add(proof.root, b_signature, pub_key_id)
+
+        return valid, data, unit
 
     @staticmethod
     def liboqs_verify(sigalg: str, b_pub_key: bytes, b_msg: bytes, b_signature: bytes) -> Tuple[bool, float, str]:
-        with oqs.Signature(sigalg) as verifier:
+        verifier: oqs.Signature = ContextCache.get_verifier(sigalg, b_pub_key)
 
-            t1: float = START_MEASUREMENT()
-            # verifier verifies the signature
-            is_valid: bool = verifier.verify(b_msg, b_signature, b_pub_key)
-            t2: float = END_MEASUREMENT()
+        t1: float = START_MEASUREMENT()
+        # verifier verifies the signature
+        is_valid: bool = verifier.verify(b_msg, b_signature, b_pub_key)
+        t2: float = END_MEASUREMENT()
+
+        data: float = t2 - t1 
 
-            data: float = t2 - t1 
+        if ContextCache.max_size <= 0:
+            verifier.free()
 
         return is_valid, data, UNIT
 
@@ -290,4 +688,15 @@ class KeyGen():
 
             print(f"{name}: Quantumsafe key generation took {data} {UNIT}.")
 
-        return pub_key, priv_key, data, UNIT
\ No newline at end of file
+        return pub_key, priv_key, data, UNIT
+
+    @staticmethod
+    def gen_keypair_hybrid(variant: str, name: str, priv_storage: Path, pub_storage: Path) -> Tuple[Tuple[bytes, bytes], Tuple[bytes, bytes], Dict[str, float], str]:
+        # Generates the classic and the pqc key pair of a hybrid variant (e.g. server_classic_* and server_pqc_*)
+        classic_variant, pqc_variant = Hybrid.split_variant(variant)
+        pub_classic, priv_classic, data_classic, unit = KeyGen.gen_keypair_classic(f"{name}_classic", priv_storage, pub_storage, classic_variant)
+        pub_pqc, priv_pqc, data_pqc, unit = KeyGen.gen_keypair_pqc(pqc_variant, f"{name}_pqc", priv_storage, pub_storage)
+
+        data: Dict[str, float] = {"classic": data_classic, "pqc": data_pqc, "hybrid": data_classic + data_pqc}
+
+        return (pub_classic, pub_pqc), (priv_classic, priv_pqc), data, UNIT
@@ -0,0 +1,222 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+from hashlib import sha256
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+import mmap
+import os
+
+from settings import UPDATE_IMAGE_CHUNK_SIZE, DELTA_BLOCK_SIZE, UPDATE_ARTIFACTS, UPDATE_ARTIFACTS_KEEP, INSTALLED_IMAGES
+from modules.encoding import CanonicalEncoder
+from modules.wire import WireCodec
+from modules.updateimage import UpdateImage
+
+# Operations of a delta
+OP_COPY: int = 0
+OP_LITERAL: int = 1
+
+# Length of the block prefix used to find matching blocks of the base image
+PROBE_SIZE: int = 8
+
+class BlockDelta():
+    """
+    Block based binary delta (similar to rsync) from a base image to a target image.
+
+    Layout: MAGIC | sha256 of the base | length of the target (varint) | sha256 of the target | operations
+    Operations: OP_COPY | offset (varint) | length (varint) copies from the base image,
+                OP_LITERAL | length (varint) | bytes inserts new data.
+    The blocks of the base image at multiples of the block size are indexed; the target is scanned for them
+    byte by byte in changed regions and block by block where it continues to match the base.
+    An Update carries a delta instead of the image if its body starts with MAGIC.
+    """
+    MAGIC: bytes = b"WDD1"
+
+    @staticmethod
+    def is_delta(body: Union[str, bytes, UpdateImage, None]) -> bool:
+        if isinstance(body, UpdateImage):
+            if body.text or (body.length < len(BlockDelta.MAGIC)):
+                return False
+            with open(body.path, "rb") as file:
+                return file.read(len(BlockDelta.MAGIC)) == BlockDelta.MAGIC
+        return isinstance(body, (bytes, bytearray)) and body.startswith(BlockDelta.MAGIC)
+
+    @staticmethod
+    def diff(base: Union[bytes, memoryview, mmap.mmap], target: Union[bytes, memoryview], block_size: int = DELTA_BLOCK_SIZE) -> bytes:
+        target = bytes(target)
+        ops: List[List[int]] = []  # [OP_COPY, offset, length] or [OP_LITERAL, start in target, end in target]
+
+        index: Dict[bytes, int] = {}
+        for offset in range(0, len(base) - block_size + 1, block_size):
+            index.setdefault(bytes(base[offset:offset + PROBE_SIZE]), offset)
+
+        def add_copy(offset: int, length: int) -> None:
+            if (len(ops) > 0) and (ops[-1][0] == OP_COPY) and (ops[-1][1] + ops[-1][2] == offset):
+                ops[-1][2] += length
+            else:
+                ops.append([OP_COPY, offset, length])
+
+        pos: int = 0
+        literal_start: int = 0
+        next_base: int = -1
+        while pos + block_size <= len(target):
+            match: int = -1
+            # The target often continues like the base after a matching block
+            if (next_base >= 0) and (base[next_base:next_base + block_size] == target[pos:pos + block_size]):
+                match = next_base
+            else:
+                # Only the short prefix is looked up for every byte, the whole block only for candidates
+                candidate: Optional[int] = index.get(target[pos:pos + PROBE_SIZE])
+                if (candidate is not None) and (base[candidate:candidate + block_size] == target[pos:pos + block_size]):
+                    match = candidate
+
+            if match < 0:
+                pos += 1
+                next_base = -1
+                continue
+
+            if literal_start < pos:
+                ops.append([OP_LITERAL, literal_start, pos])
+            add_copy(match, block_size)
+            pos += block_size
+            literal_start = pos
+            next_base = match + block_size
+
+        # Rest of the target shorter than a block
+        rest: int = len(target) - literal_start
+        if (rest > 0) and (literal_start == pos) and (next_base >= 0) and (base[next_base:next_base + rest] == target[pos:]):
+            add_copy(next_base, rest)
+        elif rest > 0:
+            ops.append([OP_LITERAL, literal_start, len(target)])
+
+        out: bytearray = bytearray(BlockDelta.MAGIC)
+        out += sha256(base).digest()
+        CanonicalEncoder.encode_varint(len(target), out)
+        out += sha256(target).digest()
+        for op, a, b in ops:
+            out.append(op)
+            if op == OP_COPY:
+                CanonicalEncoder.encode_varint(a, out)
+                CanonicalEncoder.encode_varint(b, out)
+            else:
+                CanonicalEncoder.encode_varint(b - a, out)
+                out += target[a:b]
+        return bytes(out)
+
+    @staticmethod
+    def header(delta: memoryview) -> Tuple[bytes, int, bytes, int]:
+        # sha256 of the base, length and sha256 of the target and the position of the first operation
+        if bytes(delta[:len(BlockDelta.MAGIC)]) != BlockDelta.MAGIC:
+            raise ValueError("No delta")
+        pos: int = len(BlockDelta.MAGIC)
+        base_hash: bytes = bytes(delta[pos:pos + 32])
+        target_length, pos = WireCodec.decode_varint(delta, pos + 32)
+        target_hash: bytes = bytes(delta[pos:pos + 32])
+        return base_hash, target_length, target_hash, pos + 32
+
+    @staticmethod
+    def apply(delta: Union[bytes, memoryview], base: Path, target: Path) -> int:
+        """
+        Applies the delta to the base image file and writes the target image file (atomically).
+        Raises ValueError if the base is not the one of the delta or the result does not have the signed target hash.
+        Returns the length of the target image.
+        """
+        view: memoryview = memoryview(delta)
+        base_hash, target_length, target_hash, pos = BlockDelta.header(view)
+
+        with open(base, "rb") as base_file:
+            base_size: int = os.fstat(base_file.fileno()).st_size
+            with (mmap.mmap(base_file.fileno(), 0, access=mmap.ACCESS_READ) if base_size > 0 else memoryview(b"")) as mapped:
+                if sha256(mapped).digest() != base_hash:
+                    raise ValueError(f"Base image {base} does not match the delta")
+
+                hasher = sha256()
+                length: int = 0
+                tmp_file: Path = Path(f"{target}.{os.getpid()}")
+                try:
+                    with open(tmp_file, "wb") as out:
+                        while pos < len(view):
+                            op: int = view[pos]
+                            if op == OP_COPY:
+                                offset, pos = WireCodec.decode_varint(view, pos + 1)
+                                size, pos = WireCodec.decode_varint(view, pos)
+                                if offset + size > base_size:
+                                    raise ValueError("Delta copies beyond the base image")
+                                # Long runs of the base are copied chunk by chunk
+                                for start in range(offset, offset + size, UPDATE_IMAGE_CHUNK_SIZE):
+                                    data = mapped[start:min(start + UPDATE_IMAGE_CHUNK_SIZE, offset + size)]
+                                    hasher.update(data)
+                                    out.write(data)
+                            elif op == OP_LITERAL:
+                                size, pos = WireCodec.decode_varint(view, pos + 1)
+                                hasher.update(view[pos:pos + size])
+                                out.write(view[pos:pos + size])
+                                pos += size
+                            else:
+                                raise ValueError(f"Unknown delta operation {op}")
+                            length += size
+
+                    if (length != target_length) or (hasher.digest() != target_hash):
+                        raise ValueError("Patched image does not match the target hash")
+                except Exception:
+                    os.remove(tmp_file)
+                    raise
+
+        # The base may be replaced by the target (installed image of the same update_type)
+        os.replace(tmp_file, target)
+        return length
+
+
+class UpdateArtifacts():
+    """
+    Server: images of the generated updates per update_type and version (the bases of the deltas).
+    """
+    @staticmethod
+    def path(update_type: str, version_nr: int) -> Path:
+        return Path(UPDATE_ARTIFACTS, update_type, f"{version_nr}.img")
+
+    @staticmethod
+    def versions(update_type: str) -> List[int]:
+        try:
+            return sorted(int(filename[:-len(".img")]) for filename in os.listdir(Path(UPDATE_ARTIFACTS, update_type)) if filename.endswith(".img"))
+        except (OSError, ValueError):
+            return []
+
+    @staticmethod
+    def save(update_type: str, version_nr: int, body: Union[str, bytes, UpdateImage]) -> None:
+        os.makedirs(Path(UPDATE_ARTIFACTS, update_type), exist_ok=True)
+        UpdateImage.write(body, UpdateArtifacts.path(update_type, version_nr))
+        # Keep only the newest artifacts
+        for version_nr in UpdateArtifacts.versions(update_type)[:-UPDATE_ARTIFACTS_KEEP]:
+            os.remove(UpdateArtifacts.path(update_type, version_nr))
+
+    @staticmethod
+    def base(update_type: str, device_version_nr: int) -> Optional[Path]:
+        # Newest image of the update_type the device can have installed
+        versions: List[int] = [version_nr for version_nr in UpdateArtifacts.versions(update_type) if version_nr <= device_version_nr]
+        if len(versions) == 0:
+            return None
+        return UpdateArtifacts.path(update_type, versions[-1])
+
+
+class InstalledImages():
+    """
+    Device: the installed image of each update_type (the base of the next delta).
+    """
+    @staticmethod
+    def path(update_type: str) -> Path:
+        return Path(INSTALLED_IMAGES, f"{update_type}.img")
+
+    @staticmethod
+    def install(update_type: str, body: Union[str, bytes, UpdateImage]) -> int:
+        # Installs the image of a full update or applies a delta to the installed image; returns the installed length
+        os.makedirs(INSTALLED_IMAGES, exist_ok=True)
+        if BlockDelta.is_delta(body):
+            delta: bytes = body.read() if isinstance(body, UpdateImage) else body
+            return BlockDelta.apply(delta, InstalledImages.path(update_type), InstalledImages.path(update_type))
+        return UpdateImage.write(body, InstalledImages.path(update_type)).length
@@ -0,0 +1,134 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+from modules.messagetypes import *
+from modules.updateimage import UpdateImage
+
+# Tags of the messagetypes that can be signed (0 is used for an empty mdata)
+TYPE_TAGS: Dict[type, int] = {
+    Request: 1,
+    DefTicket: 2,
+    BootTicket: 3,
+    Update: 4,
+    MeasuredData: 5,
+    UpdateManifest: 6
+}
+
+# Fixed order in which the fields of each messagetype are encoded
+FIELDS: Dict[type, Tuple[str, ...]] = {
+    Request: ("requesttype", "timestamp", "nonce"),
+    DefTicket: ("nonce", "deferral_time", "timestamp"),
+    BootTicket: ("bootticket", "nonce", "timestamp", "counter_init_time"),
+    Update: ("update_type", "update", "version_nr", "timestamp"),
+    MeasuredData: ("measured_data", "timestamp"),
+    UpdateManifest: ("update_type", "version_nr", "timestamp", "length", "text", "chunk_size", "chunk_hashes")
+}
+
+# Tags of the encoded values
+T_NONE: int = 0
+T_FALSE: int = 1
+T_TRUE: int = 2
+T_INT: int = 3
+T_STR: int = 4
+T_BYTES: int = 5
+T_LIST: int = 6
+
+class CanonicalEncoder():
+    """
+    Deterministic and compact binary encoding of the messagetypes, used as the payload to sign and verify.
+
+    Layout: MAGIC | type tag | one entry per field in the order given by FIELDS.
+    Each entry is a value tag followed by the value; integers are zigzag varints,
+    strings and bytes are prefixed with their length as a varint.
+    """
+    MAGIC: bytes = b"WDC1"
+
+    @staticmethod
+    def encode_varint(value: int, out: bytearray) -> None:
+        while True:
+            byte: int = value & 0x7F
+            value >>= 7
+            if value:
+                out.append(byte | 0x80)
+            else:
+                out.append(byte)
+                return
+
+    @staticmethod
+    def encode_value(value: Any, out: bytearray) -> None:
+        if value is None:
+            out.append(T_NONE)
+        elif isinstance(value, bool):
+            out.append(T_TRUE if value else T_FALSE)
+        elif isinstance(value, int):
+            out.append(T_INT)
+            # Zigzag encoding to map signed to unsigned integers
+            CanonicalEncoder.encode_varint((value << 1) if value >= 0 else ((-value << 1) - 1), out)
+        elif isinstance(value, str):
+            b_value: bytes = value.encode("utf-8")
+            out.append(T_STR)
+            CanonicalEncoder.encode_varint(len(b_value), out)
+            out += b_value
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            out.append(T_BYTES)
+            CanonicalEncoder.encode_varint(len(value), out)
+            out += value
+        elif isinstance(value, (list, tuple)):
+            out.append(T_LIST)
+            CanonicalEncoder.encode_varint(len(value), out)
+            for item in value:
+                CanonicalEncoder.encode_value(item, out)
+        elif isinstance(value, UpdateImage):
+            # Encoded like the str or bytes body it has been saved from
+            out.append(T_STR if value.text else T_BYTES)
+            CanonicalEncoder.encode_varint(value.length, out)
+            out += value.read()
+        else:
+            raise TypeError(f"Cannot encode value of type {type(value).__name__}")
+
+    @staticmethod
+    def encode(mdata: Union[DefTicket, MeasuredData, Update, BootTicket, Request, None]) -> bytes:
+        out: bytearray = bytearray(CanonicalEncoder.MAGIC)
+        if mdata is None:
+            out.append(0)
+            return bytes(out)
+
+        msg_type: type = type(mdata)
+        if msg_type not in TYPE_TAGS:
+            raise TypeError(f"Cannot encode messagetype {msg_type.__name__}")
+
+        out.append(TYPE_TAGS[msg_type])
+        for field in FIELDS[msg_type]:
+            CanonicalEncoder.encode_value(getattr(mdata, field), out)
+        return bytes(out)
+
+    @staticmethod
+    def encode_chunks(mdata: Union[DefTicket, MeasuredData, Update, BootTicket, Request, None]) -> Iterator[Union[bytes, memoryview]]:
+        """
+        Yields the same bytes as encode(), but the body of an UpdateImage is passed through as the chunks
+        of its mapped blob file, so a staged update can be hashed without loading it into memory.
+        """
+        if (mdata is None) or not any(isinstance(getattr(mdata, field, None), UpdateImage) for field in FIELDS.get(type(mdata), ())):
+            yield CanonicalEncoder.encode(mdata)
+            return
+
+        out: bytearray = bytearray(CanonicalEncoder.MAGIC)
+        out.append(TYPE_TAGS[type(mdata)])
+        for field in FIELDS[type(mdata)]:
+            value: Any = getattr(mdata, field)
+            if isinstance(value, UpdateImage):
+                out.append(T_STR if value.text else T_BYTES)
+                CanonicalEncoder.encode_varint(value.length, out)
+                yield bytes(out)
+                yield from value.chunks()
+                out = bytearray()
+            else:
+                CanonicalEncoder.encode_value(value, out)
+        yield bytes(out)
@@ -0,0 +1,70 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+from modules.crypto import SignMessage
+from modules.keys import KeyUsage
+
+def load_signing_key(storage: Path, priv_key_from: str) -> None:
+    """
+    Initializer of the pool workers: loads the private key once into the process-wide KeyCache.
+    """
+    try:
+        KeyUsage.open_and_save_key_bytes(storage, priv_key_from, "der")
+    except Exception as ex:
+        print(f"[SigningExecutor] Could not preload the private key {priv_key_from}: {ex}")
+
+class SigningExecutor():
+    """
+    Runs signing jobs (SignMessage.sign_payload) in one of three modes:
+    - "inline": in the calling actor, the returned future is already done
+    - "thread": on a thread pool (liboqs and mbedtls release the GIL while signing)
+    - "process": on a process pool, each worker keeps the key and liboqs contexts loaded
+
+    Parameters:
+    -----------
+    mode: str
+        "inline", "thread" or "process"
+    workers: int
+        Number of pool workers
+    storage: Path
+        Secure storage the private key is read from
+    priv_key_from: str
+        Filename of the private key (without format)
+    """
+    def __init__(self, mode: str, workers: int, storage: Path, priv_key_from: str) -> None:
+        self.mode = mode
+        self.storage = storage
+        self.priv_key_from = priv_key_from
+        self.pool: Optional[Executor] = None
+
+        if mode == "thread":
+            self.pool = ThreadPoolExecutor(max_workers=workers, initializer=load_signing_key, initargs=(storage, priv_key_from))
+        elif mode == "process":
+            self.pool = ProcessPoolExecutor(max_workers=workers, initializer=load_signing_key, initargs=(storage, priv_key_from))
+        elif mode != "inline":
+            raise ValueError(f"Unsupported signing executor: {mode}")
+
+    def submit(self, b_message: bytes, variant: str, crypto: str, hashtype: str) -> "Future[Tuple[bytes, Any, str]]":
+        if self.pool is not None:
+            return self.pool.submit(SignMessage.sign_payload, b_message, self.storage, self.priv_key_from, variant, crypto, hashtype)
+
+        future: "Future[Tuple[bytes, Any, str]]" = Future()
+        try:
+            future.set_result(SignMessage.sign_payload(b_message, self.storage, self.priv_key_from, variant, crypto, hashtype))
+        except Exception as ex:
+            future.set_exception(ex)
+        return future
+
+    def shutdown(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
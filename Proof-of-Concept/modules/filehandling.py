@@ -8,19 +8,24 @@
 
 from pathlib import Path
 import pickle
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Optional, Union
 import csv
 import os
+import shutil
 import json
 from pandas import read_csv
 
-from modules.messagetypes import Message
+import settings
+from modules.messagetypes import Message, Update
+from modules.updateimage import UpdateImage
 
 class FileHandling():
     @staticmethod
     def save_object(obj_to_save: Message, path: Path) -> bool:
         """
         Save a message with pickle to store and restore it later.
+        The body of an Update is written to a separate blob file (<filename>.blob, see UpdateImage),
+        only the message with a reference to the blob is pickled.
         
         Parameters:
         -----------
@@ -35,6 +40,14 @@ class FileHandling():
             filename: str = obj_to_save.mdata.name
 
         try:
+            if isinstance(obj_to_save.mdata, Update) and (obj_to_save.mdata.update is not None):
+                update: Update = obj_to_save.mdata
+                image: UpdateImage = UpdateImage.write(update.update, UpdateImage.blob_path(path, filename))
+                # Pickle a copy, the message itself keeps its body
+                obj_to_save = Message(obj_to_save.addresses, obj_to_save.sequence_list, obj_to_save.state, obj_to_save.signature, obj_to_save.crypto,
+                                      obj_to_save.variant, obj_to_save.scenario, obj_to_save.hash_algo,
+                                      Update(update.update_type, image, update.version_nr, update.timestamp), obj_to_save.proof)
+
             with open(Path(path, filename), "wb") as file:
                 pickle.dump(obj_to_save, file, protocol=pickle.HIGHEST_PROTOCOL)
 
@@ -48,6 +61,7 @@ class FileHandling():
     def pickle_file_to_object(filename_pickle: str, path: Path): # return Any?
         """
         Checks what type of message is stored in the pickle file and loads it into an object variable
+        The body of a saved Update stays in its blob file, the loaded Update refers to it with an UpdateImage.
         
         Parameters:
         -----------
@@ -59,11 +73,22 @@ class FileHandling():
         try:
             with open(Path(path, filename_pickle), "rb") as file:
                 data = pickle.load(file, encoding="bytes")
-                return data
+            if isinstance(data, Message) and isinstance(data.mdata, Update) and isinstance(data.mdata.update, UpdateImage):
+                # The blob belongs to the file the message has been loaded from (staged files are copied and renamed)
+                data.mdata.update.path = str(UpdateImage.blob_path(path, filename_pickle))
+            return data
         except Exception as ex:
             print("Error during unpickling object (Possibly unsupported): ", ex)
             return False
 
+    @staticmethod
+    def copy_object(src_path: Path, src_filename: str, dst_path: Path, dst_filename: str) -> None:
+        # Copies a saved message together with the blob of its update (if there is one)
+        shutil.copy(Path(src_path, src_filename), Path(dst_path, dst_filename))
+        blob: Path = UpdateImage.blob_path(src_path, src_filename)
+        if os.path.exists(blob):
+            shutil.copy(blob, UpdateImage.blob_path(dst_path, dst_filename))
+
     @staticmethod
     def save_to_txtfile(data: str, filename: str, path: Path) -> bool:
         """
@@ -127,6 +152,15 @@ class FileHandling():
     @staticmethod
     def gen_filepath(unit: str, scenario: int, variant: str, hash_algo: str, path: Path):
         filename: str = f"{unit}_{scenario}_{variant}_{hash_algo}"
+        if settings.compression != "none":
+            # Measurements with compressed updates are kept apart for each algorithm
+            filename = f"{filename}_{settings.compression}"
+        if settings.fused_pipeline:
+            # Measurements of the fused server pipeline are kept apart from the actor steps
+            filename = f"{filename}_fused"
+        if settings.system_base != settings.DEFAULT_SYSTEM_BASE:
+            # Measurements on another Thespian system base are kept apart for each base
+            filename = f"{filename}_{settings.system_base}"
         filepath: Path = Path(path, filename)
         return filepath
 
@@ -143,14 +177,27 @@ class DataHandling():
             writer.writerow(header)
 
     @staticmethod
-    def save_to_csv_functions(path: Path, no: int, algo_name: str, gen_keypair_s: float, sign_s: float, verify_s: float, valid: str) -> None:
+    def save_to_csv_functions(path: Path, no: int, algo_name: str, gen_keypair_s: float, sign_s: float, verify_s: float, valid: str, prehash_s: Optional[float] = None) -> None:
         # Open the file in the write mode
         with open(f'{path}/{algo_name}.csv', 'a', encoding='UTF8', newline='') as f:
             # create the csv writer
             writer = csv.writer(f)
 
             # Write a header row to the csv file
-            writer.writerow([no, algo_name, gen_keypair_s, sign_s, verify_s, valid])
+            row: List[Any] = [no, algo_name, gen_keypair_s, sign_s, verify_s, valid]
+            # Measurements in prehash mode have an additional column (HEADER_FUNCTIONS_PREHASH)
+            if prehash_s is not None:
+                row.append(prehash_s)
+            writer.writerow(row)
+
+    @staticmethod
+    def save_to_csv_functions_hybrid(path: Path, no: int, algo_name: str, gen_keypair_s: Dict[str, float], sign_s: Dict[str, float], verify_s: Dict[str, float], valid: str) -> None:
+        # Hybrid measurements (HEADER_FUNCTIONS_HYBRID): totals of the hybrid operations followed by the cycles of each component
+        with open(f'{path}/{algo_name}.csv', 'a', encoding='UTF8', newline='') as f:
+            writer = csv.writer(f)
+            row: List[Any] = [no, algo_name, gen_keypair_s["hybrid"], sign_s["hybrid"], verify_s["hybrid"], valid,
+                              sign_s["classic"], sign_s["pqc"], verify_s["classic"], verify_s["pqc"]]
+            writer.writerow(row)
 
     @staticmethod
     def save_to_csv_evaluation(path: Path, algo_name: str, mean: int, median: int, std: int, min: int, max: int) -> None:
@@ -10,10 +10,12 @@ from datetime import datetime
 from secrets import token_urlsafe
 from random import randint, choice
 from pathlib import Path
-from typing import Tuple, List
+from typing import Tuple, List, Optional
 
-from settings import D_STORAGE, START_TIME_WDT, S_STORAGE
+from settings import D_STORAGE, START_TIME_WDT, UPDATE_IMAGE_SIZE
 from modules.filehandling import FileHandling as fh
+from modules.delta import BlockDelta, UpdateArtifacts
+from modules.compression import UpdateCompression
 from modules.messagetypes import *
 
 #################################################################################################
@@ -53,7 +55,7 @@ class GenerateDeviceObjects():
         return timestamp, nonce
 
     @staticmethod
-    def gen_request(msg_obj: Message, request_type: str) -> Message:        
+    def gen_request(msg_obj: Message, request_type: str, path: Path = D_STORAGE) -> Message:        
         """
         Generates a message of type Message with the information for a new Request object.
         Request contains the type of the request object and a nonce.
@@ -62,13 +64,14 @@ class GenerateDeviceObjects():
         -----------
         msg_obj: Message
         request_type: str ("update", "bootticket", "defticket")
+        path: Path (secure storage the nonce is saved to)
 
         return:
         msg_obj: Message
 
         """
         print("[DEVICE] REQUEST GENERATOR")
-        timestamp, nonce = GenerateDeviceObjects.gen_nonce(D_STORAGE)
+        timestamp, nonce = GenerateDeviceObjects.gen_nonce(path)
         msg_obj.mdata = Request(request_type, timestamp, nonce)
         print(f"[DEVICE] Request {request_type} from the server.")
         return msg_obj
@@ -118,12 +121,71 @@ class GenerateServerObjects():
         print("[SERVER] UPDATE GENERATOR")
         timestamp: int = int(datetime.now().timestamp())
         update: str = f"update_{str(timestamp)}"
+        if UPDATE_IMAGE_SIZE > len(update):
+            # Image of a realistic size for measurements with large updates
+            update = update.ljust(UPDATE_IMAGE_SIZE, "#")
         update_type: str = choice(update_types)
-        # read from version and add a 1 for new version nr.
+        # read the version the device has installed and add a 1 for new version nr.
         stored_version_nr: str = fh.read_from_file("version.txt", D_STORAGE)
-        stored_version_nr: str = fh.read_from_file("version.txt", S_STORAGE)
         version_nr: int = int(stored_version_nr) + 1
-        msg_obj.mdata = Update(update, update_type, version_nr, timestamp)
+        msg_obj.mdata = Update(update_type, update, version_nr, timestamp)
+        return msg_obj
+
+    @staticmethod
+    def gen_delta_update(msg_obj: Message) -> Message:
+        """
+        Replaces the image of the generated Update with a binary delta from the image the device has installed (--delta-update).
+        The server keeps the image of every generated update per update_type; the delta base is the newest one with a
+        version the device can have installed (the version reported in the device storage). Without a base, or if the
+        delta is not smaller, the full image is sent.
+
+        Parameters:
+        -----------
+        msg_obj: Message
+            Message with the generated Update
+
+        return:
+        msg_obj: Message
+        """
+        update: Update = msg_obj.mdata
+        device_version_nr: int = int(fh.read_from_file("version.txt", D_STORAGE))
+        base: Optional[Path] = UpdateArtifacts.base(update.update_type, device_version_nr)
+        UpdateArtifacts.save(update.update_type, update.version_nr, update.update)
+
+        if base is None:
+            print(f"[SERVER] No former {update.update_type} image: send the full update.")
+            return msg_obj
+
+        b_update: bytes = update.update.encode("utf-8") if isinstance(update.update, str) else bytes(update.update)
+        with open(base, "rb") as file:
+            delta: bytes = BlockDelta.diff(file.read(), b_update)
+        print(f"[SERVER] Delta from {base.name} to version {update.version_nr}: {len(delta)} instead of {len(b_update)} bytes.")
+        if len(delta) < len(b_update):
+            msg_obj.mdata = Update(update.update_type, delta, update.version_nr, update.timestamp)
+        return msg_obj
+
+    @staticmethod
+    def gen_compressed_update(msg_obj: Message, algo: str, level: Optional[int], signed_uncompressed: bool) -> Message:
+        """
+        Replaces the image of the Update with the compressed image (--compression).
+
+        Parameters:
+        -----------
+        msg_obj: Message
+            Message with the Update (before signing, or after signing if the signature covers the uncompressed Update)
+        algo: str
+            "zlib", "bz2" or "lzma"
+        level: Optional[int]
+            Compression level (None: level of UPDATE_COMPRESSION_LEVELS)
+        signed_uncompressed: bool
+            Marks the image to be decompressed before the verification
+
+        return:
+        msg_obj: Message
+        """
+        update: Update = msg_obj.mdata
+        compressed: bytes = UpdateCompression.compress(update.update, algo, level, signed_uncompressed)
+        msg_obj.mdata = Update(update.update_type, compressed, update.version_nr, update.timestamp)
         return msg_obj
 
     @staticmethod
@@ -0,0 +1,149 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+import os
+import shutil
+import uuid
+
+from settings import KEY_POOL, KEY_POOL_WORKERS
+from modules.crypto import KeyGen, Hybrid
+from modules.filehandling import FileHandling as fh
+
+# Filename (without format) of the key pair inside a pool entry
+ENTRY_NAME: str = "pool"
+
+def generate_entry(crypto: str, variant: str, pool_dir: Path) -> str:
+    """
+    Worker function of the pool: generates one key pair in a temporary directory and
+    renames it into the pool, so other processes never see a half written entry.
+    """
+    entry_id: str = uuid.uuid4().hex
+    tmp_dir: Path = Path(pool_dir, f".tmp-{entry_id}")
+    os.makedirs(tmp_dir)
+
+    if crypto == "classic":
+        KeyGen.gen_keypair_classic(ENTRY_NAME, tmp_dir, tmp_dir, variant)
+    elif crypto == "pqc":
+        KeyGen.gen_keypair_pqc(variant, ENTRY_NAME, tmp_dir, tmp_dir)
+    else:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise ValueError(f"Unsupported crypto for the key pool: {crypto}")
+
+    os.rename(tmp_dir, Path(pool_dir, entry_id))
+    return entry_id
+
+class KeyPool():
+    """
+    Pool of key pairs generated ahead of time, one directory per crypto and variant (KEY_POOL/<crypto>/<variant>/<entry>).
+    fill() generates key pairs on worker processes, provision() moves pooled key pairs into the secure storages
+    and only generates keys inline if the pool is empty. Hybrid variants use the classic and the pqc pool.
+    """
+    @staticmethod
+    def pool_dir(crypto: str, variant: str) -> Path:
+        return Path(KEY_POOL, crypto, variant)
+
+    @staticmethod
+    def components(crypto: str, variant: str) -> List[Tuple[str, str, str]]:
+        # (suffix of the key name, crypto, variant) of each key pair needed for crypto and variant
+        if crypto == "hybrid":
+            classic_variant, pqc_variant = Hybrid.split_variant(variant)
+            return [("_classic", "classic", classic_variant), ("_pqc", "pqc", pqc_variant)]
+        return [("", crypto, variant)]
+
+    @staticmethod
+    def entries(crypto: str, variant: str) -> List[Path]:
+        pool_dir: Path = KeyPool.pool_dir(crypto, variant)
+        if not os.path.exists(pool_dir):
+            return []
+        # Entries in progress (.tmp-*) or claimed by another process (.claimed-*) are hidden
+        return sorted(Path(pool_dir, entry) for entry in os.listdir(pool_dir) if not entry.startswith("."))
+
+    @staticmethod
+    def size(crypto: str, variant: str) -> int:
+        return len(KeyPool.entries(crypto, variant))
+
+    @staticmethod
+    def fill(crypto: str, variant: str, target: int, workers: int = KEY_POOL_WORKERS) -> int:
+        # Generates key pairs until every pool of crypto and variant holds target entries, returns the number of new key pairs
+        jobs: List[Tuple[str, str, Path]] = []
+        for _, component_crypto, component_variant in KeyPool.components(crypto, variant):
+            pool_dir: Path = KeyPool.pool_dir(component_crypto, component_variant)
+            os.makedirs(pool_dir, exist_ok=True)
+            missing: int = target - KeyPool.size(component_crypto, component_variant)
+            jobs += [(component_crypto, component_variant, pool_dir)] * max(missing, 0)
+
+        if len(jobs) == 0:
+            return 0
+
+        print(f"[KeyPool] Generating {len(jobs)} key pairs for {crypto} {variant} on {min(workers, len(jobs))} workers.")
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+            futures = [pool.submit(generate_entry, *job) for job in jobs]
+            generated: int = 0
+            for future in futures:
+                try:
+                    future.result()
+                    generated += 1
+                except Exception as ex:
+                    print(f"[KeyPool] Key pair could not be generated: {ex}")
+        return generated
+
+    @staticmethod
+    def take(crypto: str, variant: str) -> Optional[Tuple[bytes, bytes]]:
+        # Removes one key pair from the pool and returns (pub_key, priv_key), None if the pool is empty
+        for entry in KeyPool.entries(crypto, variant):
+            claimed: Path = Path(entry.parent, f".claimed-{os.getpid()}-{entry.name}")
+            try:
+                # Renaming is atomic, so each entry is taken by only one process
+                os.rename(entry, claimed)
+            except OSError:
+                continue
+
+            try:
+                with open(Path(claimed, f"{ENTRY_NAME}_pub_key.der"), "rb") as file:
+                    pub_key: bytes = file.read()
+                with open(Path(claimed, f"{ENTRY_NAME}_priv_key.der"), "rb") as file:
+                    priv_key: bytes = file.read()
+            except OSError as ex:
+                print(f"[KeyPool] Skipping broken entry {entry.name}: {ex}")
+                continue
+            finally:
+                shutil.rmtree(claimed, ignore_errors=True)
+
+            return pub_key, priv_key
+        return None
+
+    @staticmethod
+    def provision(name: str, crypto: str, variant: str, priv_storage: Path, pub_storage: Path) -> bool:
+        """
+        Saves key pairs for name to the storages like KeyGen does (e.g. device_priv_key.der).
+        Returns True if all key pairs came from the pool, keys of an empty pool are generated inline.
+        """
+        from_pool: bool = True
+        for suffix, component_crypto, component_variant in KeyPool.components(crypto, variant):
+            key_name: str = f"{name}{suffix}"
+            pair: Optional[Tuple[bytes, bytes]] = KeyPool.take(component_crypto, component_variant)
+
+            if pair is None:
+                print(f"[KeyPool] Pool {component_crypto} {component_variant} is empty, generating the key pair of {key_name}.")
+                from_pool = False
+                if component_crypto == "classic":
+                    KeyGen.gen_keypair_classic(key_name, priv_storage, pub_storage, component_variant)
+                else:
+                    KeyGen.gen_keypair_pqc(component_variant, key_name, priv_storage, pub_storage)
+                continue
+
+            pub_key, priv_key = pair
+            fh.save_to_format(priv_key, priv_storage, f"{key_name}_priv_key", "der")
+            fh.save_to_format(pub_key, priv_storage, f"{key_name}_pub_key", "der")
+            fh.save_to_format(pub_key, pub_storage, f"{key_name}_pub_key", "der")
+            print(f"[KeyPool] Saved the {component_variant} key pair of {key_name} from the pool.")
+
+        return from_pool
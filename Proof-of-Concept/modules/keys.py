@@ -7,29 +7,67 @@
 # ****************************************************************************
 
 from pathlib import Path
+from typing import Any, Callable, ClassVar, Dict, Tuple
+from threading import Lock
+import os
 
 ## Crypto imports ##
 from mbedtls.pk import ECC, RSA
 
+class KeyCache:
+    """
+    Process-wide cache of parsed mbedtls key objects and raw liboqs key bytes.
+
+    An entry is only used as long as the mtime, inode and size of the key file are unchanged,
+    so rotated key files are read and parsed again on their next use.
+    """
+    hits: ClassVar[int] = 0
+    misses: ClassVar[int] = 0
+    _entries: ClassVar[Dict[Tuple[str, str], Tuple[Tuple[int, int, int], Any]]] = {}
+    _lock: ClassVar[Lock] = Lock()
+
+    @staticmethod
+    def load(file_path: Path, kind: str, parse: Callable[[bytes], Any]) -> Any:
+        stat: os.stat_result = os.stat(file_path)
+        version: Tuple[int, int, int] = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        cache_key: Tuple[str, str] = (str(file_path), kind)
+
+        with KeyCache._lock:
+            entry = KeyCache._entries.get(cache_key)
+            if entry is not None and entry[0] == version:
+                KeyCache.hits += 1
+                return entry[1]
+
+            KeyCache.misses += 1
+            with open(file_path, "rb") as file:
+                b_key: bytes = file.read()
+            key: Any = parse(b_key)
+            KeyCache._entries[cache_key] = (version, key)
+            return key
+
+    @staticmethod
+    def stats() -> Dict[str, int]:
+        return {"hits": KeyCache.hits, "misses": KeyCache.misses, "entries": len(KeyCache._entries)}
+
+    @staticmethod
+    def clear() -> None:
+        KeyCache._entries.clear()
+        KeyCache.hits = 0
+        KeyCache.misses = 0
+
 class KeyUsage:
 
     @staticmethod
     def open_and_save_key_ECC(path: Path, name: str, format: str) -> ECC:
-        with open(Path(path, f"{name}.{format}"), "rb") as file:
-            b_key: bytes = file.read()
-        key: ECC = ECC.from_buffer(b_key)
+        key: ECC = KeyCache.load(Path(path, f"{name}.{format}"), "ECC", ECC.from_buffer)
         return key
 
     @staticmethod
     def open_and_save_key_RSA(path: Path, name: str, format: str) -> RSA:
-        with open(Path(path, f"{name}.{format}"), "rb") as file:
-            b_key: bytes = file.read()
-        key: RSA = RSA.from_buffer(b_key)
+        key: RSA = KeyCache.load(Path(path, f"{name}.{format}"), "RSA", RSA.from_buffer)
         return key
 
     @staticmethod
     def open_and_save_key_bytes(path: Path, name: str, format: str) -> bytes:
-        with open(Path(path, f"{name}.{format}"), "rb") as file:
-            b_key: bytes = file.read()
+        b_key: bytes = KeyCache.load(Path(path, f"{name}.{format}"), "bytes", bytes)
         return b_key
-        
\ No newline at end of file
@@ -0,0 +1,111 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+from collections import OrderedDict
+from hashlib import sha256
+from typing import ClassVar, List, Tuple
+
+from modules.messagetypes import MerkleProof
+
+class MerkleTree():
+    """
+    Merkle tree (SHA-256) over the payloads of a batch of tickets.
+    Only the root is signed; each ticket is sent with its MerkleProof.
+
+    Leaves and inner nodes are hashed with different prefixes. A node without a
+    sibling on its level is moved up unchanged, so it has no entry in the proof for that level.
+    """
+    LEAF: bytes = b"\x00"
+    NODE: bytes = b"\x01"
+    # Prefix of the signed root, so a root signature cannot be mistaken for the signature of a ticket
+    ROOT_PREFIX: bytes = b"WDMR"
+
+    def __init__(self, leaves: List[bytes]) -> None:
+        if len(leaves) == 0:
+            raise ValueError("A Merkle tree needs at least one leaf")
+
+        self.levels: List[List[bytes]] = [[MerkleTree.leaf_hash(leaf) for leaf in leaves]]
+        while len(self.levels[-1]) > 1:
+            level: List[bytes] = self.levels[-1]
+            parents: List[bytes] = []
+            for i in range(0, len(level) - 1, 2):
+                parents.append(MerkleTree.node_hash(level[i], level[i + 1]))
+            if len(level) % 2 == 1:
+                parents.append(level[-1])
+            self.levels.append(parents)
+
+    @property
+    def root(self) -> bytes:
+        return self.levels[-1][0]
+
+    @staticmethod
+    def leaf_hash(leaf: bytes) -> bytes:
+        return sha256(MerkleTree.LEAF + leaf).digest()
+
+    @staticmethod
+    def node_hash(left: bytes, right: bytes) -> bytes:
+        return sha256(MerkleTree.NODE + left + right).digest()
+
+    @staticmethod
+    def signed_root(root: bytes) -> bytes:
+        # Bytes that are signed and verified for a batch
+        return MerkleTree.ROOT_PREFIX + root
+
+    def proof(self, index: int) -> MerkleProof:
+        siblings: List[bytes] = []
+        sibling_left: List[bool] = []
+        position: int = index
+        for level in self.levels[:-1]:
+            sibling: int = position ^ 1
+            if sibling < len(level):
+                siblings.append(level[sibling])
+                sibling_left.append(sibling < position)
+            position //= 2
+        return MerkleProof(self.root, index, siblings, sibling_left)
+
+    @staticmethod
+    def root_from_proof(leaf: bytes, proof: MerkleProof) -> bytes:
+        node: bytes = MerkleTree.leaf_hash(leaf)
+        for sibling, left in zip(proof.siblings, proof.sibling_left):
+            if left:
+                node = MerkleTree.node_hash(sibling, node)
+            else:
+                node = MerkleTree.node_hash(node, sibling)
+        return node
+
+    @staticmethod
+    def verify_proof(leaf: bytes, proof: MerkleProof) -> bool:
+        if len(proof.siblings) != len(proof.sibling_left):
+            return False
+        return MerkleTree.root_from_proof(leaf, proof) == proof.root
+
+class RootSignatureCache():
+    """
+    Bounded cache of successfully verified root signatures, so tickets of the same batch
+    only need a Merkle proof check instead of another signature verification.
+    """
+    max_size: ClassVar[int] = 64
+    _verified: ClassVar["OrderedDict[Tuple[bytes, bytes, str], bool]"] = OrderedDict()
+
+    @staticmethod
+    def key(root: bytes, signature: bytes, pub_key_id: str) -> Tuple[bytes, bytes, str]:
+        return (root, sha256(signature).digest(), pub_key_id)
+
+    @staticmethod
+    def contains(root: bytes, signature: bytes, pub_key_id: str) -> bool:
+        cache_key: Tuple[bytes, bytes, str] = RootSignatureCache.key(root, signature, pub_key_id)
+        if cache_key in RootSignatureCache._verified:
+            RootSignatureCache._verified.move_to_end(cache_key)
+            return True
+        return False
+
+    @staticmethod
+    def add(root: bytes, signature: bytes, pub_key_id: str) -> None:
+        RootSignatureCache._verified[RootSignatureCache.key(root, signature, pub_key_id)] = True
+        while len(RootSignatureCache._verified) > RootSignatureCache.max_size:
+            RootSignatureCache._verified.popitem(last=False)
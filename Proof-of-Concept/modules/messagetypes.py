@@ -18,7 +18,33 @@ class MsgTypes(enum.Enum):
    Update = "update"
    BootTicket = "boot_ticket"
 
-class Request(object):
+class SlottedType(object):
+    """
+    Base class of the messagetypes: the attributes are stored in __slots__ (no per-instance __dict__).
+    fields lists the constructor arguments in order; the codec tables (modules/codec.py) are generated from it.
+
+    Objects pickled before the messagetypes had __slots__ (e.g. in the staging area) can still be unpickled:
+    their attributes are set from the old __dict__, unknown ones are dropped and missing ones are None.
+    """
+    __slots__ = ()
+    fields: tuple = ()
+
+    def __reduce__(self) -> tuple:
+        # Pickled as constructor call, which is smaller and faster than a state dict
+        return (type(self), tuple([getattr(self, field, None) for field in self.fields]))
+
+    def __setstate__(self, state) -> None:
+        if isinstance(state, tuple):
+            # (__dict__, slots) as created by the default pickling of slotted objects
+            merged: dict = {}
+            for part in state:
+                if part:
+                    merged.update(part)
+            state = merged
+        for field in self.fields:
+            setattr(self, field, state.get(field))
+
+class Request(SlottedType):
     """
     A class to save requests for different messagetypes.
 
@@ -30,12 +56,14 @@ class Request(object):
         A random generated nonce 
     """
     name: str = "request"
+    fields: tuple = ("requesttype", "timestamp", "nonce")
+    __slots__ = fields
     def __init__(self, requesttype: str, timestamp: int, nonce: str) -> None:
         self.requesttype = requesttype
         self.timestamp = timestamp
         self.nonce = nonce
 
-class Addresses(object):
+class Addresses(SlottedType):
     """
     A class to save addresses of actor systems.
 
@@ -46,18 +74,14 @@ class Addresses(object):
     device_addr:
         Address of the device (client)
     """
-    
-    @property
-    def name(self) -> str:
-        return self.__name
-
+    name: str = "addresses"
+    fields: tuple = ("server_addr", "device_addr")
+    __slots__ = fields
     def __init__(self, server_addr: ActorAddress, device_addr: ActorAddress) -> None:
-        self.__name: str = "addresses"
-
         self.server_addr = server_addr
         self.device_addr = device_addr        
 
-class DefTicket(object):
+class DefTicket(SlottedType):
     """
     A class to specify the time the watchdog timer has to add to the current counter to defer the reset and set up the countdown.
 
@@ -71,12 +95,14 @@ class DefTicket(object):
         Time stamp (epoch time) of the creation of the DefTicket object
     """
     name: str = "defticket"
+    fields: tuple = ("nonce", "deferral_time", "timestamp")
+    __slots__ = fields
     def __init__(self, nonce: str, deferral_time: int, timestamp: int) -> None:
         self.nonce = nonce
         self.deferral_time = deferral_time
         self.timestamp= timestamp
 
-class MeasuredData(object):
+class MeasuredData(SlottedType):
     """
     A class to send the data that has been measured by the sensor of the device to send to the server for storage.
 
@@ -88,11 +114,13 @@ class MeasuredData(object):
         Time stamp (epoch time) of the creation of the MeasuredData object
     """
     name: str = "measured_data"
+    fields: tuple = ("measured_data", "timestamp")
+    __slots__ = fields
     def __init__(self, measured_data: int, timestamp: int) -> None:
         self.measured_data = measured_data
         self.timestamp = timestamp
 
-class Update(object):
+class Update(SlottedType):
     """
     A class to send a new update from the server to the device.
 
@@ -108,13 +136,87 @@ class Update(object):
         Time stamp (epoch time) of the creation of the MeasuredData object
     """
     name: str = "update"
+    fields: tuple = ("update_type", "update", "version_nr", "timestamp")
+    __slots__ = fields
     def __init__(self, update_type: str, update: str, version_nr: int, timestamp: int) -> None:
         self.update_type = update_type
         self.update = update
         self.version_nr = version_nr
         self.timestamp = timestamp
 
-class BootTicket(object):
+class UpdateManifest(SlottedType):
+    """
+    A class to send the signed description of an update that is transferred in chunks.
+
+    Attributes:
+    -----------
+    update_type: str
+        What type of update has been sent, different origin senders possible.
+    version_nr: int
+        Each update type has an ascending number attached to it.
+    timestamp:
+        Time stamp (epoch time) of the creation of the Update object
+    length: int
+        Length of the update image in bytes
+    text: bool
+        True if the update body is a str (utf-8 encoded image), False for bytes
+    chunk_size: int
+        Size of each chunk in bytes (the last chunk can be shorter)
+    chunk_hashes: list
+        SHA-256 digest of each chunk; a list of bytes
+    """
+    name: str = "update_manifest"
+    fields: tuple = ("update_type", "version_nr", "timestamp", "length", "text", "chunk_size", "chunk_hashes")
+    __slots__ = fields
+    def __init__(self, update_type: str, version_nr: int, timestamp: int, length: int, text: bool, chunk_size: int, chunk_hashes: List[bytes]) -> None:
+        self.update_type = update_type
+        self.version_nr = version_nr
+        self.timestamp = timestamp
+        self.length = length
+        self.text = text
+        self.chunk_size = chunk_size
+        self.chunk_hashes = chunk_hashes
+
+class UpdateChunkRequest(SlottedType):
+    """
+    A class to request one chunk of an update from the server (not signed, chunks are checked against the manifest).
+
+    Attributes:
+    -----------
+    version_nr: int
+        Version of the update the chunk belongs to
+    index: int
+        Number of the chunk
+    """
+    name: str = "update_chunk_request"
+    fields: tuple = ("version_nr", "index")
+    __slots__ = fields
+    def __init__(self, version_nr: int, index: int) -> None:
+        self.version_nr = version_nr
+        self.index = index
+
+class UpdateChunk(SlottedType):
+    """
+    A class to send one chunk of an update to the device.
+
+    Attributes:
+    -----------
+    version_nr: int
+        Version of the update the chunk belongs to
+    index: int
+        Number of the chunk
+    data: bytes
+        Content of the chunk
+    """
+    name: str = "update_chunk"
+    fields: tuple = ("version_nr", "index", "data")
+    __slots__ = fields
+    def __init__(self, version_nr: int, index: int, data: bytes) -> None:
+        self.version_nr = version_nr
+        self.index = index
+        self.data = data
+
+class BootTicket(SlottedType):
     """
     A class to send a new boot ticket from the server to the device.
 
@@ -128,13 +230,39 @@ class BootTicket(object):
         Time stamp (epoch time) of the creation of the MeasuredData object
     """
     name: str = "bootticket"
+    fields: tuple = ("bootticket", "nonce", "timestamp", "counter_init_time")
+    __slots__ = fields
     def __init__(self, bootticket: str, nonce: str, timestamp: int, counter_init_time: int) -> None:
         self.bootticket = bootticket
         self.nonce = nonce
         self.timestamp = timestamp
         self.counter_init_time = counter_init_time
 
-class Message(object):
+class MerkleProof(SlottedType):
+    """
+    A class to send the inclusion proof of a ticket that has been signed as part of a batch (Merkle tree).
+
+    Attributes:
+    -----------
+    root: bytes
+        Root of the Merkle tree, the signature of the message is the signature of this root
+    index: int
+        Position of the ticket in the batch
+    siblings: list
+        Hashes of the sibling nodes from the leaf up to the root; a list of bytes
+    sibling_left: list
+        For each sibling whether it is the left node; a list of bool
+    """
+    name: str = "merkle_proof"
+    fields: tuple = ("root", "index", "siblings", "sibling_left")
+    __slots__ = fields
+    def __init__(self, root: bytes, index: int, siblings: List[bytes], sibling_left: List[bool]) -> None:
+        self.root = root
+        self.index = index
+        self.siblings = siblings
+        self.sibling_left = sibling_left
+
+class Message(SlottedType):
     """
     A class to save messages with different content to send between server and device.
     This class will be packed to json before being send between server and device and unpacked to object afterwards.
@@ -147,18 +275,23 @@ class Message(object):
         A list of the order a scenario needs to follow; a list of strings
     state: int
         Indicates at which position in the sequence_list one is currently located 
-    signature:
-        Signature of the data stored in mdata
+    signature: bytes
+        Signature of the data stored in mdata (raw bytes, hex encoded only at JSON boundaries)
     mdata: 
         Can be any class obejct from the messagetypes.py file:
         - DefTicket
         - MeasuredData
         - Update
+        - UpdateManifest, UpdateChunkRequest, UpdateChunk
         - BootTicket
         - Request
+    proof: MerkleProof
+        Inclusion proof if mdata has been signed as part of a batch, otherwise None
     """
     name: str = "message"
-    def __init__(self, addresses: Addresses, sequence_list: List[str], state: int, signature: str, crypto: str, variant: str, scenario: Optional[int], hash_algo: str, mdata: Union[DefTicket, MeasuredData, Update, BootTicket, Request, None]) -> None:
+    fields: tuple = ("addresses", "sequence_list", "state", "signature", "crypto", "variant", "scenario", "hash_algo", "mdata", "proof")
+    __slots__ = fields
+    def __init__(self, addresses: Addresses, sequence_list: List[str], state: int, signature: bytes, crypto: str, variant: str, scenario: Optional[int], hash_algo: str, mdata: Union[DefTicket, MeasuredData, Update, BootTicket, Request, None], proof: Optional[MerkleProof] = None) -> None:
         self.addresses = addresses
         self.sequence_list = sequence_list
         self.state = state             
@@ -167,4 +300,10 @@ class Message(object):
         self.variant = variant
         self.scenario = scenario
         self.hash_algo = hash_algo
-        self.mdata = mdata    
\ No newline at end of file
+        self.mdata = mdata
+        self.proof = proof
+
+    @property
+    def mdata_type(self) -> type:
+        # Type of mdata, used for routing (a LazyMessage answers it without decoding mdata)
+        return type(self.mdata)
\ No newline at end of file
@@ -0,0 +1,197 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+from pathlib import Path
+from statistics import median
+from typing import Dict, List, Optional, Tuple
+import csv
+import json
+import os
+
+from settings import UNIT, HYBRID_SEPARATOR, REGISTRY_FUNCTIONS_PATHS, REGISTRY_DETAILS_PATHS, AUTO_MIN_NIST_LEVEL, AUTO_MAX_SIGNATURE_SIZE, AUTO_LATENCY_BUDGET
+
+# Sizes in bytes of the classic variants (max. DER encoded ECDSA signature); classic algorithms are not quantum-safe (level 0)
+CLASSIC_DETAILS: Dict[str, Dict[str, int]] = {
+    "secp256r1": {"claimed_nist_level": 0, "length_signature": 72, "length_public_key": 91},
+    "rsa2048": {"claimed_nist_level": 0, "length_signature": 256, "length_public_key": 294},
+    "rsa4096": {"claimed_nist_level": 0, "length_signature": 512, "length_public_key": 550}
+}
+
+class AlgorithmProfile(object):
+    """
+    A class to save what is known about a signature algorithm (variant).
+
+    Attributes:
+    -----------
+    variant: str
+        Name of the variant as used with --variant
+    crypto: str
+        Backend of the variant: "classic", "pqc" or "hybrid"
+    nist_level: int
+        Claimed NIST security level (0 for classic algorithms)
+    signature_size: int
+        Maximum length of a signature in bytes
+    public_key_size: int
+        Length of the public key in bytes
+    keygen: float
+        Median cycles of the key generation (None if not measured)
+    sign: float
+        Median cycles of signing (None if not measured)
+    verify: float
+        Median cycles of verifying (None if not measured)
+    """
+    def __init__(self, variant: str, crypto: str, nist_level: int, signature_size: int, public_key_size: int,
+                 keygen: Optional[float] = None, sign: Optional[float] = None, verify: Optional[float] = None) -> None:
+        self.variant = variant
+        self.crypto = crypto
+        self.nist_level = nist_level
+        self.signature_size = signature_size
+        self.public_key_size = public_key_size
+        self.keygen = keygen
+        self.sign = sign
+        self.verify = verify
+
+    @property
+    def measured(self) -> bool:
+        return (self.sign is not None) and (self.verify is not None)
+
+    @property
+    def cost(self) -> float:
+        # Cycles per signed and verified message
+        return self.sign + self.verify
+
+class AlgorithmRegistry():
+    """
+    Registry of the signature algorithms: sizes and NIST levels from the saved signer_details_*.json
+    (CLASSIC_DETAILS for mbedtls) and the median cycles from the function benchmark CSVs.
+    """
+    def __init__(self, hash_algo: str = "sha256") -> None:
+        self.hash_algo = hash_algo
+        self.profiles: Dict[str, AlgorithmProfile] = {}
+
+    @staticmethod
+    def crypto_of(variant: str) -> str:
+        # Backend of a variant
+        if HYBRID_SEPARATOR in variant:
+            return "hybrid"
+        elif (variant in CLASSIC_DETAILS) or ("rsa" in variant):
+            return "classic"
+        return "pqc"
+
+    @staticmethod
+    def load(hash_algo: str = "sha256", functions_paths: List[Path] = REGISTRY_FUNCTIONS_PATHS, details_paths: List[Path] = REGISTRY_DETAILS_PATHS) -> "AlgorithmRegistry":
+        registry: AlgorithmRegistry = AlgorithmRegistry(hash_algo)
+        details: Dict[str, Dict[str, int]] = dict(CLASSIC_DETAILS)
+        for path in details_paths:
+            details.update(AlgorithmRegistry.read_signer_details(path))
+
+        for path in functions_paths:
+            for variant, crypto, cycles in AlgorithmRegistry.read_function_measurements(path, hash_algo):
+                profile: Optional[AlgorithmProfile] = AlgorithmRegistry.profile_from_details(variant, crypto, details)
+                if profile is None:
+                    print(f"[Registry] No signer details for {variant}, skipping its measurements.")
+                    continue
+                profile.keygen, profile.sign, profile.verify = cycles
+                registry.profiles[variant] = profile
+
+        # Variants with known details but without measurements (cannot be selected automatically)
+        for variant in details:
+            if variant not in registry.profiles:
+                registry.profiles[variant] = AlgorithmRegistry.profile_from_details(variant, AlgorithmRegistry.crypto_of(variant), details)
+
+        return registry
+
+    @staticmethod
+    def read_signer_details(path: Path) -> Dict[str, Dict[str, int]]:
+        # signer_details_<sigalg>.json as saved by KeyGen.gen_keypair_pqc
+        details: Dict[str, Dict[str, int]] = {}
+        if not os.path.exists(path):
+            return details
+
+        for filename in os.listdir(path):
+            if filename.startswith("signer_details_") and filename.endswith(".json"):
+                try:
+                    with open(Path(path, filename), "r") as file:
+                        signer_details = json.load(file)
+                    details[filename[len("signer_details_"):-len(".json")]] = signer_details
+                except Exception as ex:
+                    print(f"[Registry] Could not read {filename}: {ex}")
+        return details
+
+    @staticmethod
+    def read_function_measurements(path: Path, hash_algo: str) -> List[Tuple[str, str, Tuple[float, float, float]]]:
+        # Median keygen, sign and verify cycles of each benchmark CSV for hash_algo (prehash measurements are not used)
+        measurements: List[Tuple[str, str, Tuple[float, float, float]]] = []
+        if not os.path.exists(path):
+            return measurements
+
+        prefixes: List[Tuple[str, str]] = [(f"{UNIT}_liboqs_", "pqc"), (f"{UNIT}_hybrid_", "hybrid"), (f"{UNIT}_", "classic")]
+        suffix: str = f"_{hash_algo}.csv"
+        for filename in sorted(os.listdir(path)):
+            if not filename.endswith(suffix):
+                continue
+            for prefix, crypto in prefixes:
+                if filename.startswith(prefix):
+                    variant: str = filename[len(prefix):-len(suffix)]
+                    break
+            else:
+                continue
+
+            try:
+                with open(Path(path, filename), "r", encoding="UTF8") as file:
+                    rows = list(csv.DictReader(file))
+                if len(rows) == 0:
+                    continue
+                cycles: Tuple[float, float, float] = tuple(
+                    median(float(row[f"{column} ({UNIT})"]) for row in rows) for column in ("gen_keypair", "sign", "verify"))
+                measurements.append((variant, crypto, cycles))
+            except Exception as ex:
+                print(f"[Registry] Could not read {filename}: {ex}")
+        return measurements
+
+    @staticmethod
+    def profile_from_details(variant: str, crypto: str, details: Dict[str, Dict[str, int]]) -> Optional[AlgorithmProfile]:
+        if crypto == "hybrid":
+            classic, pqc = variant.split(HYBRID_SEPARATOR, 1)
+            if (classic not in details) or (pqc not in details):
+                return None
+            # Both signatures and a 4 byte length prefix; the level is the one of the pqc component
+            return AlgorithmProfile(variant, crypto, details[pqc]["claimed_nist_level"],
+                                    4 + details[classic]["length_signature"] + details[pqc]["length_signature"],
+                                    details[classic]["length_public_key"] + details[pqc]["length_public_key"])
+
+        if variant not in details:
+            return None
+        return AlgorithmProfile(variant, crypto, details[variant]["claimed_nist_level"], details[variant]["length_signature"], details[variant]["length_public_key"])
+
+    def candidates(self, min_level: int = AUTO_MIN_NIST_LEVEL, max_signature_size: Optional[int] = AUTO_MAX_SIGNATURE_SIZE, latency_budget: Optional[float] = AUTO_LATENCY_BUDGET) -> List[AlgorithmProfile]:
+        # Measured algorithms that meet the constraints, cheapest first
+        selected: List[AlgorithmProfile] = []
+        for profile in self.profiles.values():
+            if not profile.measured or profile.nist_level < min_level:
+                continue
+            if (max_signature_size is not None) and (profile.signature_size > max_signature_size):
+                continue
+            if (latency_budget is not None) and (profile.cost > latency_budget):
+                continue
+            selected.append(profile)
+        return sorted(selected, key=lambda profile: (profile.cost, profile.signature_size))
+
+    def select(self, min_level: int = AUTO_MIN_NIST_LEVEL, max_signature_size: Optional[int] = AUTO_MAX_SIGNATURE_SIZE, latency_budget: Optional[float] = AUTO_LATENCY_BUDGET) -> AlgorithmProfile:
+        candidates: List[AlgorithmProfile] = self.candidates(min_level, max_signature_size, latency_budget)
+        if len(candidates) == 0:
+            raise ValueError(f"No measured algorithm meets NIST level >= {min_level}, signature size <= {max_signature_size} and latency <= {latency_budget} {UNIT}")
+        return candidates[0]
+
+    @staticmethod
+    def auto(hash_algo: str = "sha256", min_level: int = AUTO_MIN_NIST_LEVEL, max_signature_size: Optional[int] = AUTO_MAX_SIGNATURE_SIZE, latency_budget: Optional[float] = AUTO_LATENCY_BUDGET) -> Tuple[str, str]:
+        # Returns crypto and variant of the cheapest algorithm for --variant=auto
+        profile: AlgorithmProfile = AlgorithmRegistry.load(hash_algo).select(min_level, max_signature_size, latency_budget)
+        print(f"[Registry] Selected {profile.variant} ({profile.crypto}, NIST level {profile.nist_level}, "
+              f"signature {profile.signature_size} bytes, sign + verify {profile.cost} {UNIT})")
+        return profile.crypto, profile.variant
@@ -6,8 +6,9 @@
 # Author:        Tanja Gutsche               
 # ****************************************************************************
 
-from settings import D_STORAGE, S_STORAGE, STAGING_AREA, S_DATA_STORAGE
+from settings import D_STORAGE, S_STORAGE, STAGING_AREA, S_DATA_STORAGE, VERIFY_CACHE_FILE, UPDATE_BLOB_SUFFIX, UPDATE_PART_SUFFIX, UPDATE_PROGRESS_SUFFIX, UPDATE_ARTIFACTS, INSTALLED_IMAGES
 import os
+import shutil
 from pathlib import Path
 
 class RemoveFiles():
@@ -35,6 +36,14 @@ class RemoveFiles():
         except:
             print("File does not exist, so it cannot be removed.")
 
+    @staticmethod
+    def remove_object(storage: Path, filename: str):
+        # Removes a saved message and the blob of its update (and a partial download) if there is one
+        RemoveFiles.remove_file(storage, filename)
+        for suffix in (UPDATE_BLOB_SUFFIX, UPDATE_PART_SUFFIX, UPDATE_PROGRESS_SUFFIX):
+            if os.path.exists(Path(storage, f"{filename}{suffix}")):
+                RemoveFiles.remove_file(storage, f"{filename}{suffix}")
+
     @staticmethod
     def remove_all_files():
         try:
@@ -45,7 +54,8 @@ class RemoveFiles():
             RemoveFiles.remove_file(STAGING_AREA, "bootticket")
 
             # Remove update
-            RemoveFiles.remove_file(STAGING_AREA, "update")
+            RemoveFiles.remove_object(STAGING_AREA, "update")
+            RemoveFiles.remove_object(STAGING_AREA, "update_manifest")
 
             # Remove measured_data.txt
             RemoveFiles.remove_file(S_DATA_STORAGE, "measured_data.txt")
@@ -54,10 +64,18 @@ class RemoveFiles():
             RemoveFiles.remove_file(S_STORAGE, "bootticket")
 
             # Remove update from server
-            RemoveFiles.remove_file(S_STORAGE, "update")
+            RemoveFiles.remove_object(S_STORAGE, "update")
 
             # Remove compromised.device from server
             RemoveFiles.remove_file(S_DATA_STORAGE, "compromised.device")
+
+            # Remove the verification cache of the device
+            RemoveFiles.remove_file(D_STORAGE, VERIFY_CACHE_FILE)
+
+            # Remove the installed images and version of the device and the delta bases of the server
+            RemoveFiles.remove_file(D_STORAGE, "version.txt")
+            shutil.rmtree(INSTALLED_IMAGES, ignore_errors=True)
+            shutil.rmtree(UPDATE_ARTIFACTS, ignore_errors=True)
             
             print("Removed all files.")
         except:
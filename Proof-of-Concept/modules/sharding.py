@@ -0,0 +1,61 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+from typing import Dict, Iterable, List, Set
+import bisect
+import hashlib
+
+from settings import SHARD_VIRTUAL_NODES
+
+class ConsistentHashRing():
+    """
+    Assignment of the devices to the shards of the server by consistent hashing of the device name.
+    Every shard has virtual_nodes positions on a ring of 64 bit hashes (sha256), a device belongs to the shard
+    of the next position after the hash of its name. Adding or removing a shard only moves the devices between
+    the positions of that shard and their predecessors, about 1/N of all devices, the other devices keep their shard.
+    """
+    def __init__(self, shards: Iterable[str] = (), virtual_nodes: int = SHARD_VIRTUAL_NODES) -> None:
+        self.virtual_nodes: int = virtual_nodes
+        self.positions: List[int] = []
+        self.owners: Dict[int, str] = {}
+        self.shards: Set[str] = set()
+        for shard in shards:
+            self.add(shard)
+
+    @staticmethod
+    def position(key: str) -> int:
+        return int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "big")
+
+    def copy(self) -> "ConsistentHashRing":
+        return ConsistentHashRing(self.shards, self.virtual_nodes)
+
+    def add(self, shard: str) -> None:
+        if shard in self.shards:
+            raise ValueError(f"Shard {shard} is already on the ring")
+        self.shards.add(shard)
+        for i in range(self.virtual_nodes):
+            position: int = ConsistentHashRing.position(f"{shard}#{i}")
+            bisect.insort(self.positions, position)
+            self.owners[position] = shard
+
+    def remove(self, shard: str) -> None:
+        if shard not in self.shards:
+            raise ValueError(f"Shard {shard} is not on the ring")
+        self.shards.remove(shard)
+        self.positions = [position for position in self.positions if self.owners[position] != shard]
+        self.owners = {position: self.owners[position] for position in self.positions}
+
+    def lookup(self, device: str) -> str:
+        if not self.positions:
+            raise ValueError("No shard on the ring")
+        index: int = bisect.bisect(self.positions, ConsistentHashRing.position(device)) % len(self.positions)
+        return self.owners[self.positions[index]]
+
+    def moved(self, other: "ConsistentHashRing", devices: Iterable[str]) -> Dict[str, str]:
+        # Devices whose shard differs on the other ring, with their new shard
+        return {device: other.lookup(device) for device in devices if self.lookup(device) != other.lookup(device)}
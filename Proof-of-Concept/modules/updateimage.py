@@ -0,0 +1,102 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+from hashlib import sha256
+from pathlib import Path
+from typing import Iterator, Union
+import mmap
+import os
+
+from settings import UPDATE_BLOB_SUFFIX, UPDATE_IMAGE_CHUNK_SIZE
+from modules.messagetypes import SlottedType
+
+class UpdateImage(SlottedType):
+    """
+    Body of a staged Update that is kept in a separate blob file (<name of the pickled message>.blob) instead of memory.
+    Only this reference is pickled with the Update; the image is read through mmap/memoryview chunk by chunk,
+    so hashing, verifying (in prehash mode) and installing the update do not load the whole image.
+
+    Attributes:
+    -----------
+    path: str
+        Path of the blob file (set again when the staged message is unpickled)
+    length: int
+        Length of the image in bytes
+    text: bool
+        True if the update body was a str (utf-8 encoded in the blob), False for bytes.
+        Needed to encode the body exactly like the in-memory Update that has been signed.
+    """
+    name: str = "update_image"
+    fields: tuple = ("path", "length", "text")
+    __slots__ = fields
+    def __init__(self, path: str, length: int, text: bool) -> None:
+        self.path = path
+        self.length = length
+        self.text = text
+
+    @staticmethod
+    def blob_path(path: Path, filename: str) -> Path:
+        return Path(path, f"{filename}{UPDATE_BLOB_SUFFIX}")
+
+    @staticmethod
+    def write(body: Union[str, bytes, bytearray, memoryview, "UpdateImage"], blob: Path) -> "UpdateImage":
+        # Writes the update body to the blob file (atomically) and returns the reference to it
+        if isinstance(body, UpdateImage):
+            if os.path.abspath(body.path) != os.path.abspath(blob):
+                tmp_file: Path = Path(f"{blob}.{os.getpid()}")
+                with open(tmp_file, "wb") as file:
+                    for chunk in body.chunks():
+                        file.write(chunk)
+                os.replace(tmp_file, blob)
+            return UpdateImage(str(blob), body.length, body.text)
+
+        text: bool = isinstance(body, str)
+        view: memoryview = memoryview(body.encode("utf-8") if text else body)
+        tmp_file: Path = Path(f"{blob}.{os.getpid()}")
+        with open(tmp_file, "wb") as file:
+            for offset in range(0, len(view), UPDATE_IMAGE_CHUNK_SIZE):
+                file.write(view[offset:offset + UPDATE_IMAGE_CHUNK_SIZE])
+        os.replace(tmp_file, blob)
+        return UpdateImage(str(blob), len(view), text)
+
+    def chunks(self, chunk_size: int = UPDATE_IMAGE_CHUNK_SIZE) -> Iterator[memoryview]:
+        """
+        Yields the image as memoryviews of the mapped blob file (zero-copy).
+        A chunk is only valid until the next one is requested, it is released afterwards.
+        """
+        if self.length == 0:
+            return
+        with open(self.path, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if len(mapped) != self.length:
+                    raise ValueError(f"Update image {self.path} has {len(mapped)} instead of {self.length} bytes")
+                with memoryview(mapped) as view:
+                    for offset in range(0, self.length, chunk_size):
+                        with view[offset:offset + chunk_size] as chunk:
+                            yield chunk
+
+    def read(self) -> bytes:
+        # The whole image in memory (only needed if a signature algorithm needs the complete payload)
+        with open(self.path, "rb") as file:
+            data: bytes = file.read()
+        if len(data) != self.length:
+            raise ValueError(f"Update image {self.path} has {len(data)} instead of {self.length} bytes")
+        return data
+
+    def digest(self) -> str:
+        # SHA-256 of the image, hashed chunk by chunk
+        hasher = sha256()
+        for chunk in self.chunks():
+            hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -6,20 +6,47 @@
 # Author:        Tanja Gutsche               
 # ****************************************************************************
 
-from typing import Any, ClassVar, Dict, Tuple, Union
+from typing import Any, ClassVar, Dict, List, Optional, Tuple, Union
+from json import dumps, loads
 from modules.messagetypes import *
+from modules.codec import PACKERS, UNPACKERS
+from modules.wire import WireCodec
 from thespian.actors import Actor, ActorExitRequest
-from settings import SERVER, DEVICE
+import settings
+from settings import SERVER, DEVICE, ACTOR_POOL_SIZE
 
 class Utils:
 
     start_counter: ClassVar[float] = 0
 
+    # Pooled actor mode: next instance of each role and the addresses of the pooled actors known to this actor
+    pool_next: ClassVar[Dict[str, int]] = {}
+    pool_addresses: ClassVar[Dict[str, ActorAddress]] = {}
+
+    @staticmethod
+    def pooled_actor(sender: Actor, target: type, global_name = False) -> ActorAddress:
+        """
+        Returns an actor of the role target for the pooled actor mode (--actor-pool).
+        The instances are created once under global names (the role name for global actors, otherwise
+        <role>_<i> for ACTOR_POOL_SIZE instances used round-robin) and their addresses are reused,
+        so a protocol step costs a plain send.
+        """
+        name: str = target.__name__
+        if not global_name:
+            index: int = Utils.pool_next.get(name, 0)
+            Utils.pool_next[name] = (index + 1) % ACTOR_POOL_SIZE
+            name = f"{name}_{index}"
+        if name not in Utils.pool_addresses:
+            Utils.pool_addresses[name] = sender.createActor(target, globalName=name)
+        return Utils.pool_addresses[name]
+
     @staticmethod
     def create_and_send(sender: Actor, host: str, target: type, message: Message, global_name = False):
         name: str = target.__name__
         try:
-            if global_name:
+            if settings.actor_pool:
+                target_addr: ActorAddress = Utils.pooled_actor(sender, target, global_name)
+            elif global_name:
                 target_addr: ActorAddress = sender.createActor(target, globalName=name)
             else:
                 target_addr: ActorAddress = sender.createActor(target)
@@ -53,13 +80,13 @@ class Utils:
             return
 
     @staticmethod
-    def create_and_send_tuple(sender: Actor, send_from: str, message: Message, updated_message: Message, former_sender_addr: ActorAddress):
+    def create_and_send_tuple(sender: Actor, send_from: str, message: Message, updated_message: Message, former_sender_addr: ActorAddress, exit_former: bool = True):
         # Save the ActorAddresses in a dictionary variable to send them with the json to the server via the network.
         addresses: Addresses = message.addresses
-        # To send it via network to the device: obj -> json
-        msg_json: Dict[str, Any] = Utils.pack_json(updated_message)
+        # To send it via network to the device: obj -> json (or the binary wire format)
+        msg_packed: Union[Dict[str, Any], bytes] = Utils.pack_message(updated_message)
         # Send the signed message to the server.
-        send_tuple: Tuple[Dict, Addresses] = (msg_json, addresses)
+        send_tuple: Tuple[Union[Dict, bytes], Addresses] = (msg_packed, addresses)
         if send_from is SERVER:
             # Send the tuple with Message and Addresses to the device
             print(f"[{send_from}] Send message to device.")
@@ -68,18 +95,30 @@ class Utils:
             # Send the tuple with Message and Addresses to the server
             print(f"[{send_from}] Send message to server.")
             sender.send(addresses.server_addr, send_tuple)
-        # End the Signer actor, because it is no longer needed.
-        sender.send(former_sender_addr, ActorExitRequest())
+        # End the Signer actor, because it is no longer needed (pooled actors are reused).
+        if exit_former and not settings.actor_pool:
+            sender.send(former_sender_addr, ActorExitRequest())
 
     @staticmethod
-    def open_tuple(host: str, message: Tuple[Dict[str, Any], Addresses]) -> Message:
+    def pack_message(msg_obj: Message) -> Union[Dict[str, Any], bytes]:
+        # Format of the message in the network tuple, selected with app.py --wire
+        if settings.wire == "binary":
+            return WireCodec.encode(msg_obj)
+        return Utils.pack_json(msg_obj)
+
+    @staticmethod
+    def open_tuple(host: str, message: Tuple[Union[Dict[str, Any], bytes], Addresses]) -> Message:
         try:
             # Should receive an initial message from server with a message and the addresses as Addresses-class
             (message_dict, addresses) = message 
 
-            # Unpack the message_dict (json) to work with the python message object internally.
-            # If you want to send it via the network, you need to transform it to the json format with pack_json. 
-            msg_obj = Utils.unpack_json(message_dict, addresses)
+            # Unpack the message_dict (json or binary wire format) to work with the python message object internally.
+            # If you want to send it via the network, you need to transform it with pack_message. 
+            if isinstance(message_dict, (bytes, bytearray)):
+                # Only the routing header is decoded here, signature and mdata when they are accessed
+                msg_obj = WireCodec.decode_lazy(message_dict, addresses)
+            else:
+                msg_obj = Utils.unpack_json(message_dict, addresses)
             if not isinstance(msg_obj, Message):
                 raise TypeError(f"{host} has not received a message")
 
@@ -92,107 +131,51 @@ class Utils:
             raise ValueError("[DEVICE] No Addresses in message")
 
     @staticmethod
-    def unpack_json(msg: Dict[str, Any], addresses: Addresses):
+    def signature_to_bytes(signature: Union[bytes, str]) -> bytes:
+        # Accepts raw signatures and hex encoded ones (JSON or messages staged by older versions)
+        if isinstance(signature, str):
+            return bytes(bytearray.fromhex(signature))
+        return bytes(signature)
 
-        msg_type = msg["messagetype"]
-        
-        if msg_type == "message":
-            sequence_list: List[str] = msg["sequence_list"]
-            state: int = msg["state"]
-            signature = msg["signature"] 
-            crypto: str = msg["crypto"]
-            variant: str = msg["variant"]
-            scenario: int = msg["scenario"]
-            hash_algo: str = msg["hash_algo"]
-            mdata: Union[DefTicket, MeasuredData, Update, BootTicket, Request] = msg["data"]["mdata"] 
-            return Message(addresses, sequence_list, state, signature, crypto, variant, scenario, hash_algo, mdata)
-
-        elif msg_type == "request":
-            requesttype: str = msg["data"]["requesttype"]
-            timestamp: int = msg["data"]["timestamp"]
-            nonce: str = msg["data"]["nonce"]
-            return Request(requesttype, timestamp, nonce)
-
-        elif msg_type == "update":
-            update_type: str = msg["updatetype"] 
-            update: str = msg["data"]["update"]
-            version_nr: int = msg["versionnr"]
-            timestamp: int = msg["data"]["timestamp"]
-            return Update(update_type, update, version_nr, timestamp)
-
-        elif msg_type == "addresses":
-            server_addr: ActorAddress = msg["data"]["server_addr"] 
-            device_addr: ActorAddress = msg["data"]["device_addr"] 
-            return Addresses(server_addr, device_addr)
-
-        elif msg_type == "defticket":
-            nonce: str = msg["data"]["nonce"]
-            deferral_time: int = msg["data"]["deferral_time"]
-            timestamp: int = msg["data"]["timestamp"]
-            return DefTicket(nonce, deferral_time, timestamp)
-
-        elif msg_type == "bootticket":
-            bootticket: str = msg["data"]["bootticket"]
-            nonce: str = msg["data"]["nonce"]
-            timestamp: int = msg["data"]["timestamp"]
-            counter_init_time: int = msg["data"]["counter_init_time"]
-            return BootTicket(bootticket, nonce, timestamp, counter_init_time)
-
-        elif msg_type == "measured_data":
-            measured_data: int = msg["data"]["measured_data"]
-            timestamp: int = msg["data"]["timestamp"]
-            return MeasuredData(measured_data, timestamp)
+    @staticmethod
+    def to_json(msg_obj: Message) -> str:
+        """
+        Serializes a Message to a JSON string, e.g. for communication without the Thespian framework.
+        This is the only place the signature is hex encoded.
+        """
+        msg: Dict[str, Any] = Utils.pack_json(msg_obj)
+        msg["signature"] = Utils.signature_to_bytes(msg_obj.signature).hex()
+        msg["data"]["mdata"] = Utils.pack_json(msg_obj.mdata) if msg_obj.mdata is not None else None
+        if msg["proof"] is not None:
+            proof: Dict[str, Any] = Utils.pack_json(msg_obj.proof)
+            proof["data"]["root"] = msg_obj.proof.root.hex()
+            proof["data"]["siblings"] = [sibling.hex() for sibling in msg_obj.proof.siblings]
+            msg["proof"] = proof
+        return dumps(msg)
 
     @staticmethod
-    def pack_json(msg_obj: Union[Message, Request, Update, Addresses, DefTicket, BootTicket, MeasuredData, None]): 
-        msg: Dict[str, Any] = {}
-        if msg_obj is not None:
-            msg["messagetype"] = msg_obj.name
-        else:
-            msg["messagetype"] = "message"
-            
-        msg["data"] = {}
-        if isinstance(msg_obj, Message):
-            msg["addresses"] = {}
-            msg["addresses"]["server_addr"] = str(msg_obj.addresses.server_addr)
-            msg["addresses"]["device_addr"] = str(msg_obj.addresses.device_addr)
-            msg["sequence_list"] = msg_obj.sequence_list
-            msg["state"] = msg_obj.state
-            msg["signature"] = msg_obj.signature
-            msg["crypto"] = msg_obj.crypto
-            msg["variant"] = msg_obj.variant
-            msg["scenario"] = msg_obj.scenario
-            msg["hash_algo"] = msg_obj.hash_algo
-            msg["data"]["mdata"] = msg_obj.mdata
-        
-        elif isinstance(msg_obj, Request):
-            msg["data"]["requesttype"] = msg_obj.requesttype
-            msg["data"]["timestamp"] = msg_obj.timestamp
-            msg["data"]["nonce"] = msg_obj.nonce
-
-        elif isinstance(msg_obj, Update):
-            msg["updatetype"] = msg_obj.update_type
-            msg["versionnr"] = msg_obj.version_nr
-            msg["data"]["update"] = msg_obj.update
-            msg["data"]["timestamp"] = msg_obj.timestamp
-
-        elif isinstance(msg_obj, Addresses):
-            msg["data"]["server_addr"] = msg_obj.server_addr
-            msg["data"]["device_addr"] = msg_obj.device_addr
-
-        elif isinstance(msg_obj, DefTicket):
-            msg["data"]["nonce"] = msg_obj.nonce
-            msg["data"]["deferral_time"] = msg_obj.deferral_time
-            msg["data"]["timestamp"] = msg_obj.timestamp
-
-        elif isinstance(msg_obj, BootTicket):
-            msg["data"]["bootticket"] = msg_obj.bootticket
-            msg["data"]["nonce"] = msg_obj.nonce
-            msg["data"]["timestamp"] = msg_obj.timestamp
-            msg["data"]["counter_init_time"] = msg_obj.counter_init_time
-
-        elif isinstance(msg_obj, MeasuredData):
-            msg["data"]["measured_data"] = msg_obj.measured_data
-            msg["data"]["timestamp"] = msg_obj.timestamp
-
-        return msg
+    def from_json(msg_str: str, addresses: Addresses) -> Message:
+        msg: Dict[str, Any] = loads(msg_str)
+        msg["signature"] = Utils.signature_to_bytes(msg["signature"])
+        if msg["data"]["mdata"] is not None:
+            msg["data"]["mdata"] = Utils.unpack_json(msg["data"]["mdata"], addresses)
+        if msg.get("proof") is not None:
+            msg["proof"] = Utils.unpack_json(msg["proof"], addresses)
+            msg["proof"].root = bytes.fromhex(msg["proof"].root)
+            msg["proof"].siblings = [bytes.fromhex(sibling) for sibling in msg["proof"].siblings]
+        return Utils.unpack_json(msg, addresses)
+
+    @staticmethod
+    def unpack_json(msg: Dict[str, Any], addresses: Addresses):
+        # Generated decoder of the messagetype (modules/codec.py), None for unknown messagetypes
+        unpack = UNPACKERS.get(msg["messagetype"])
+        if unpack is None:
+            return None
+        return unpack(msg, addresses)
+
+    @staticmethod
+    def pack_json(msg_obj: Union[Message, Request, Update, Addresses, DefTicket, BootTicket, MeasuredData, MerkleProof, None]): 
+        if msg_obj is None:
+            return {"messagetype": "message", "data": {}}
+        # Generated encoder of the messagetype (modules/codec.py), a LazyMessage is packed like a Message
+        return PACKERS[Message if isinstance(msg_obj, Message) else type(msg_obj)](msg_obj)
@@ -0,0 +1,254 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+from typing import Any, Dict, List, Optional, Tuple
+import struct
+
+from modules.messagetypes import *
+from modules.encoding import CanonicalEncoder, T_NONE, T_FALSE, T_TRUE, T_INT, T_STR, T_BYTES, T_LIST
+
+# Additional value tags of the wire format
+T_FLOAT: int = 7
+T_OBJECT: int = 8
+
+# Tags of the messagetypes on the wire (Addresses are sent next to the encoded message)
+WIRE_TYPES: Dict[type, int] = {
+    Message: 1,
+    Request: 2,
+    DefTicket: 3,
+    BootTicket: 4,
+    Update: 5,
+    MeasuredData: 6,
+    MerkleProof: 7,
+    UpdateManifest: 8,
+    UpdateChunkRequest: 9,
+    UpdateChunk: 10
+}
+WIRE_TYPES_BY_TAG: Dict[int, type] = {tag: msg_type for msg_type, tag in WIRE_TYPES.items()}
+
+# Fields of a Message needed for routing (decoded eagerly) and fields decoded on first access
+HEADER_FIELDS: tuple = ("sequence_list", "state", "crypto", "variant", "scenario", "hash_algo")
+LAZY_FIELDS: tuple = ("signature", "mdata", "proof")
+
+class WireCodec():
+    """
+    Compact binary encoding of a Message for the (message, addresses) tuple sent between server and device.
+
+    Layout (version 2, header first): MAGIC | version | HEADER_FIELDS | type tag of mdata (0: None) |
+    signature, mdata and proof, each as length (varint) | encoded value.
+    The receiver decodes the header for routing and the length prefixed fields only when they are accessed (LazyMessage).
+    Layout of version 1 (still decoded): MAGIC | version | encoded Message object.
+    Values are encoded like in CanonicalEncoder (tag, zigzag varint integers, length prefixed strings and bytes);
+    objects are T_OBJECT | type tag | their fields in the order of the constructor arguments.
+    The addresses of the Message are not encoded, the receiver uses the Addresses of the tuple.
+    """
+    MAGIC: bytes = b"WDW"
+    VERSION: int = 2
+
+    @staticmethod
+    def encode_value(value: Any, out: bytearray) -> None:
+        msg_type: type = type(value)
+        if msg_type in WIRE_TYPES:
+            out.append(T_OBJECT)
+            out.append(WIRE_TYPES[msg_type])
+            for field in msg_type.fields:
+                field_value: Any = getattr(value, field)
+                # Addresses are part of the tuple
+                WireCodec.encode_value(None if isinstance(field_value, Addresses) else field_value, out)
+        elif isinstance(value, float):
+            out.append(T_FLOAT)
+            out += struct.pack(">d", value)
+        elif isinstance(value, (list, tuple)):
+            out.append(T_LIST)
+            CanonicalEncoder.encode_varint(len(value), out)
+            for item in value:
+                WireCodec.encode_value(item, out)
+        else:
+            CanonicalEncoder.encode_value(value, out)
+
+    @staticmethod
+    def encode(message: Message) -> bytes:
+        out: bytearray = bytearray(WireCodec.MAGIC)
+        out.append(WireCodec.VERSION)
+        for field in HEADER_FIELDS:
+            WireCodec.encode_value(getattr(message, field), out)
+        out.append(WIRE_TYPES.get(message.mdata_type, 0))
+        for field in LAZY_FIELDS:
+            # Fields of a LazyMessage that have not been accessed are copied as they were received
+            encoded: Optional[bytes] = message.raw.get(field) if isinstance(message, LazyMessage) else None
+            if encoded is None:
+                value: bytearray = bytearray()
+                WireCodec.encode_value(getattr(message, field), value)
+                encoded = bytes(value)
+            CanonicalEncoder.encode_varint(len(encoded), out)
+            out += encoded
+        return bytes(out)
+
+    @staticmethod
+    def decode_varint(data: memoryview, pos: int) -> Tuple[int, int]:
+        value: int = 0
+        shift: int = 0
+        while True:
+            byte: int = data[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            if not (byte & 0x80):
+                return value, pos
+            shift += 7
+
+    @staticmethod
+    def decode_value(data: memoryview, pos: int, addresses: Addresses) -> Tuple[Any, int]:
+        tag: int = data[pos]
+        pos += 1
+        if tag == T_NONE:
+            return None, pos
+        elif tag == T_FALSE:
+            return False, pos
+        elif tag == T_TRUE:
+            return True, pos
+        elif tag == T_INT:
+            zigzag, pos = WireCodec.decode_varint(data, pos)
+            return (zigzag >> 1) if not (zigzag & 1) else -((zigzag + 1) >> 1), pos
+        elif tag == T_STR:
+            length, pos = WireCodec.decode_varint(data, pos)
+            return str(data[pos:pos + length], "utf-8"), pos + length
+        elif tag == T_BYTES:
+            length, pos = WireCodec.decode_varint(data, pos)
+            return bytes(data[pos:pos + length]), pos + length
+        elif tag == T_LIST:
+            length, pos = WireCodec.decode_varint(data, pos)
+            items: List[Any] = []
+            for _ in range(length):
+                item, pos = WireCodec.decode_value(data, pos, addresses)
+                items.append(item)
+            return items, pos
+        elif tag == T_FLOAT:
+            return struct.unpack(">d", data[pos:pos + 8])[0], pos + 8
+        elif tag == T_OBJECT:
+            msg_type: type = WIRE_TYPES_BY_TAG[data[pos]]
+            pos += 1
+            values: List[Any] = []
+            for field in msg_type.fields:
+                value, pos = WireCodec.decode_value(data, pos, addresses)
+                values.append(value)
+            if msg_type is Message:
+                values[msg_type.fields.index("addresses")] = addresses
+            return msg_type(*values), pos
+        raise ValueError(f"Unknown value tag {tag}")
+
+    @staticmethod
+    def decode_lazy(b_message: bytes, addresses: Addresses) -> Message:
+        """
+        Decodes the routing header of the message; signature, mdata and proof are decoded on first access.
+        Messages of version 1 are decoded completely.
+        """
+        data: memoryview = memoryview(b_message)
+        if bytes(data[:len(WireCodec.MAGIC)]) != WireCodec.MAGIC:
+            raise ValueError("No binary wire message")
+        version: int = data[len(WireCodec.MAGIC)]
+        pos: int = len(WireCodec.MAGIC) + 1
+
+        if version == 1:
+            message, pos = WireCodec.decode_value(data, pos, addresses)
+            if (not isinstance(message, Message)) or (pos != len(data)):
+                raise ValueError("Invalid binary wire message")
+            return message
+        if version != WireCodec.VERSION:
+            raise ValueError(f"Unsupported wire version {version}")
+
+        header: List[Any] = []
+        for _ in HEADER_FIELDS:
+            value, pos = WireCodec.decode_value(data, pos, addresses)
+            header.append(value)
+        mdata_tag: int = data[pos]
+        if (mdata_tag != 0) and (mdata_tag not in WIRE_TYPES_BY_TAG):
+            raise ValueError(f"Unknown type tag {mdata_tag}")
+        pos += 1
+
+        raw: Dict[str, bytes] = {}
+        for field in LAZY_FIELDS:
+            length, pos = WireCodec.decode_varint(data, pos)
+            if pos + length > len(data):
+                raise ValueError("Invalid binary wire message")
+            raw[field] = bytes(data[pos:pos + length])
+            pos += length
+        if pos != len(data):
+            raise ValueError("Invalid binary wire message")
+        return LazyMessage(addresses, *header, mdata_tag, raw)
+
+    @staticmethod
+    def decode(b_message: bytes, addresses: Addresses) -> Message:
+        message: Message = WireCodec.decode_lazy(b_message, addresses)
+        if isinstance(message, LazyMessage):
+            return message.materialize()
+        return message
+
+
+def lazy_field(field: str) -> property:
+    # Property of LazyMessage that decodes the received field on first access and stores it in the slot of Message
+    slot = Message.__dict__[field]
+
+    def get(self: "LazyMessage") -> Any:
+        encoded: Optional[bytes] = self.raw.pop(field, None)
+        if encoded is not None:
+            value, pos = WireCodec.decode_value(memoryview(encoded), 0, self.addresses)
+            if pos != len(encoded):
+                raise ValueError(f"Invalid {field} in binary wire message")
+            slot.__set__(self, value)
+        return slot.__get__(self, Message)
+
+    def set(self: "LazyMessage", value: Any) -> None:
+        self.raw.pop(field, None)
+        slot.__set__(self, value)
+
+    return property(get, set)
+
+class LazyMessage(Message):
+    """
+    Message received in the binary wire format whose routing header (HEADER_FIELDS) has been decoded,
+    while signature, mdata and proof stay encoded in raw until they are accessed.
+    Actors that only route or forward the message (former_step, mdata_type, pickling between actors,
+    WireCodec.encode) do not decode them, e.g. the body of a large Update.
+    """
+    __slots__ = ("mdata_tag", "raw")
+
+    signature = lazy_field("signature")
+    mdata = lazy_field("mdata")
+    proof = lazy_field("proof")
+
+    def __init__(self, addresses: Addresses, sequence_list: List[str], state: int, crypto: str, variant: str, scenario: Optional[int], hash_algo: str, mdata_tag: int, raw: Dict[str, bytes]) -> None:
+        self.addresses = addresses
+        self.sequence_list = sequence_list
+        self.state = state
+        self.crypto = crypto
+        self.variant = variant
+        self.scenario = scenario
+        self.hash_algo = hash_algo
+        self.mdata_tag = mdata_tag
+        self.raw = raw
+
+    @property
+    def mdata_type(self) -> type:
+        if "mdata" in self.raw:
+            return WIRE_TYPES_BY_TAG.get(self.mdata_tag, type(None))
+        return type(self.mdata)
+
+    def materialize(self) -> Message:
+        return Message(*[getattr(self, field) for field in Message.fields])
+
+    def __reduce__(self) -> tuple:
+        # Pickled between actors with the fields that have not been decoded yet still encoded
+        decoded: Dict[str, Any] = {field: getattr(self, field) for field in LAZY_FIELDS if field not in self.raw}
+        return (LazyMessage.restore, (self.addresses, *[getattr(self, field) for field in HEADER_FIELDS], self.mdata_tag, dict(self.raw), decoded))
+
+    @staticmethod
+    def restore(addresses: Addresses, sequence_list: List[str], state: int, crypto: str, variant: str, scenario: Optional[int], hash_algo: str, mdata_tag: int, raw: Dict[str, bytes], decoded: Dict[str, Any]) -> "LazyMessage":
+        message: LazyMessage = LazyMessage(addresses, sequence_list, state, crypto, variant, scenario, hash_algo, mdata_tag, raw)
+        for field, value in decoded.items():
+            setattr(message, field, value)
+        return message
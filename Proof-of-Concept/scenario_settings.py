@@ -17,6 +17,7 @@ from psutil import LINUX, WINDOWS
 import shutil
 from pathlib import Path
 from modules.remove import RemoveFiles
+from modules.filehandling import FileHandling as fh
 from settings import D_PRIV_KEY, D_PUB_KEY, D_STORAGE, S_PRIV_KEY, S_PUB_KEY, S_STORAGE, STAGING_AREA, S_DATA_STORAGE
 
 
@@ -31,16 +32,23 @@ else:
 # Example: CRYPTO = "classic" and VARIANT = "secp256r1"
 
 class ScenarioSettings:
-    def setting_starts(self, algo: str, variant: str, crypto: str, hash_algo: str):
+    def setting_starts(self, algo: str, variant: str, crypto: str, hash_algo: str, compression: str = "none"):
         # To create to sets of starting points and keys with files
         n = 2
 
         path: Path = Path("temp", variant, hash_algo)
+        if compression != "none":
+            # The staged updates of the starting points are compressed
+            path = Path(path, compression)
 
         ## Check if directory temp/variante/hash_algo exists
         if not os.path.exists(path):
             os.makedirs(path, exist_ok=True)
 
+            # Pre-generate the device and server key pairs of all sets on worker processes
+            if crypto != "none" and variant != "none":
+                os.system(f"{python} key_pool.py --variant={variant} --crypto={crypto} --target={2 * n}")
+
             for i in range (n):
 
                 # Remove all files
@@ -51,7 +59,7 @@ class ScenarioSettings:
             
                 # Generate new key pairs
                 if crypto != "none" and variant != "none":
-                    os.system(f"{python} key_generation.py --variant={variant} --crypto={crypto}")
+                    os.system(f"{python} key_generation.py --variant={variant} --crypto={crypto} --pool")
 
                     # Save keys from memory to temp
                     shutil.copy(Path(D_STORAGE, f"{D_PUB_KEY}.der"), Path(path, f"{i}_{D_PUB_KEY}.der"))
@@ -72,10 +80,10 @@ class ScenarioSettings:
                 os.system(f"{python} app.py --action=update {algo}")
 
                 # Copy update from memory to temp
-                shutil.copy(Path(STAGING_AREA, "update"), Path(path, f"{i}_update"))
+                fh.copy_object(STAGING_AREA, "update", path, f"{i}_update")
 
                 # Copy version number from memory to temp
-                shutil.copy(Path(S_STORAGE, "version.txt"), Path(path, f"{i}_version.txt"))
+                shutil.copy(Path(D_STORAGE, "version.txt"), Path(path, f"{i}_version.txt"))
 
         return path
 
@@ -209,7 +217,7 @@ class ScenarioSettings:
         shutil.copy(Path(path, f"0_{S_PRIV_KEY}.der"), Path(S_STORAGE, f"{S_PRIV_KEY}.der"))
 
         # Copy bootticket from temp to memory
-        shutil.copy(Path(path, "1_update"), Path(STAGING_AREA, "update"))
+        fh.copy_object(path, "1_update", STAGING_AREA, "update")
 
         print("***** Initial state for scenario 6 has been established. *****") 
 
@@ -238,7 +246,7 @@ class ScenarioSettings:
         shutil.copy(Path(path, "0_version.txt"), Path(D_STORAGE, "version.txt"))
 
         # Copy bootticket from temp to memory
-        shutil.copy(Path(path, "0_update"), Path(STAGING_AREA, "update"))
+        fh.copy_object(path, "0_update", STAGING_AREA, "update")
 
         print("***** Initial state for scenario 7 has been established. *****") 
 
@@ -6,12 +6,17 @@
 # Author:        Tanja Gutsche               
 # ****************************************************************************
 
-from thespian.actors import ActorExitRequest, Actor, ChildActorExited, ActorAddress
-from typing import Any, Dict, Tuple, Union
+from thespian.actors import ActorExitRequest, Actor, ChildActorExited, ActorAddress, WakeupMessage
+from typing import Any, Dict, List, Optional, Tuple, Union
+from concurrent.futures import Future
 import os
 
-from settings import UNIT, SERVER, MEASURED_DATA, S_STORAGE, S_PRIV_KEY, D_PUB_KEY, S_DATA_STORAGE, END_MEASUREMENT, M_APP_BENCHMARKING_SCENARIO
-from modules.crypto import SignMessage, VerifyMessage
+import settings
+from settings import UNIT, SERVER, MEASURED_DATA, S_STORAGE, S_PRIV_KEY, D_PUB_KEY, S_DATA_STORAGE, START_MEASUREMENT, END_MEASUREMENT, M_APP_BENCHMARKING_SCENARIO, VERIFY_BATCH_WINDOW, SIGN_WORKERS, SIGN_POLL_INTERVAL, DEFTICKET_BATCH_WINDOW, UPDATE_CHUNK_SIZE
+from modules.crypto import SignMessage, VerifyMessage, ContextCache
+from modules.executor import SigningExecutor
+from modules.merkle import MerkleTree
+from modules.chunked import ChunkedUpdate
 from modules.generate_objects import GenerateServerObjects as gen_obj
 from modules.filehandling import FileHandling as fh
 from modules.filehandling import SaveTimes2File as save
@@ -22,6 +27,7 @@ from modules.messagetypes import *
 class Server(Actor):
     def __init__(self) -> None:
         self.actor_name: str = "server"
+        self.signer_addr: Optional[ActorAddress] = None
     
     def receiveMessage(self, message: Union[Tuple[Dict[str, Any], Addresses], Message, ChildActorExited, str], sender: ActorAddress) -> None:
         
@@ -32,20 +38,128 @@ class Server(Actor):
             message: Message = Utils.open_tuple(SERVER, message) 
 
         if isinstance(message, Message):
+            if Server.shared_signer() and (self.signer_addr is None):
+                # The Signer with the signing pool or the ticket batch is created once by the server (as its parent)
+                # and reused by the generators under its global name
+                self.signer_addr = self.createActor(Signer, globalName=Signer.__name__)
+
             updated_message, former = former_step(message, sender, self.myAddress, self.actor_name)
-            if former == "send_update":
+            if former == "send_update" and Server.fused():
+                self.run_fused(message, updated_message)
+
+            elif former == "send_update":
                 Utils.create_and_send(self, SERVER, UpdateGenerator, updated_message)
 
             elif former == "signer":
+                if (settings.compression != "none") and Server.sign_uncompressed() and issubclass(updated_message.mdata_type, Update):
+                    # The signature covers the uncompressed update, only the sent image is compressed
+                    updated_message = self.compress_update(updated_message, True)
                 # Pack tuple to send message and addresses to device
-                Utils.create_and_send_tuple(self, SERVER, message, updated_message, sender)
+                # (a shared Signer must not be ended)
+                Utils.create_and_send_tuple(self, SERVER, message, updated_message, sender, not Server.shared_signer())
+
+            elif former == "update_store":
+                # The UpdateStore keeps serving chunks
+                Utils.create_and_send_tuple(self, SERVER, message, updated_message, sender, False)
+
+            elif former == "device" and issubclass(updated_message.mdata_type, UpdateChunkRequest):
+                # Chunks are not signed (they are checked against the signed manifest), no verification needed
+                Utils.create_and_send(self, SERVER, UpdateStore, updated_message, True)
+
+            elif former == "device" and Server.fused() and issubclass(updated_message.mdata_type, Request):
+                self.run_fused(message, updated_message)
 
             elif former == "device":
-                Utils.create_and_send(self, SERVER, Verifier, updated_message)
+                # A batching verifier is created once under its global name and shared by all requests
+                Utils.create_and_send(self, SERVER, Verifier, updated_message, settings.verify_batch)
 
         #if isinstance(message, ChildActorExited): 
             # Do not kill yourself if ChildActorExited
 
+    @staticmethod
+    def shared_signer() -> bool:
+        # One Signer is shared by all generators if it keeps a signing pool or collects deferral tickets
+        return (settings.sign_executor != "inline") or settings.defticket_batch
+
+    @staticmethod
+    def fused() -> bool:
+        # Batched verification and a shared Signer collect messages of several actors, they keep the actor steps
+        return settings.fused_pipeline and not settings.verify_batch and not Server.shared_signer()
+
+    @staticmethod
+    def sign_uncompressed() -> bool:
+        # The manifest of a chunked update always covers the compressed image
+        return settings.sign_uncompressed and not settings.chunked_update
+
+    def compress_update(self, message: Message, signed_uncompressed: bool) -> Message:
+        size: int = len(message.mdata.update) if isinstance(message.mdata.update, bytes) else len(str(message.mdata.update).encode("utf-8"))
+        start_counter: float = START_MEASUREMENT()
+        message = gen_obj.gen_compressed_update(message, settings.compression, settings.compression_level, signed_uncompressed)
+        end_counter: float = END_MEASUREMENT()
+        print(f"[SERVER] Compressed the update with {settings.compression}: {len(message.mdata.update)} instead of {size} bytes.")
+
+        if settings.save_update_measurements and (message.scenario == 8):
+            filepath = fh.gen_filepath(UNIT, message.scenario, message.variant, message.hash_algo, M_APP_BENCHMARKING_SCENARIO)
+            save.save_counter(filepath, end_counter - start_counter, f"compress_{settings.compression}")
+            save.save_counter(filepath, size, "size")
+            save.save_counter(filepath, len(message.mdata.update), "compressed_size")
+        return message
+
+    def run_fused(self, message: Message, updated_message: Message) -> None:
+        """
+        Fused pipeline (--fused-pipeline): verifies the request, generates and signs the answer and sends it
+        to the device as function calls within this actor, without a message to another actor.
+        Every step is added to the sequence_list as if it had been done by its actor.
+        """
+        if issubclass(updated_message.mdata_type, Request):
+            valid: bool = Verifier.verify(updated_message)
+            updated_message, _ = former_step(updated_message, self.myAddress, self.myAddress, "verifier")
+            if not self.request_accepted(updated_message, valid):
+                return
+            generator, generator_name = REQUEST_GENERATORS[updated_message.mdata.requesttype]
+        else:
+            # The update sent by the server (send_update) needs no verification
+            generator, generator_name = UpdateGenerator, "gen_update"
+
+        updated_message, _ = former_step(updated_message, self.myAddress, self.myAddress, generator_name)
+        new_message: Message = generator.generate(self, updated_message)
+        new_message, _ = former_step(new_message, self.myAddress, self.myAddress, "signer")
+        new_message = Signer.sign(new_message)
+        new_message, _ = former_step(new_message, self.myAddress, self.myAddress, self.actor_name)
+
+        if (settings.compression != "none") and Server.sign_uncompressed() and issubclass(new_message.mdata_type, Update):
+            new_message = self.compress_update(new_message, True)
+        Utils.create_and_send_tuple(self, SERVER, message, new_message, self.myAddress, False)
+
+    def request_accepted(self, message: Message, valid: bool) -> bool:
+        # Generate an answer only for a verified request of a device that is not compromised
+        request_type: str = message.mdata.requesttype
+        if request_type not in REQUEST_GENERATORS:
+            print(f"[SERVER] Unknown request type {request_type}.")
+            return False
+        if valid and not os.path.exists(Path(S_DATA_STORAGE, "compromised.device")):
+            print(f"[SERVER] {request_type.capitalize()} request has been verified: {valid}")
+            return True
+
+        print(f"[SERVER] {request_type.capitalize()} request has NOT been verified: Device might be compromised.")
+        # End the measurement here for scenario 5
+        if message.scenario == 5:
+            filepath = fh.gen_filepath(UNIT, message.scenario, message.variant, message.hash_algo, M_APP_BENCHMARKING_SCENARIO)
+            end_counter: float = END_MEASUREMENT()
+            print(f"[SERVER] In verifier (request defticket) end counter at: {end_counter}")
+            save.save_counter(filepath, end_counter, "e_device_compromised")
+
+            self.send(message.addresses.device_addr, ActorExitRequest())
+        # End scenario 5 and the measurement
+        return False
+
+    def send_to_signer(self, message: Message) -> None:
+        shared: bool = Server.shared_signer()
+        Utils.create_and_send(self, SERVER, Signer, message, shared)
+        if shared:
+            # The shared Signer is no child of this actor, so no ChildActorExited will end it
+            end_step(self)
+
 
 class BootTicketGenerator(Server):
     def __init__(self) -> None:
@@ -56,18 +170,22 @@ class BootTicketGenerator(Server):
             updated_message, former = former_step(message, sender, self.myAddress, self.actor_name)
             
             if former == "verifier":
-                new_message: Message = gen_obj.gen_bootticket(updated_message)
-                # Save bootticket for future reference
-                fh.save_object(updated_message, S_STORAGE)
-                Utils.create_and_send(self, SERVER, Signer, new_message)
+                self.send_to_signer(BootTicketGenerator.generate(self, updated_message))
 
             else:
                 print("[SERVER] BootTicketGenerator Error")
-                self.send(self.myAddress, ActorExitRequest())
+                end_step(self)
 
         if isinstance(message, ChildActorExited):
             send_ActorExitRequest(self, SERVER, self.actor_name, self.myAddress)
 
+    @staticmethod
+    def generate(actor: Server, message: Message) -> Message:
+        new_message: Message = gen_obj.gen_bootticket(message)
+        # Save bootticket for future reference
+        fh.save_object(message, S_STORAGE)
+        return new_message
+
 class UpdateGenerator(Server):
     def __init__(self) -> None:
         self.actor_name: str = "gen_update"
@@ -77,18 +195,62 @@ class UpdateGenerator(Server):
             updated_message, former = former_step(message, sender, self.myAddress, self.actor_name)
 
             if former == "verifier" or former == "server":
-                new_message: Message = gen_obj.gen_update(updated_message)
-                # Save update for future reference
-                fh.save_object(updated_message, S_STORAGE)
-                Utils.create_and_send(self, SERVER, Signer, new_message)
+                self.send_to_signer(UpdateGenerator.generate(self, updated_message))
 
             else:
                 print("[SERVER] UpdateGen Error")
-                self.send(self.myAddress, ActorExitRequest())
+                end_step(self)
 
         if isinstance(message, ChildActorExited):
             send_ActorExitRequest(self, SERVER, self.actor_name, self.myAddress)
 
+    @staticmethod
+    def generate(actor: Server, message: Message) -> Message:
+        new_message: Message = gen_obj.gen_update(message)
+        if settings.delta_update:
+            # Send a delta from the image the device has installed
+            new_message = gen_obj.gen_delta_update(new_message)
+        if (settings.compression != "none") and not Server.sign_uncompressed():
+            # The compressed image is signed (and served in chunks)
+            new_message = actor.compress_update(new_message, False)
+        # Save update for future reference
+        fh.save_object(message, S_STORAGE)
+        if settings.chunked_update:
+            # Sign only the manifest, the device fetches the chunks from the UpdateStore
+            new_message.mdata = ChunkedUpdate.manifest(new_message.mdata)
+            print(f"[SERVER] Send the manifest of {len(new_message.mdata.chunk_hashes)} chunks instead of the update.")
+        return new_message
+
+class UpdateStore(Server):
+    """
+    Serves the chunks of the saved update (S_STORAGE) for the chunked update transfer.
+    """
+    def __init__(self) -> None:
+        self.actor_name: str = "update_store"
+        self.update: Optional[Update] = None
+
+    def receiveMessage(self, message, sender: ActorAddress) -> None:
+        if isinstance(message, Message):
+            updated_message, former = former_step(message, sender, self.myAddress, self.actor_name)
+
+            if former == "server" and isinstance(updated_message.mdata, UpdateChunkRequest):
+                request: UpdateChunkRequest = updated_message.mdata
+                if (self.update is None) or (self.update.version_nr != request.version_nr):
+                    # The image stays in its blob, only the saved message is loaded
+                    saved = fh.pickle_file_to_object("update", S_STORAGE)
+                    self.update = saved.mdata if isinstance(saved, Message) and isinstance(saved.mdata, Update) else None
+
+                if (self.update is None) or (self.update.version_nr != request.version_nr):
+                    print(f"[SERVER] Update {request.version_nr} is not available.")
+                    return
+
+                data: bytes = ChunkedUpdate.read_chunk(self.update.update, request.index, UPDATE_CHUNK_SIZE)
+                updated_message.mdata = UpdateChunk(request.version_nr, request.index, data)
+                self.send(updated_message.addresses.server_addr, updated_message)
+
+            else:
+                print("[SERVER] UpdateStore Error")
+
 class Storage(Server):
     def __init__(self) -> None:
         self.actor_name: str = "storage"
@@ -114,7 +276,7 @@ class Storage(Server):
 
                 else:
                     print("[SERVER] Storage Error")
-                    self.send(self.myAddress, ActorExitRequest())
+                    end_step(self)
                
 class DeferralTicketGenerator(Server):
     def __init__(self) -> None:
@@ -125,87 +287,207 @@ class DeferralTicketGenerator(Server):
             updated_message, former = former_step(message, sender, self.myAddress, self.actor_name)
             
             if former == "verifier":
-                new_message: Message = gen_obj.gen_defticket(updated_message)
-                Utils.create_and_send(self, SERVER, Signer, new_message)
+                self.send_to_signer(DeferralTicketGenerator.generate(self, updated_message))
             else:
                 print("[SERVER] DefTicketGen Error")
-                self.send(self.myAddress, ActorExitRequest())
+                end_step(self)
 
         if isinstance(message, ChildActorExited):
             send_ActorExitRequest(self, SERVER, self.actor_name, self.myAddress)
 
+    @staticmethod
+    def generate(actor: Server, message: Message) -> Message:
+        return gen_obj.gen_defticket(message)
+
 class Verifier(Server):
     def __init__(self) -> None:
         self.actor_name: str = "verifier"
+        # Messages (and their senders) waiting to be verified as a batch
+        self.queue: List[Tuple[Message, ActorAddress]] = []
 
     def receiveMessage(self, message, sender: ActorAddress) -> None:
         if isinstance(message, Message):
-            if (message.variant != "none") and (message.crypto != "none"):
-                valid = VerifyMessage.verify(SERVER, message, S_STORAGE, D_PUB_KEY, message.variant, message.crypto, message.hash_algo)
+            if settings.verify_batch:
+                # Collect the messages arriving within the batch window and verify them together
+                if len(self.queue) == 0:
+                    self.wakeupAfter(VERIFY_BATCH_WINDOW)
+                self.queue.append((message, sender))
 
             else:
-                print("[SERVER] Dummy function: No verification needed.")
-                valid = True
-
-            updated_message, former = former_step(message, sender, self.myAddress, self.actor_name)
-
-            if (not valid) or (former != "server"):
-                print("[SERVER] Verifier Error or verification not successful.")
-                self.send(self.myAddress, ActorExitRequest())
-                return # Ends the method
+                self.forward(message, sender, Verifier.verify(message))
 
-            if former == "server":
-                if isinstance(updated_message.mdata, Request):
-                    request_type: str = updated_message.mdata.requesttype
-                    if valid and not os.path.exists(Path(S_DATA_STORAGE, "compromised.device")):
-                        print(f"[SERVER] {request_type.capitalize()} request has been verified: {valid}")
-                        if request_type == "update":
-                            Utils.create_and_send(self, SERVER, UpdateGenerator, updated_message)
+        if isinstance(message, WakeupMessage):
+            batch: List[Tuple[Message, ActorAddress]] = self.queue
+            self.queue = []
 
-                        elif request_type == "bootticket":
-                            Utils.create_and_send(self, SERVER, BootTicketGenerator, updated_message)
+            to_verify: List[Message] = [msg for msg, _ in batch if (msg.variant != "none") and (msg.crypto != "none")]
+            results = iter(VerifyMessage.verify_many(SERVER, to_verify, S_STORAGE, D_PUB_KEY))
+            print(f"[SERVER] Verified a batch of {len(to_verify)} messages.")
 
-                        elif request_type == "defticket":
-                            Utils.create_and_send(self, SERVER, DeferralTicketGenerator, updated_message)
-                    else:
-                        print(f"[SERVER] {request_type.capitalize()} request has NOT been verified: Device might be compromised.")
-                        # End the measurement here for scenario 5
-                        if updated_message.scenario == 5:
-                            filepath = fh.gen_filepath(UNIT, updated_message.scenario, updated_message.variant, updated_message.hash_algo, M_APP_BENCHMARKING_SCENARIO)
-                            end_counter: float = END_MEASUREMENT()
-                            print(f"[SERVER] In verifier (request defticket) end counter at: {end_counter}")
-                            save.save_counter(filepath, end_counter, "e_device_compromised")
-
-                            self.send(updated_message.addresses.device_addr, ActorExitRequest())
-                        # End scenario 5 and the measurement
-
-                elif isinstance(updated_message.mdata, MeasuredData):
-                    if valid and not os.path.exists(Path(S_DATA_STORAGE, "compromised.device")):
-                        print(f"[SERVER] MeasuredData has been verified: {valid}")
-                        Utils.create_and_send(self, SERVER, Storage, updated_message)
-                    else:
-                        print(f"[SERVER] MeasuredData has NOT been verified: Device might be compromised.")
+            for msg, msg_sender in batch:
+                if (msg.variant != "none") and (msg.crypto != "none"):
+                    valid, data, unit = next(results)
+                else:
+                    print("[SERVER] Dummy function: No verification needed.")
+                    valid = True
+                self.forward(msg, msg_sender, valid)
 
-            
-        if isinstance(message, ChildActorExited):
+        if isinstance(message, ChildActorExited) and not settings.verify_batch:
             send_ActorExitRequest(self, SERVER, self.actor_name, self.myAddress)
 
+        if isinstance(message, ActorExitRequest):
+            # Free the cached liboqs contexts of this actor
+            ContextCache.free_all()
+
+    @staticmethod
+    def verify(message: Message) -> bool:
+        if (message.variant != "none") and (message.crypto != "none"):
+            return VerifyMessage.verify(SERVER, message, S_STORAGE, D_PUB_KEY, message.variant, message.crypto, message.hash_algo)
+
+        print("[SERVER] Dummy function: No verification needed.")
+        return True
+
+    def forward(self, message: Message, sender: ActorAddress, valid: bool) -> None:
+        updated_message, former = former_step(message, sender, self.myAddress, self.actor_name)
+
+        if (not valid) or (former != "server"):
+            print("[SERVER] Verifier Error or verification not successful.")
+            # A batching verifier is shared by all messages and stays alive
+            if not settings.verify_batch:
+                end_step(self)
+            return # Ends the method
+
+        if former == "server":
+            if isinstance(updated_message.mdata, Request):
+                if self.request_accepted(updated_message, valid):
+                    generator, _ = REQUEST_GENERATORS[updated_message.mdata.requesttype]
+                    Utils.create_and_send(self, SERVER, generator, updated_message)
+
+            elif isinstance(updated_message.mdata, MeasuredData):
+                if valid and not os.path.exists(Path(S_DATA_STORAGE, "compromised.device")):
+                    print(f"[SERVER] MeasuredData has been verified: {valid}")
+                    Utils.create_and_send(self, SERVER, Storage, updated_message)
+                else:
+                    print(f"[SERVER] MeasuredData has NOT been verified: Device might be compromised.")
+
 class Signer(Server):
     def __init__(self) -> None:
         self.actor_name: str = "signer"
+        self.executor: Optional[SigningExecutor] = None
+        # Submitted signing jobs waiting for their signature (a batch of tickets shares one job)
+        self.pending: List[Tuple[Future, List[Message]]] = []
+        # Deferral tickets waiting to be signed together
+        self.batch: List[Message] = []
 
     def receiveMessage(self, message, sender: ActorAddress) -> None:
         if isinstance(message, Message):
             updated_message, former = former_step(message, sender, self.myAddress, self.actor_name)
             if former == "gen_update" or former == "gen_bootticket" or former == "gen_defticket":
                 if (updated_message.variant != "none") and (updated_message.crypto != "none"):
-                    updated_message = SignMessage.sign(SERVER, updated_message, S_STORAGE, S_PRIV_KEY, updated_message.variant, updated_message.crypto, updated_message.hash_algo)
-                else:
-                    print("[DEVICE] Dummy function: Message will not be signed.")
-
+                    if settings.defticket_batch and (former == "gen_defticket"):
+                        # Collect the tickets arriving within the batch window and sign their Merkle root once
+                        if len(self.batch) == 0:
+                            self.wakeupAfter(DEFTICKET_BATCH_WINDOW, payload="defticket_batch")
+                        self.batch.append(updated_message)
+                        return
+                    elif settings.sign_executor != "inline":
+                        # Sign on the pool and reply as soon as the signature is available
+                        self.submit(updated_message)
+                        return
+
+                updated_message = Signer.sign(updated_message)
                 self.send(updated_message.addresses.server_addr, updated_message)
 
             else:
                 print("[SERVER] Signer Error")
-                self.send(self.myAddress, ActorExitRequest())
-        
+                if not Server.shared_signer():
+                    end_step(self)
+
+        if isinstance(message, WakeupMessage):
+            if message.payload == "defticket_batch":
+                self.sign_batch()
+            else:
+                self.reply_signed()
+
+        if isinstance(message, ActorExitRequest):
+            if self.executor is not None:
+                self.executor.shutdown()
+            # Free the cached liboqs contexts of this actor
+            ContextCache.free_all()
+
+    @staticmethod
+    def sign(message: Message) -> Message:
+        if (message.variant != "none") and (message.crypto != "none"):
+            return SignMessage.sign(SERVER, message, S_STORAGE, S_PRIV_KEY, message.variant, message.crypto, message.hash_algo)
+
+        print("[DEVICE] Dummy function: Message will not be signed.")
+        return message
+
+    def submit(self, message: Message) -> None:
+        b_message: bytes = SignMessage.prepare_payload(SERVER, message, message.hash_algo)
+        self.submit_payload(b_message, [message])
+
+    def submit_payload(self, b_message: bytes, messages: List[Message]) -> None:
+        if self.executor is None:
+            self.executor = SigningExecutor(settings.sign_executor, SIGN_WORKERS, S_STORAGE, S_PRIV_KEY)
+
+        first: Message = messages[0]
+        future: Future = self.executor.submit(b_message, first.variant, first.crypto, first.hash_algo)
+
+        if len(self.pending) == 0:
+            self.wakeupAfter(SIGN_POLL_INTERVAL)
+        self.pending.append((future, messages))
+
+    def sign_batch(self) -> None:
+        # Sign the Merkle root over the collected deferral tickets, each ticket carries its proof
+        batch: List[Message] = self.batch
+        self.batch = []
+        if len(batch) == 0:
+            return
+
+        tree: MerkleTree = MerkleTree([SignMessage.build_payload(msg.mdata) for msg in batch])
+        for i, msg in enumerate(batch):
+            msg.proof = tree.proof(i)
+        b_root: bytes = MerkleTree.signed_root(tree.root)
+        print(f"[SERVER] Sign a batch of {len(batch)} deferral tickets.")
+
+        if settings.sign_executor == "inline":
+            first: Message = batch[0]
+            try:
+                b_signature, data, unit = SignMessage.sign_payload(b_root, S_STORAGE, S_PRIV_KEY, first.variant, first.crypto, first.hash_algo)
+            except Exception as ex:
+                print(f"[SERVER] Batch could not be signed. {ex}")
+                return
+            self.reply_batch(batch, b_signature, data, unit)
+        else:
+            self.submit_payload(b_root, batch)
+
+    def reply_batch(self, messages: List[Message], b_signature: bytes, data: Any, unit: str) -> None:
+        for msg in messages:
+            signed_message: Message = SignMessage.attach_signature(SERVER, msg, b_signature, data, unit)
+            self.send(signed_message.addresses.server_addr, signed_message)
+
+    def reply_signed(self) -> None:
+        # Send every message whose signature is done, keep polling for the others
+        waiting: List[Tuple[Future, List[Message]]] = []
+        for future, messages in self.pending:
+            if not future.done():
+                waiting.append((future, messages))
+                continue
+
+            try:
+                b_signature, data, unit = future.result()
+                self.reply_batch(messages, b_signature, data, unit)
+            except Exception as ex:
+                print(f"[SERVER] Message could not be signed. {ex}")
+
+        self.pending = waiting
+        if len(self.pending) > 0:
+            self.wakeupAfter(SIGN_POLL_INTERVAL)
+
+# Generator of each request type (and its step in the sequence_list)
+REQUEST_GENERATORS: Dict[str, Tuple[type, str]] = {
+    "update": (UpdateGenerator, "gen_update"),
+    "bootticket": (BootTicketGenerator, "gen_bootticket"),
+    "defticket": (DeferralTicketGenerator, "gen_defticket")
+}
@@ -6,8 +6,9 @@
 # Author:        Tanja Gutsche               
 # ****************************************************************************
 
+import os
 from pathlib import Path
-from typing import List, Callable, Optional
+from typing import Dict, List, Callable, Optional
 from hwcounter import count, count_end
 from mbedtls import pk
 
@@ -59,6 +60,65 @@ sphincsp_shake256_algos: List[str] = ["SPHINCS+-SHAKE256-128f-robust", "SPHINCS+
 
 liboqs_algos: List[str] = dilithium_algos + falcon_algos + sphincsp_sha256_algos
 
+#######################################################################
+# CRYPTO CACHES
+#######################################################################
+
+OQS_CONTEXT_CACHE_SIZE: int = 8  # Max. number of cached liboqs signer/verifier contexts per process (0 disables the cache)
+
+PREHASH_CHUNK_SIZE: int = 64 * 1024  # Chunk size in bytes for hashing payloads in prehash mode
+
+VERIFY_CACHE_FILE: str = "verify_cache.json"  # Cache of successful verifications of staged elements (in the device secure storage)
+VERIFY_CACHE_SIZE: int = 32                   # Max. number of cached verification results
+
+#######################################################################
+# HYBRID SIGNATURES
+#######################################################################
+
+HYBRID_SEPARATOR: str = "+"                # Hybrid variants are given as <classic>+<pqc>, e.g. secp256r1+Dilithium2
+HYBRID_CLASSIC_DEFAULT: str = "secp256r1"  # Classic component if the variant only names the pqc algorithm
+
+#######################################################################
+# BATCH VERIFICATION (SERVER)
+#######################################################################
+
+VERIFY_BATCH_WINDOW: float = 0.05          # Collect messages for x seconds before verifying them as a batch
+VERIFY_WORKERS: int = os.cpu_count() or 1  # Number of threads verifying a batch in parallel
+
+#######################################################################
+# SIGNING EXECUTOR (SERVER)
+#######################################################################
+
+SIGN_WORKERS: int = os.cpu_count() or 1    # Number of pool workers of the server Signer (thread or process mode)
+SIGN_POLL_INTERVAL: float = 0.005          # Interval in seconds the Signer checks for finished signatures
+DEFTICKET_BATCH_WINDOW: float = 0.05       # Time window in seconds in which the Signer collects deferral tickets to sign one Merkle root
+
+#######################################################################
+# ASYNCIO SERVER ENGINE (async_server.py)
+#######################################################################
+
+ASYNC_MAX_CONNECTIONS: int = 10000         # Devices connected at a time, further connections are refused
+ASYNC_MAX_REQUEST_SIZE: int = 64 * 1024    # Largest message frame accepted from a device in bytes
+ASYNC_MAX_PENDING: int = 4 * SIGN_WORKERS  # Messages handed to the executor at a time, the other connections wait
+
+#######################################################################
+# FLEET SIMULATOR (fleet.py)
+#######################################################################
+
+FLEET_STORAGE: Path = Path("memory", "fleet")  # Keys, nonces and staging areas of the simulated devices (device_<i>) and their server (server)
+FLEET_DURATION: float = 30.0                   # Seconds each fleet size is simulated
+FLEET_BOOT_WINDOW: float = 1.0                 # Seconds in which the devices boot at the start (without --boot-interval)
+
+#######################################################################
+# SHARDED SERVER (sharded_server.py)
+#######################################################################
+
+SHARD_COUNT: int = 4                             # Shard processes of the server
+SHARD_VIRTUAL_NODES: int = 64                    # Positions of each shard on the hash ring, more positions spread the devices more evenly
+SHARD_WORKERS: int = 1                           # Pool workers of each shard process
+SHARD_STORAGE: Path = Path("memory", "shards")   # Storage of each shard (shard_<i>): server key and the folders of its devices
+SHARD_START_TIMEOUT: float = 10.0                # Seconds to wait for a new shard process to listen
+
 #######################################################################
 # STORAGE SPACES
 #######################################################################
@@ -68,20 +128,62 @@ D_STORAGE:      Path = Path("memory", "device_secure_storage")
 STAGING_AREA:   Path = Path("memory", "device_staging_area") 
 S_DATA_STORAGE: Path = Path("memory", "server_data_storage")
 MEASURED_DATA:   str = "measured_data"
+KEY_POOL:       Path = Path("memory", "key_pool")   # Pre-generated key pairs, one directory per crypto and variant
+UPDATE_ARTIFACTS: Path = Path(S_STORAGE, "update_artifacts")  # Images of the generated updates, one directory per update_type
+INSTALLED_IMAGES: Path = Path(D_STORAGE, "firmware")          # Installed image of each update_type
+
+UPDATE_BLOB_SUFFIX: str = ".blob"           # The body of a saved Update is kept next to the pickled message in <name>.blob
+UPDATE_IMAGE_CHUNK_SIZE: int = 1024 * 1024  # Chunk size in bytes for writing, hashing and installing update images
+UPDATE_IMAGE_SIZE: int = 0                  # Size in bytes of generated update images (0: only the update_<timestamp> string)
+
+UPDATE_CHUNK_SIZE: int = 64 * 1024          # Chunk size in bytes of the chunked update transfer (--chunked-update)
+UPDATE_CHUNK_WINDOW: int = 8                # Max. number of chunks the device requests at a time
+UPDATE_CHUNK_TIMEOUT: float = 2.0           # Seconds after which a requested chunk is requested again
+UPDATE_CHUNK_RETRIES: int = 5               # Max. number of times one chunk is requested again before the download is interrupted
+UPDATE_PART_SUFFIX: str = ".part"           # Partially downloaded image in the staging area
+UPDATE_PROGRESS_SUFFIX: str = ".progress"   # Number of verified chunks of the partial image (to resume the download)
+
+DELTA_BLOCK_SIZE: int = 4096                # Block size in bytes of the binary delta updates (--delta-update)
+UPDATE_ARTIFACTS_KEEP: int = 4              # Number of former update images per update_type the server keeps as delta bases
+
+UPDATE_COMPRESSION_LEVELS: Dict[str, int] = {"zlib": 6, "bz2": 9, "lzma": 6}  # Default level of each algorithm for compressed updates (--compression)
+
+ACTOR_POOL_SIZE: int = 2                    # Instances of each protocol role in the pooled actor mode (--actor-pool), used round-robin
+
+SYSTEM_BASES: List[str] = ["simpleSystemBase", "multiprocQueueBase", "multiprocUDPBase", "multiprocTCPBase"]  # Thespian system bases of app.py --system-base
+ADMIN_PORT_BASES: List[str] = ["multiprocUDPBase", "multiprocTCPBase"]  # System bases with an admin port (allocated dynamically)
+DEFAULT_SYSTEM_BASE: str = "multiprocTCPBase"
+
+KEY_POOL_TARGET: int = 4                  # Default number of key pairs key_pool.py fills each pool up to
+KEY_POOL_WORKERS: int = os.cpu_count() or 1  # Worker processes generating key pairs for the pool
 
 #######################################################################
 # MEASUREMENT SPACES
 #######################################################################
 
 HEADER_FUNCTIONS: List[str] = ["no", "algo_name", f"gen_keypair ({UNIT})", f"sign ({UNIT})", f"verify ({UNIT})", "valid"]
+HEADER_FUNCTIONS_PREHASH: List[str] = HEADER_FUNCTIONS + [f"prehash ({UNIT})"]
+HEADER_FUNCTIONS_HYBRID: List[str] = HEADER_FUNCTIONS + [f"sign_classic ({UNIT})", f"sign_pqc ({UNIT})", f"verify_classic ({UNIT})", f"verify_pqc ({UNIT})"]
 HEADER_SCENARIOS: List[str] = ["pre1", "counter1", "pre2", "counter2", "pre3", "counter3", "pre4", "counter4"]
 HEADER_EVALUATION: List[str] = ["algo_name", f"mean ({UNIT})", f"median ({UNIT})", f"std ({UNIT})", f"min ({UNIT})", f"max ({UNIT})"]
 
 BENCHMARKING: Path = Path("benchmarking", "measurements") 
 M_APP_BENCHMARKING_FUNCTIONS: Path = Path(BENCHMARKING, "functions")
 M_APP_BENCHMARKING_SCENARIO: Path = Path(BENCHMARKING, "scenarios")
+M_APP_BENCHMARKING_FLEET: Path = Path(BENCHMARKING, "fleet")
 EVALUATION: Path = Path("evaluation")
 
+#######################################################################
+# ALGORITHM REGISTRY (--variant=auto)
+#######################################################################
+
+REGISTRY_FUNCTIONS_PATHS: List[Path] = [M_APP_BENCHMARKING_FUNCTIONS]                                       # Function benchmark CSVs
+REGISTRY_DETAILS_PATHS: List[Path] = [Path("measurements", "functions"), Path(BENCHMARKING, "functions")]  # signer_details_*.json
+
+AUTO_MIN_NIST_LEVEL: int = 1                  # Minimum claimed NIST level of the selected algorithm
+AUTO_MAX_SIGNATURE_SIZE: Optional[int] = 5000 # Maximum signature size in bytes (None: no limit)
+AUTO_LATENCY_BUDGET: Optional[float] = None   # Maximum sign + verify cost per message in UNIT (None: no limit)
+
 DEVICE = "DEVICE"
 SERVER = "SERVER"
 
@@ -89,4 +191,19 @@ SERVER = "SERVER"
 
 scenario: Optional[int] = None
 save_measurements: bool = False
-save_update_measurements: bool = False
\ No newline at end of file
+save_update_measurements: bool = False
+verify_batch: bool = False
+signing_payload: str = "canonical" # or "json" (legacy encoding of the signed payload)
+prehash: bool = False
+sign_executor: str = "inline" # or "thread", "process"
+defticket_batch: bool = False
+verify_cache: bool = True
+wire: str = "json" # or "binary" (format of the messages sent between server and device)
+chunked_update: bool = False
+delta_update: bool = False
+compression: str = "none" # or "zlib", "bz2", "lzma" (compression of the update images)
+compression_level: Optional[int] = None # None: level of UPDATE_COMPRESSION_LEVELS
+sign_uncompressed: bool = False # Sign the uncompressed instead of the compressed update
+actor_pool: bool = False # Reuse long-lived actors for the protocol steps instead of creating one per message
+fused_pipeline: bool = False # Server verifies, generates, signs and replies within one actor
+system_base: str = DEFAULT_SYSTEM_BASE # Thespian system base the actors run on
\ No newline at end of file
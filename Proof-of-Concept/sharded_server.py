@@ -0,0 +1,269 @@
+# SPDX-License-Identifier: BSD-3-Clause
+# ****************************************************************************
+# Copyright 2023, Fraunhofer Institute for Secure Information Technology SIT.
+# All rights reserved.
+# ---------------------------------------------------------------------------- 
+# Author:        Tanja Gutsche               
+# ****************************************************************************
+
+"""
+Server sharded by device identity: several shard processes, each an asyncio server engine (async_server.py) with its
+own pool and storage, behind a router. The verification and signing of different devices runs on different cores.
+
+The devices connect to the router and name themselves in a first frame (HELLO | name, see Frames). The router assigns
+the device to a shard by consistent hashing of its name (ConsistentHashRing) and forwards the frames of the connection
+to the Unix socket of that shard and the answers back. A shard keeps the state of its devices in the folder
+<SHARD_STORAGE>/<shard>/<device> (public key, compromise flag, saved bootticket and update, measured data) and signs
+with the key of the server, which is copied into the storage of every shard.
+
+Shards can be added and removed while the server is running. Only the devices that change their shard are moved:
+their state folders are moved to the new shard and their connections are closed, so they reconnect to the new shard.
+A message the old shard is still processing at that moment gets no answer.
+"""
+from argparse import ArgumentParser
+from multiprocessing.process import BaseProcess
+from pathlib import Path
+from typing import Any, Dict, Optional, Set, Tuple
+import asyncio
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import settings
+from settings import SERVER, S_STORAGE, S_PRIV_KEY, ASYNC_MAX_CONNECTIONS, ASYNC_MAX_REQUEST_SIZE, SHARD_COUNT, SHARD_WORKERS, SHARD_STORAGE, SHARD_START_TIMEOUT
+from modules.filehandling import FolderHandling as foha
+from modules.sharding import ConsistentHashRing
+from async_server import AsyncServer, Frames, serve
+
+# Runtime settings of the parent process that the shard processes take over
+RUNTIME_SETTINGS: Tuple[str, ...] = ("signing_payload", "prehash", "verify_cache")
+# Bytes forwarded at once between a device and its shard
+PIPE_CHUNK: int = 64 * 1024
+
+def run_shard(path: Path, storage: Path, executor: str, workers: int, runtime: Dict[str, Any]) -> None:
+    # Entry of a shard process: an asyncio server on the Unix socket of the shard
+    for name, value in runtime.items():
+        setattr(settings, name, value)
+    server: AsyncServer = AsyncServer(executor, workers, storage=storage, data_storage=storage)
+    try:
+        asyncio.run(serve(server, "", 0, path))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+async def pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    # Forwards one direction of a routed connection until it is closed, then closes the other side
+    try:
+        while True:
+            data: bytes = await reader.read(PIPE_CHUNK)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+class ShardedServer():
+    """
+    Router in front of the shard processes of the server.
+
+    Parameters:
+    -----------
+    shards: int
+        Shard processes started with the server
+    executor: str
+        "thread" or "process": pool of each shard
+    workers: int
+        Pool workers of each shard
+    storage: Path
+        Storage of the shards, one folder per shard
+    key_storage: Path
+        Storage of the private key of the server
+    max_connections: int
+        Devices connected to the router at a time
+    """
+    def __init__(self, shards: int = SHARD_COUNT, executor: str = "thread", workers: int = SHARD_WORKERS, storage: Path = SHARD_STORAGE,
+                 key_storage: Path = S_STORAGE, max_connections: int = ASYNC_MAX_CONNECTIONS) -> None:
+        self.shards: int = shards
+        self.executor: str = executor
+        self.workers: int = workers
+        self.storage: Path = storage
+        self.key_storage: Path = key_storage
+        self.max_connections: int = max_connections
+        self.ring: ConsistentHashRing = ConsistentHashRing()
+        self.processes: Dict[str, BaseProcess] = {}
+        # Open connections of each device, closed when the device moves to another shard
+        self.routes: Dict[str, Set[asyncio.StreamWriter]] = {}
+        self.sockets: Path = Path(tempfile.mkdtemp())
+        self.next_shard: int = 0
+        self.connections: int = 0
+        # Fresh interpreters: a forked shard would inherit the running event loop of the router
+        self.context: Any = multiprocessing.get_context("spawn")
+
+    def shard_storage(self, shard: str) -> Path:
+        return Path(self.storage, shard)
+
+    def shard_socket(self, shard: str) -> Path:
+        return Path(self.sockets, f"{shard}.sock")
+
+    def device_storage(self, device: str) -> Path:
+        # State folder of the device on its shard, e.g. for the public key of a new device
+        path: Path = Path(self.shard_storage(self.ring.lookup(device)), device)
+        foha.createFolder(path)
+        return path
+
+    def devices(self) -> Dict[str, str]:
+        # Devices with a state folder and the shard the folder is on
+        located: Dict[str, str] = {}
+        for shard in self.processes:
+            for entry in os.scandir(self.shard_storage(shard)):
+                if entry.is_dir():
+                    located[entry.name] = shard
+        return located
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0, path: Optional[Path] = None) -> asyncio.AbstractServer:
+        # Starts the shards, then the router listens on the Unix socket path if given, otherwise on host and port
+        for _ in range(self.shards):
+            await self.add_shard()
+        if path is not None:
+            return await asyncio.start_unix_server(self.route, path=str(path), backlog=self.max_connections)
+        return await asyncio.start_server(self.route, host, port, backlog=self.max_connections)
+
+    async def add_shard(self) -> Dict[str, str]:
+        # Starts a new shard process and moves its devices to it
+        shard: str = f"shard_{self.next_shard}"
+        self.next_shard += 1
+        storage: Path = self.shard_storage(shard)
+        foha.createFolder(storage)
+        # All shards sign with the key of the server (server_priv_key, or server_classic_priv_key and server_pqc_priv_key)
+        owner, key_type = S_PRIV_KEY.split("_", 1)
+        for key_file in Path(self.key_storage).glob(f"{owner}_*{key_type}*"):
+            shutil.copy(key_file, storage)
+
+        path: Path = self.shard_socket(shard)
+        runtime: Dict[str, Any] = {name: getattr(settings, name) for name in RUNTIME_SETTINGS}
+        process: BaseProcess = self.context.Process(target=run_shard, args=(path, storage, self.executor, self.workers, runtime), name=shard)
+        process.start()
+        self.processes[shard] = process
+        deadline: float = time.monotonic() + SHARD_START_TIMEOUT
+        while not os.path.exists(path):
+            if (not process.is_alive()) or (time.monotonic() > deadline):
+                self.stop_shard(shard)
+                raise RuntimeError(f"Shard {shard} does not listen on {path}")
+            await asyncio.sleep(0.05)
+
+        self.ring.add(shard)
+        print(f"[{SERVER}] Shard {shard} added.")
+        return self.rebalance()
+
+    async def remove_shard(self, shard: str) -> Dict[str, str]:
+        # Moves the devices of the shard to the remaining shards and stops its process
+        self.ring.remove(shard)
+        moved: Dict[str, str] = self.rebalance()
+        self.stop_shard(shard)
+        shutil.rmtree(self.shard_storage(shard), ignore_errors=True)
+        print(f"[{SERVER}] Shard {shard} removed.")
+        return moved
+
+    def stop_shard(self, shard: str) -> None:
+        process: BaseProcess = self.processes.pop(shard)
+        process.terminate()
+        process.join()
+        if os.path.exists(self.shard_socket(shard)):
+            os.remove(self.shard_socket(shard))
+
+    def rebalance(self) -> Dict[str, str]:
+        # Moves the state folders of the devices whose shard has changed on the ring, returns the devices and their new shards
+        located: Dict[str, str] = self.devices()
+        moved: Dict[str, str] = {device: self.ring.lookup(device) for device, shard in located.items() if self.ring.lookup(device) != shard}
+        for device, shard in moved.items():
+            for writer in self.routes.get(device, set()):
+                writer.close()
+            shutil.move(str(Path(self.shard_storage(located[device]), device)), str(Path(self.shard_storage(shard), device)))
+        if moved:
+            print(f"[{SERVER}] {len(moved)} of {len(located)} devices moved to another shard.")
+        return moved
+
+    async def wait_idle(self) -> None:
+        # Waits until all devices are disconnected; a routed connection ends after its shard has processed the last message
+        while self.connections > 0:
+            await asyncio.sleep(0.01)
+
+    def shutdown(self) -> None:
+        for shard in list(self.processes):
+            self.stop_shard(shard)
+        shutil.rmtree(self.sockets, ignore_errors=True)
+
+    async def route(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if self.connections >= self.max_connections:
+            print(f"[{SERVER}] {self.connections} devices connected, connection refused.")
+            writer.close()
+            return
+
+        self.connections += 1
+        device: Optional[str] = None
+        try:
+            payload: Optional[bytes] = await Frames.read(reader, ASYNC_MAX_REQUEST_SIZE)
+            if payload is None:
+                return
+            device = Frames.device_name(payload)
+            if device is None:
+                raise ValueError("The device has not named itself (HELLO frame)")
+
+            shard_reader, shard_writer = await asyncio.open_unix_connection(str(self.shard_socket(self.ring.lookup(device))))
+            self.routes.setdefault(device, set()).add(writer)
+            # The shard gets the HELLO frame too, then the frames are forwarded unchanged in both directions
+            Frames.write(shard_writer, payload)
+            await asyncio.gather(pipe(reader, shard_writer), pipe(shard_reader, writer))
+
+        except (ValueError, ConnectionError, OSError, asyncio.IncompleteReadError) as ex:
+            print(f"[{SERVER}] Connection to {device} closed: {ex}")
+        finally:
+            self.connections -= 1
+            if device in self.routes:
+                self.routes[device].discard(writer)
+                if not self.routes[device]:
+                    del self.routes[device]
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+async def serve_sharded(server: ShardedServer, host: str, port: int, path: Optional[Path]) -> None:
+    listener: asyncio.AbstractServer = await server.start(host, port, path)
+    where = path if path is not None else listener.sockets[0].getsockname()
+    print(f"[{SERVER}] Router of {len(server.processes)} shards listening on {where}.")
+    async with listener:
+        await listener.serve_forever()
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description=""" Server sharded by device identity: shard processes behind a router """)
+
+    parser.add_argument("--host", dest="host", default="127.0.0.1", help="Host of the TCP socket")
+    parser.add_argument("--port", dest="port", type=int, default=0, help="Port of the TCP socket (0: free port)")
+    parser.add_argument("--unix", dest="unix", default=None, help="Path of a Unix socket (instead of TCP)")
+    parser.add_argument("--shards", dest="shards", type=int, default=SHARD_COUNT, help="Number of shard processes")
+    parser.add_argument("--executor", dest="executor", default="thread", help="Pool of each shard", choices=["thread", "process"])
+    parser.add_argument("--workers", dest="workers", type=int, default=SHARD_WORKERS, help="Pool workers of each shard")
+    parser.add_argument("--max-connections", dest="max_connections", type=int, default=ASYNC_MAX_CONNECTIONS, help="Devices connected at a time")
+    parser.add_argument("--payload", dest="signing_payload", default="canonical", help="Encoding of the signed payload (json: legacy compatibility mode)", choices=["canonical", "json"])
+    parser.add_argument("--prehash", dest="prehash", action="store_true", default=False, help="Sign and verify only the digest (--hash) of the payload")
+
+    ARGS = parser.parse_args()
+    settings.signing_payload = ARGS.signing_payload
+    settings.prehash = bool(ARGS.prehash)
+
+    server: ShardedServer = ShardedServer(ARGS.shards, ARGS.executor, ARGS.workers, max_connections=ARGS.max_connections)
+    try:
+        asyncio.run(serve_sharded(server, ARGS.host, ARGS.port, Path(ARGS.unix) if ARGS.unix is not None else None))
+    except KeyboardInterrupt:
+        print(f"[{SERVER}] Stopped.")
+    finally:
+        server.shutdown()